@@ -1,13 +1,29 @@
 # Imports
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash import dcc, html, ctx, no_update
+from dash._utils import to_json
+from dash._validate import validate_layout
+from dash.dependencies import Input, Output, State, MATCH, ALL, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import numpy as np
+import json
 import os
+import sys
+import time
+from flask import Response, abort, g, jsonify, request, send_from_directory
+
+# pandas, numpy and plotly come in through cube, downsample, figures and filters,
+# which are imported by the functions that use them, after the worker is up
+import compression
+import dataset
+import figure_cache
+import live
+import logos
+import metrics
+import profiling
+import result_cache
+import static_files
+import stylesheet
 
 # File name mappings for clients
 CLIENT_LOGOS = {
@@ -21,10 +37,26 @@ CLIENT_LOGOS = {
     'Finpesa': 'CLIENT_LOGOS/finpesa.png'
 }
 
-# App initialization
+# Rules of our own, inlined in the page or, once python stylesheet.py has run, bundled
+CUSTOM_CSS = '''
+            * {
+                font-family: 'Bebas Neue', sans-serif;
+            }
+            .regular-text {
+                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+            }
+            .card-body p, .card-body text {
+                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+            }
+            .card {
+                margin-bottom: 1rem;
+            }
+        '''
+
+# App initialization; the local bundle replaces FLATLY and Google Fonts when it is built
 app = dash.Dash(
     __name__, 
-    external_stylesheets=[
+    external_stylesheets=stylesheet.stylesheets() if stylesheet.manifest else [
         dbc.themes.FLATLY,
         'https://fonts.googleapis.com/css2?family=Bebas+Neue&display=swap'
     ]
@@ -33,6 +65,37 @@ app = dash.Dash(
 # Render deployment
 server = app.server
 
+
+# Latency per route, and per callback on Dash's callback route. Registered first so it runs
+# after every other after_request hook and counts compression too (see metrics.py)
+@server.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+CALLBACK_ENDPOINT = app.config.routes_pathname_prefix + '_dash-update-component'
+
+
+def _callback_name():
+    output = (request.get_json(silent=True) or {}).get('output')
+    callback = app.callback_map.get(output, {}).get('callback')
+    return getattr(callback, '__name__', None) or str(output)
+
+
+@server.after_request
+def record_request(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.registry.inc('mockdash_requests_total', route=route, method=request.method,
+                         status=str(response.status_code))
+    metrics.registry.observe('mockdash_request_duration_seconds', elapsed, route=route, method=request.method)
+    if request.endpoint == CALLBACK_ENDPOINT:
+        metrics.registry.observe('mockdash_callback_duration_seconds', elapsed, callback=_callback_name())
+    return response
+
+
 # Custom CSS
 app.index_string = '''<!DOCTYPE html>
 <html>
@@ -41,20 +104,7 @@ app.index_string = '''<!DOCTYPE html>
         <title>{%title%}</title>
         {%favicon%}
         {%css%}
-        <style>
-            * {
-                font-family: 'Bebas Neue', sans-serif;
-            }
-            .regular-text {
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
-            }
-            .card-body p, .card-body text {
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
-            }
-            .card {
-                margin-bottom: 1rem;
-            }
-        </style>
+        ''' + (stylesheet.preload_links() if stylesheet.manifest else '<style>' + CUSTOM_CSS + '</style>') + '''
     </head>
     <body>
         {%app_entry%}
@@ -66,770 +116,1215 @@ app.index_string = '''<!DOCTYPE html>
     </body>
 </html>'''
 
-# Monthly data
-monthly_data = pd.DataFrame({
-    'Month': ['January', 'February', 'March', 'April', 'May', 'June', 
-             'July', 'August', 'September', 'October', 'November', 'December'],
-    'Transactions': [133641, 171044, 200841, 204680, 197654, 189258, 
-                    182504, 183429, 84383, 169780, 138824, 68452],
-    'Volume': [2013687811.26, 2490772705.46, 2776712059.66, 2771003331.42, 2732297727.71, 
-               2539282672.75, 2551967296.20, 2890018921.76, 1411203322.06, 2230387153.64, 
-               1849984455.07, 987131225.49],
-    'Success_Rate': [95.47, 97.72, 96.65, 97.87, 99.05, 98.17, 
-                    95.36, 95.11, 94.85, 98.13, 94.52, 94.03],
-    'Unique_Remitters': [20610, 20219, 17487, 26118, 16178, 23345, 
-                        28163, 28799, 23795, 34715, 25236, 18104],
-    'Unique_Recipients': [34553, 50852, 75630, 85424, 66600, 73019, 
-                         67567, 71636, 42967, 80602, 63104, 38295]
-})
-
-# Failure data
-failure_data = pd.DataFrame({
-    'Reason': ['General Failure', 'Limit Exceeded', 'Invalid Credit Party', 
-               'Insufficient Balance', 'SOAP Error', 'Timed Out', 'System Error',
-               'Connectivity Error', 'Invalid Account', 'Invalid Details', 'Other'],
-    'Total': [833, 11376, 5416, 31173, 1248, 1640, 485, 194, 557, 4695, 2312],
-    'Percentage': [1.39, 18.98, 9.04, 52.02, 2.08, 2.74, 0.81, 0.32, 0.93, 7.83, 3.86]
-})
-
-# Updated hourly data with half-hour intervals
-hourly_data = pd.DataFrame({
-    'Hour': ['12:00:00 AM', '12:30:00 AM', '1:00:00 AM', '1:30:00 AM', '2:00:00 AM', '2:30:00 AM', 
-            '3:00:00 AM', '3:30:00 AM', '4:00:00 AM', '4:30:00 AM', '5:00:00 AM', '5:30:00 AM', 
-            '6:00:00 AM', '6:30:00 AM', '7:00:00 AM', '7:30:00 AM', '8:00:00 AM', '8:30:00 AM', 
-            '9:00:00 AM', '9:30:00 AM', '10:00:00 AM', '10:30:00 AM', '11:00:00 AM', '11:30:00 AM',
-            '12:00:00 PM', '12:30:00 PM', '1:00:00 PM', '1:30:00 PM', '2:00:00 PM', '2:30:00 PM',
-            '3:00:00 PM', '3:30:00 PM', '4:00:00 PM', '4:30:00 PM', '5:00:00 PM', '5:30:00 PM',
-            '6:00:00 PM', '6:30:00 PM', '7:00:00 PM', '7:30:00 PM', '8:00:00 PM', '8:30:00 PM',
-            '9:00:00 PM', '9:30:00 PM', '10:00:00 PM', '10:30:00 PM', '11:00:00 PM', '11:30:00 PM'],
-    'Volume': [239901818.81, 244991276.09, 225345783.38, 239690642.99, 261409055.99, 286688826.43,
-              336935592.92, 365831601.29, 426891279.31, 475891128.44, 518967965.34, 558806726.45,
-              593022936.74, 611179510.15, 685317245.20, 667263464.74, 692677269.65, 697109566.67,
-              739877303.90, 735930672.71, 744234540.79, 759891766.66, 784129511.47, 760450859.64,
-              796315758.28, 783213808.44, 834070722.89, 841420254.91, 802473919.21, 800976384.25,
-              785374503.63, 766217167.73, 762218552.20, 721923234.09, 658575263.68, 643863311.42,
-              611843138.71, 611227839.98, 585600775.32, 533709014.43, 509964810.15, 461427440.03,
-              444715572.40, 400121854.04, 355988522.99, 336914663.10, 293197740.74, 250658084.10],
-    'Count': [13227, 12799, 12627, 13473, 15001, 16630, 19864, 22101, 26156, 29393, 32579, 35504,
-              38688, 40719, 44114, 43998, 46626, 47937, 50107, 50920, 53048, 51906, 54098, 54047,
-              56413, 66726, 69391, 60756, 60297, 60479, 59526, 58740, 56640, 53619, 50586, 48568,
-              45561, 44122, 40435, 37372, 33066, 29971, 27130, 24256, 21395, 19049, 16791, 14891]
-})
-
-# Country data - excluding Unknown
-country_data = pd.DataFrame({
-    'Country': ['CAN', 'FIN', 'GBR', 'GER', 'IRL', 'KEN', 'NGA', 'UGA', 'USA', 'Unknown'],
-    'Volume': [1517951948.64, 307421630.62, 11315946583.70, 101630751.00, 153890861.47,
-               846415656.43, 101777855.36, 896761980.11, 6791147045.70, 4772819388.13],
-    'Transactions': [118717, 28193, 864380, 6034, 10630, 68183, 9028, 1609, 402476, 327200],
-    'Market_Share': [5.66, 1.15, 42.21, 0.38, 0.57, 3.16, 0.38, 3.35, 25.33, 17.81]
-})
-
-# Daily data 
-daily_data = pd.DataFrame({
-    'Day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
-    'Volume': [3446887082.69, 3542203701.92, 3856600588.57, 4174561072.82, 
-               5582156391.24, 3962547257.90, 2679492587.34],
-    'Count': [231857, 236668, 249814, 264715, 348966, 297996, 231426]
-})
-
-# Client data
-client_data = pd.DataFrame({
-    'Client': ['Lemfi', 'Cellulant', 'Nala', 'DLocal', 'Wapipay', 'Hello FXBud', 
-              'Finpesa', 'Tangent', 'Others'],
-    'Volume': [11606556833.85, 6280089643.65, 8055904624.99, 248808932.68, 
-               1510015.74, 617699.08, 973692826.00, 76931592.49, 0.00],
-    'Transactions': [836080, 443517, 560706, 16028, 174, 103, 1571, 3090, 0],
-    'Market_Share': [42.60, 23.05, 29.57, 0.91, 0.01, 0.00, 3.57, 0.28, 0.00]
-})
+# Graphs start as sized placeholders and are filled once their card is in view
+def lazy_graph(card, height):
+    import figures
 
-# Start App Layout
-app.layout = dbc.Container([
-    # Header
-    dbc.Row([
-        dbc.Col([
-            html.Div([
-                html.Img(
-                    src='assets/vngrd.PNG',
-                    className='logo', 
-                    style={'height': '150px', 'object-fit': 'contain'}
-                )
-            ], style={
-                'display': 'flex', 
-                'justifyContent': 'center', 
-                'alignItems': 'center', 
-                'padding': '40px', 
-                'marginBottom': '30px', 
-                'width': '100%'
-            }),
-            html.H1(
-                "2024 Mobile Wallet Transfer Analysis", 
-                className="text-primary text-center mb-4",
-                style={'letterSpacing': '2px'}
-            )
-        ])
-    ]),
-
-    # Key Metrics Cards
-    dbc.Row([
-        # Total Transactions Card
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Annual Transactions", className="card-title text-center"),
-                    html.H2(
-                        f"{monthly_data['Transactions'].sum():,.0f}", 
-                        className="text-primary text-center"
-                    ),
-                    html.P([
-                        html.Span("Monthly Average: ", className="regular-text"),
-                        html.Span(
-                            f"{monthly_data['Transactions'].mean():,.0f}",
-                            className="regular-text text-success"
-                        )
-                    ], className="text-center")
-                ])
-            ], className="shadow-sm")
-        ]),
-        
-        # Success Rate Card
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Average Success Rate", className="card-title text-center"),
-                    html.H2([
-                        f"{monthly_data['Success_Rate'].mean():.1f}",
-                        html.Small("%", className="text-muted")
-                    ], className="text-primary text-center"),
-                    html.P([
-                        html.Span("Peak: ", className="regular-text"),
-                        html.Span(
-                            f"{monthly_data['Success_Rate'].max():.1f}%",
-                            className="regular-text text-success"
-                        )
-                    ], className="text-center")
-                ])
-            ], className="shadow-sm")
-        ]),
-        
-        # Total Volume Card
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Volume (KES)", className="card-title text-center"),
-                    html.H2(
-                        f"{monthly_data['Volume'].sum()/1e9:.2f}B", 
-                        className="text-primary text-center"
-                    ),
-                    html.P([
-                        html.Span("Monthly Average: ", className="regular-text"),
-                        html.Span(
-                            f"KES 2.27B",
-                            className="regular-text text-success"
-                        )
-                    ], className="text-center")
-                ])
-            ], className="shadow-sm")
-        ]),
+    return html.Div([
+        dcc.Store(id={'type': 'card-visible', 'card': card}),
+        # Clicked by assets/lazy_cards.js when the card scrolls into view
+        html.Button(id={'type': 'card-seen', 'card': card}, className='card-seen', style={'display': 'none'}),
+        dcc.Graph(
+            id={'type': 'card-graph', 'card': card},
+            figure=figures.placeholder(height)
+        )
+    ], className='lazy-card', **{'data-card': card})
 
-        # Unique Users Card
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Unique Users", className="card-title text-center"),
-                    html.H2(
-                        f"1M", 
-                        className="text-primary text-center"
-                    ),
-                    html.P([
-                        html.Span("Monthly Growth Rate: ", className="regular-text"),
-                        html.Span(
-                            f"27.66%",
-                            className="regular-text text-success"
-                        )
-                    ], className="text-center")
-                ])
-            ], className="shadow-sm")
-        ])
-    ], className="mb-4"),
-
-    # Monthly Trends
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Monthly Transaction Analysis"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Bar(
-                                name='Volume',
-                                x=monthly_data['Month'],
-                                y=monthly_data['Volume']/1e6,
-                                marker_color='rgba(26, 118, 255, 0.8)',
-                                yaxis='y'
-                            ),
-                            go.Scatter(
-                                name='Success Rate',
-                                x=monthly_data['Month'],
-                                y=monthly_data['Success_Rate'],
-                                mode='lines+markers',
-                                marker=dict(
-                                    size=8,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                line=dict(
-                                    width=2,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                yaxis='y2'
-                            )
-                        ]).update_layout(
-                            title='Monthly Volume and Success Rate Trends',
-                            yaxis=dict(
-                                title='Volume (KES Millions)',
-                                titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
-                                tickfont=dict(color='rgba(26, 118, 255, 0.8)')
-                            ),
-                            yaxis2=dict(
-                                title='Success Rate (%)',
-                                titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                overlaying='y',
-                                side='right',
-                                range=[90, 100]
-                            ),
-                            height=400,
-                            margin=dict(l=50, r=50, t=50, b=30),
-                            legend=dict(
-                                orientation="h",
-                                y=1.1,
-                                x=0.5,
-                                xanchor='center'
-                            )
-                        )
+
+# Graphs drawn by server callbacks, which wait for their section to come into view the same way
+def lazy_section(section, graph):
+    return html.Div([
+        dcc.Store(id={'type': 'section-visible', 'section': section}),
+        html.Button(
+            id={'type': 'section-seen', 'section': section}, className='card-seen', style={'display': 'none'}
+        ),
+        graph
+    ], className='lazy-card')
+
+
+# CSV and XLSX download links; the filters add their query string in the browser
+def export_links(name):
+    import export
+
+    return html.Span([
+        html.A(
+            fmt.upper(),
+            id={'type': 'export-link', 'name': name, 'format': fmt},
+            href=f'_export/{name}.{fmt}',
+            download=f'{name}.{fmt}',
+            className="ms-2"
+        ) for fmt in export.FORMATS
+    ], className="small regular-text")
+
+
+def _short_slot(label):
+    return label.replace(':00 ', ' ')
+
+
+# 1M, 1.23M, 45.6K
+def _compact(value):
+    for scale, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if value >= scale:
+            return f"{value / scale:.3g}{suffix}"
+    return f"{value:,}"
+
+
+# Text in the metric cards and chart notes, keyed by component id
+def summary_texts(tables):
+    import figures
+
+    monthly_data = tables['monthly']
+    daily_data = tables['daily']
+    hourly_data = tables['hourly']
+    client_data = tables['client']
+    failure_data = tables['failure']
+    users_data = tables['users']
+    months = max(len(monthly_data), 1)
+    peak_day = daily_data.loc[daily_data['Volume'].idxmax()]
+    top_client = client_data.loc[client_data['Market_Share'].idxmax()] if len(client_data) else None
+    return {
+        'total-transactions': f"{monthly_data['Transactions'].sum():,.0f}",
+        'avg-transactions': f"{monthly_data['Transactions'].sum() / months:,.0f}",
+        'avg-success-rate': f"{monthly_data['Success_Rate'].mean() if len(monthly_data) else 0:.1f}",
+        'peak-success-rate': f"{monthly_data['Success_Rate'].max() if len(monthly_data) else 0:.1f}%",
+        'total-volume': f"{monthly_data['Volume'].sum()/1e9:.2f}B",
+        'avg-volume': f"KES {monthly_data['Volume'].sum() / months / 1e9:.2f}B",
+        'peak-day': peak_day['Day'],
+        'peak-day-detail': f"(KES {daily_data['Volume'].max()/1e6:.1f}M, {daily_data['Count'].max():,} transactions)",
+        'total-failures': f"{failure_data['Total'].sum():,}",
+        'peak-volume-slot': _short_slot(hourly_data['Hour'][hourly_data['Volume'].idxmax()]),
+        'peak-volume': f"(KES {hourly_data['Volume'].max()/1e6:.1f}M)",
+        'peak-count-slot': _short_slot(hourly_data['Hour'][hourly_data['Count'].idxmax()]),
+        'peak-count': f"({hourly_data['Count'].max():,} transactions)",
+        'top-client': top_client['Client'] if top_client is not None else '-',
+        'top-client-share': f"({client_data['Market_Share'].max() if len(client_data) else 0:.1f}% market share)",
+        'active-countries': f"{figures.active_countries(tables):,}",
+        'total-users': _compact(users_data['Users'].iloc[0]),
+        'user-growth': f"{users_data['Monthly_Growth'].iloc[0]:.2f}%"
+    }
+
+
+SUMMARY_IDS = [
+    'total-transactions', 'avg-transactions', 'avg-success-rate', 'peak-success-rate',
+    'total-volume', 'avg-volume', 'peak-day', 'peak-day-detail', 'total-failures',
+    'peak-volume-slot', 'peak-volume', 'peak-count-slot', 'peak-count', 'top-client',
+    'top-client-share', 'total-users', 'user-growth'
+]
+
+
+# Tenants of a partitioned store, the one shown by default first
+def _tenants(data):
+    if data.source != 'partitions':
+        return []
+    index = data.index
+    return [index.tenant] + [tenant for tenant in index.tenants if tenant != index.tenant]
+
+
+# The years on show and whose data it is
+DEFAULT_YEARS = '2024'
+DEFAULT_PORTFOLIO = 'Mobile Wallet Transfer'
+
+
+def dashboard_title(data, selection=None):
+    start, end, _, _, tenant = selection or (None, None, (), (), None)
+    index = data.index
+    name, first, last = DEFAULT_PORTFOLIO, None, None
+    if data.source == 'partitions':
+        tenant = tenant or index.tenant
+        name = index.titles.get(tenant, tenant)
+        first, last = index.span(tenant)
+    elif index is not None:
+        first, last = index.first_day, index.last_day
+    first, last = start or first, end or last
+    if not first or not last:
+        years = DEFAULT_YEARS
+    elif first[:4] == last[:4]:
+        years = first[:4]
+    else:
+        years = f'{first[:4]}–{last[:4]}'
+    return f'{years} {name} Analysis'
+
+
+# Tenant, date range, client and country filters; hidden when the data has no per-day
+# buckets, and the tenant only shown when there is more than one
+def filter_bar(data):
+    index = data.index
+    tenants = _tenants(data)
+    return dbc.Card([
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dcc.Dropdown(
+                        id='filter-tenant',
+                        options=[{'label': index.titles[tenant], 'value': tenant} for tenant in tenants],
+                        value=tenants[0] if tenants else None,
+                        clearable=False
                     )
-                ])
-            ], className="shadow-sm")
-        ], width=12)
-    ], className="mb-4"),
-
-    # Success Rate Gauge and User Activity
-    dbc.Row([
-        # Success Rate Gauge
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Success Rate Performance"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(
-                            go.Indicator(
-                                mode="gauge+number",
-                                value=monthly_data['Success_Rate'].mean(),
-                                title={"text": "Average Success Rate",
-                                       "font": {"size": 16},
-                                       "align": "center"},
-                                number={"suffix": "%",
-                                       "font": {"size": 28}},
-                                gauge={
-                                    'axis': {'range': [0, 100]},
-                                    'bar': {'color': "#006400"},  # Dark green
-                                    'steps': [
-                                        {'range': [0, 75], 'color': 'rgba(0, 100, 0, 0.2)'},
-                                        {'range': [75, 85], 'color': 'rgba(0, 100, 0, 0.4)'},
-                                        {'range': [85, 100], 'color': 'rgba(0, 100, 0, 0.6)'}
-                                    ],
-                                    'threshold': {
-                                        'line': {'color': "red", 'width': 2},
-                                        'thickness': 0.75,
-                                        'value': monthly_data['Success_Rate'].mean()
-                                    }
-                                }
-                            )
-                        ).update_layout(
-                            height=300,
-                            margin=dict(l=30, r=30, t=30, b=30)
-                        )
+                ], width=3, style=None if len(tenants) > 1 else {'display': 'none'}),
+                dbc.Col([
+                    dcc.DatePickerRange(
+                        id='filter-dates',
+                        min_date_allowed=index.first_day if index else None,
+                        max_date_allowed=index.last_day if index else None,
+                        start_date=index.first_day if index else None,
+                        end_date=index.last_day if index else None,
+                        display_format='D MMM YYYY'
                     )
-                ])
-            ], className="shadow-sm")
-        ], width=4),
-
-        # User Activity Metrics
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("User Activity Metrics"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Scatter(
-                                x=[0.2, 0.5, 0.8],
-                                y=[1.15, 1.15, 1.15],
-                                mode='text',
-                                text=['🌍', '👥', '👤'],
-                                textfont=dict(size=24),
-                                hoverinfo='none',
-                                showlegend=False
-                            ),
-                            go.Scatter(
-                                x=[0.2, 0.5, 0.8],
-                                y=[1, 1, 1],
-                                mode='text',
-                                text=['Active Countries', 'Total Remitters', 'Total Recipients'],
-                                textfont=dict(size=14),
-                                hoverinfo='none',
-                                showlegend=False
-                            ),
-                            go.Scatter(
-                                x=[0.2, 0.5, 0.8],
-                                y=[0.85, 0.85, 0.85],
-                                mode='text',
-                                text=[
-                                    f"64",
-                                    f"{monthly_data['Unique_Remitters'].sum():,}",
-                                    f"{monthly_data['Unique_Recipients'].sum():,}"
-                                ],
-                                textfont=dict(size=24, color='#2E86C1'),
-                                hoverinfo='none',
-                                showlegend=False
-                            )
-                        ]).update_layout(
-                            height=300,
-                            showlegend=False,
-                            xaxis=dict(
-                                showgrid=False,
-                                zeroline=False,
-                                showticklabels=False,
-                                range=[0, 1]
-                            ),
-                            yaxis=dict(
-                                showgrid=False,
-                                zeroline=False,
-                                showticklabels=False,
-                                range=[0.5, 1.2]
-                            ),
-                            margin=dict(l=20, r=20, t=20, b=20),
-                            paper_bgcolor='white',
-                            plot_bgcolor='white'
-                        )
+                ], width='auto'),
+                dbc.Col([
+                    dcc.Dropdown(
+                        id='filter-clients',
+                        options=index.clients if index else [],
+                        multi=True,
+                        placeholder='All clients'
                     )
-                ])
-            ], className="shadow-sm")
-        ], width=8)
-    ], className="mb-4"),
-
-    # User Activity and Geographic Distribution
-    dbc.Row([
-        # User Activity
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Monthly User Activity"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Bar(
-                                name='Remitters',
-                                x=monthly_data['Month'],
-                                y=monthly_data['Unique_Remitters'],
-                                marker_color='rgba(26, 118, 255, 0.8)'
-                            ),
-                            go.Bar(
-                                name='Recipients',
-                                x=monthly_data['Month'],
-                                y=monthly_data['Unique_Recipients'],
-                                marker_color='rgba(255, 128, 0, 0.8)'
-                            )
-                        ]).update_layout(
-                            title='Monthly Active Users',
-                            barmode='group',
-                            height=400,
-                            margin=dict(l=50, r=50, t=50, b=30),
-                            legend=dict(
-                                orientation="h",
-                                y=1.1,
-                                x=0.5,
-                                xanchor='center'
-                            )
-                        )
+                ]),
+                dbc.Col([
+                    dcc.Dropdown(
+                        id='filter-countries',
+                        options=index.countries if index else [],
+                        multi=True,
+                        placeholder='All countries'
                     )
-                ])
-            ], className="shadow-sm")
-        ], width=6),
-        
-        # Geographic Distribution
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Geographic Distribution"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(
-                            go.Pie(
-                                labels=country_data['Country'],
-                                values=country_data['Volume'],
-                                textinfo='label+percent',
-                                hole=0.3
-                            )
-                        ).update_layout(
-                            title='Transaction Volume by Country',
-                            height=400,
-                            margin=dict(l=50, r=50, t=50, b=30)
-                        )
+                ]),
+                dbc.Col([
+                    html.Span("Export rows", className="small regular-text text-muted"),
+                    export_links('buckets')
+                ], width='auto')
+            ], className="g-2 align-items-center")
+        ])
+    ], className="shadow-sm mb-4", style=None if index else {'display': 'none'})
+
+
+# Seconds between live-mode version checks
+LIVE_INTERVAL = float(os.environ.get('LIVE_INTERVAL', 10))
+
+
+# Start App Layout
+def build_layout(data):
+    import cube
+    import figures
+
+    tables = data.tables
+    client_data = tables['client']
+    texts = summary_texts(tables)
+
+    return dbc.Container([
+        # Header
+        dbc.Row([
+            dbc.Col([
+                html.Div([
+                    logos.header_logo(
+                        className='logo',
+                        style={'height': '150px', 'object-fit': 'contain'}
                     )
-                ])
-            ], className="shadow-sm")
-        ], width=6)
-    ], className="mb-4"),
-
-    # Daily Patterns and Failure Analysis
-    dbc.Row([
-        # Daily Transaction Pattern
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Daily Transaction Pattern"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Bar(
-                                name='Volume',
-                                x=daily_data['Day'],
-                                y=daily_data['Volume']/1e6,
-                                marker_color='rgba(26, 118, 255, 0.8)',
-                                yaxis='y'
-                            ),
-                            go.Scatter(
-                                name='Transactions',
-                                x=daily_data['Day'],
-                                y=daily_data['Count'],
-                                mode='lines+markers',
-                                marker=dict(
-                                    size=8,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                line=dict(
-                                    width=2,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                yaxis='y2'
-                            )
-                        ]).update_layout(
-                            title='Daily Transaction Patterns',
-                            yaxis=dict(
-                                title='Volume (KES Millions)',
-                                titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
-                                tickfont=dict(color='rgba(26, 118, 255, 0.8)')
-                            ),
-                            yaxis2=dict(
-                                title='Number of Transactions',
-                                titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                overlaying='y',
-                                side='right'
-                            ),
-                            height=400,
-                            margin=dict(l=50, r=50, t=50, b=30),
-                            legend=dict(
-                                orientation="h",
-                                y=1.1,
-                                x=0.5,
-                                xanchor='center'
-                            )
-                        )
-                    ),
-                    html.Div([
+                ], style={
+                    'display': 'flex', 
+                    'justifyContent': 'center', 
+                    'alignItems': 'center', 
+                    'padding': '40px', 
+                    'marginBottom': '30px', 
+                    'width': '100%'
+                }),
+                html.H1(
+                    dashboard_title(data),
+                    id='dashboard-title',
+                    className="text-primary text-center mb-4",
+                    style={'letterSpacing': '2px'}
+                )
+            ])
+        ]),
+
+        # Display toggles, applied in the browser (assets/display.js), and live mode for
+        # wall screens; the browser remembers all of them
+        dbc.Row([
+            dbc.Col([
+                dbc.RadioItems(
+                    id='display-units',
+                    options=[{'label': 'KES M', 'value': 'M'}, {'label': 'KES B', 'value': 'B'}],
+                    value='M',
+                    inline=True,
+                    persistence=True,
+                    persistence_type='local'
+                )
+            ], width='auto'),
+            dbc.Col([
+                dbc.Switch(
+                    id='display-log',
+                    label="Log axis",
+                    value=False,
+                    persistence=True,
+                    persistence_type='local'
+                )
+            ], width='auto'),
+            dbc.Col([
+                dbc.Switch(
+                    id='display-percent',
+                    label="Pie %",
+                    value=True,
+                    persistence=True,
+                    persistence_type='local'
+                )
+            ], width='auto'),
+            dbc.Col([
+                dbc.Switch(
+                    id='live-mode',
+                    label="Live",
+                    value=False,
+                    persistence=True,
+                    persistence_type='local'
+                )
+            ], width='auto')
+        ], className="justify-content-end mb-2"),
+
+        # Filters
+        filter_bar(data),
+        dcc.Store(id='filters'),
+
+        # Key Metrics Cards
+        dbc.Row([
+            # Total Transactions Card
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Annual Transactions", className="card-title text-center"),
+                        html.H2(
+                            texts['total-transactions'],
+                            id='total-transactions',
+                            className="text-primary text-center"
+                        ),
                         html.P([
-                            "Peak Day: Friday ",
+                            html.Span("Monthly Average: ", className="regular-text"),
                             html.Span(
-                                f"(KES {daily_data['Volume'].max()/1e6:.1f}M, {daily_data['Count'].max():,} transactions)",
-                                className="text-muted"
+                                texts['avg-transactions'],
+                                id='avg-transactions',
+                                className="regular-text text-success"
                             )
-                        ], className="mb-0 mt-3 regular-text")
+                        ], className="text-center")
                     ])
-                ])
-            ], className="shadow-sm")
-        ], width=6),
+                ], className="shadow-sm")
+            ]),
         
-        # Failure Analysis
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Failure Analysis"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(
-                            go.Treemap(
-                                labels=failure_data['Reason'],
-                                parents=[''] * len(failure_data),
-                                values=failure_data['Total'],
-                                textinfo='label+value+percent parent',
-                                hovertemplate=(
-                                    "<b>%{label}</b><br>" +
-                                    "Count: %{value}<br>" +
-                                    "Percentage: %{percentParent:.1%}<extra></extra>"
-                                ),
-                                marker=dict(
-                                    colors=failure_data['Total'],
-                                    colorscale=[[0, '#ffebee'], [1, '#c62828']],
-                                    showscale=True
-                                ),
-                                textfont=dict(size=13)
-                            )
-                        ).update_layout(
-                            title='Transaction Failure Distribution',
-                            height=400,
-                            margin=dict(l=20, r=20, t=50, b=20)
-                        )
-                    ),
-                    html.Div([
+            # Success Rate Card
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Average Success Rate", className="card-title text-center"),
+                        html.H2([
+                            html.Span(texts['avg-success-rate'], id='avg-success-rate'),
+                            html.Small("%", className="text-muted")
+                        ], className="text-primary text-center"),
                         html.P([
-                            "Total Failed Transactions: ",
+                            html.Span("Peak: ", className="regular-text"),
                             html.Span(
-                                f"{failure_data['Total'].sum():,}",
-                                className="text-muted"
+                                texts['peak-success-rate'],
+                                id='peak-success-rate',
+                                className="regular-text text-success"
                             )
-                        ], className="mb-0 mt-3 regular-text text-center")
+                        ], className="text-center")
                     ])
-                ])
-            ], className="shadow-sm")
-        ], width=6)
-    ], className="mb-4"),
-
-    # Hourly Transaction Pattern
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Hourly Transaction Pattern"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Scatter(
-                                x=hourly_data['Hour'],
-                                y=hourly_data['Volume']/1e6,
-                                mode='lines+markers',
-                                name='Volume',
-                                marker=dict(
-                                    size=6,
-                                    color='rgba(26, 118, 255, 0.8)'
-                                ),
-                                line=dict(
-                                    width=2,
-                                    color='rgba(26, 118, 255, 0.8)'
-                                ),
-                                yaxis='y'
-                            ),
-                            go.Scatter(
-                                x=hourly_data['Hour'],
-                                y=hourly_data['Count'],
-                                mode='lines+markers',
-                                name='Transaction Count',
-                                marker=dict(
-                                    size=6,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                line=dict(
-                                    width=2,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                yaxis='y2'
-                            )
-                        ]).update_layout(
-                            title='Hourly Volume and Transaction Count Distribution',
-                            xaxis_title='Hour of Day',
-                            yaxis=dict(
-                                title='Volume (KES Millions)',
-                                titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
-                                tickfont=dict(color='rgba(26, 118, 255, 0.8)')
-                            ),
-                            yaxis2=dict(
-                                title='Number of Transactions',
-                                titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                overlaying='y',
-                                side='right'
-                            ),
-                            height=350,
-                            margin=dict(l=50, r=50, t=50, b=100),
-                            legend=dict(
-                                orientation="h",
-                                y=1.1,
-                                x=0.5,
-                                xanchor='center'
-                            ),
-                            xaxis=dict(
-                                tickangle=-45,
-                                tickmode='array',
-                                ticktext=hourly_data['Hour'],
-                                tickvals=list(range(len(hourly_data)))
-                            )
-                        )
-                    ),
-                    html.Div([
+                ], className="shadow-sm")
+            ]),
+        
+            # Total Volume Card
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Volume (KES)", className="card-title text-center"),
+                        html.H2(
+                            texts['total-volume'],
+                            id='total-volume',
+                            className="text-primary text-center"
+                        ),
                         html.P([
-                            "Peak Volume: 1:30 PM ",
-                            html.Span(
-                                f"(KES {hourly_data['Volume'].max()/1e6:.1f}M)",
-                                className="text-muted"
-                            ),
-                            html.Br(),
-                            "Peak Transactions: 1:00 PM ",
+                            html.Span("Monthly Average: ", className="regular-text"),
                             html.Span(
-                                f"({hourly_data['Count'].max():,} transactions)",
-                                className="text-muted"
+                                texts['avg-volume'],
+                                id='avg-volume',
+                                className="regular-text text-success"
                             )
-                        ], className="mb-0 mt-3 regular-text")
+                        ], className="text-center")
                     ])
-                ])
-            ], className="shadow-sm")
-        ], width=12)
-    ], className="mb-4"),
-
-    # Client Market Share and Performance
-    dbc.Row([
-        # Client Market Share
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Client Market Share"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(
-                            data=[go.Pie(
-                                labels=client_data['Client'],
-                                values=client_data['Volume'],
-                                textinfo='label+percent',
-                                hole=0.4,
-                                marker=dict(
-                                    colors=['rgb(82, 109, 255)', 'rgb(255, 99, 71)', 
-                                           'rgb(32, 178, 170)', 'rgb(255, 159, 64)',
-                                           'rgb(153, 102, 255)', 'rgb(255, 99, 132)',
-                                           'rgb(75, 192, 192)', 'rgb(54, 162, 235)']
-                                ),
-                                hovertemplate=(
-                                    "<b>%{label}</b><br>" +
-                                    "Volume: KES %{value:,.2f}<br>" +
-                                    "Share: %{percent}<extra></extra>"
-                                )
-                            )]
-                        ).update_layout(
-                            title={
-                                'text': 'Transaction Volume by Client',
-                                'y': 0.95,
-                                'x': 0.5,
-                                'xanchor': 'center',
-                                'yanchor': 'top'
-                            },
-                            height=400,
-                            margin=dict(l=20, r=20, t=50, b=20),
-                            showlegend=True,
-                            legend=dict(
-                                orientation="v",
-                                yanchor="middle",
-                                y=0.5,
-                                xanchor="left",
-                                x=1.1,
-                                font=dict(size=11)
+                ], className="shadow-sm")
+            ]),
+
+            # Unique Users Card
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Unique Users", className="card-title text-center"),
+                        html.H2(
+                            texts['total-users'],
+                            id='total-users',
+                            className="text-primary text-center"
+                        ),
+                        html.P([
+                            html.Span("Monthly Growth Rate: ", className="regular-text"),
+                            html.Span(
+                                texts['user-growth'],
+                                id='user-growth',
+                                className="regular-text text-success"
                             )
-                        )
+                        ], className="text-center")
+                    ])
+                ], className="shadow-sm")
+            ])
+        ], className="mb-4"),
+
+        # Monthly Trends
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        ["Monthly Transaction Analysis", export_links('monthly-trends')],
+                        className="d-flex justify-content-between align-items-center"
                     ),
-                    html.Div(
-                        [
-                            html.Div([
-                                html.Img(
-                                    src=f'assets/{CLIENT_LOGOS[client]}',
-                                    style={
-                                        'width': '60px',
-                                        'height': '30px',
-                                        'objectFit': 'contain',
-                                        'margin': '5px',
-                                        'padding': '5px',
-                                        'backgroundColor': '#ffffff',
-                                        'borderRadius': '4px',
-                                        'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'
-                                    }
+                    dbc.CardBody([
+                        lazy_graph('monthly-trends', 400)
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4"),
+
+        # Success Rate Gauge and User Activity
+        dbc.Row([
+            # Success Rate Gauge
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Success Rate Performance"),
+                    dbc.CardBody([
+                        lazy_graph('success-gauge', 300)
+                    ])
+                ], className="shadow-sm")
+            ], width=4),
+
+            # User Activity Metrics
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("User Activity Metrics"),
+                    dbc.CardBody([
+                        lazy_graph('user-activity', 300)
+                    ])
+                ], className="shadow-sm")
+            ], width=8)
+        ], className="mb-4"),
+
+        # User Activity and Geographic Distribution
+        dbc.Row([
+            # User Activity
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Monthly User Activity"),
+                    dbc.CardBody([
+                        lazy_graph('monthly-users', 400)
+                    ])
+                ], className="shadow-sm")
+            ], width=6),
+        
+            # Geographic Distribution
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Geographic Distribution"),
+                    dbc.CardBody([
+                        lazy_graph('country-share', 400)
+                    ])
+                ], className="shadow-sm")
+            ], width=6)
+        ], className="mb-4"),
+
+        # Daily Patterns and Failure Analysis
+        dbc.Row([
+            # Daily Transaction Pattern
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Daily Transaction Pattern"),
+                    dbc.CardBody([
+                        lazy_graph('daily-pattern', 400),
+                        html.Div([
+                            html.P([
+                                "Peak Day: ",
+                                html.Span(texts['peak-day'], id='peak-day'),
+                                " ",
+                                html.Span(
+                                    texts['peak-day-detail'],
+                                    id='peak-day-detail',
+                                    className="text-muted"
                                 )
-                            ]) for client in client_data['Client'].unique() 
-                            if client in CLIENT_LOGOS
-                        ],
-                        style={
-                            'display': 'flex',
-                            'flexWrap': 'wrap',
-                            'justifyContent': 'center',
-                            'alignItems': 'center',
-                            'marginTop': '20px',
-                            'gap': '10px'
-                        }
+                            ], className="mb-0 mt-3 regular-text")
+                        ])
+                    ])
+                ], className="shadow-sm")
+            ], width=6),
+        
+            # Failure Analysis
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        ["Failure Analysis", export_links('failure-treemap')],
+                        className="d-flex justify-content-between align-items-center"
                     ),
-                    html.Div([
-                        html.P([
-                            "Top Client: Lemfi ",
-                            html.Span(
-                                f"({client_data['Market_Share'].max():.1f}% market share)",
-                                className="text-muted"
-                            )
-                        ], className="mb-0 mt-3 regular-text text-center")
+                    dbc.CardBody([
+                        lazy_graph('failure-treemap', 400),
+                        html.Div([
+                            html.P([
+                                "Total Failed Transactions: ",
+                                html.Span(
+                                    texts['total-failures'],
+                                    id='total-failures',
+                                    className="text-muted"
+                                )
+                            ], className="mb-0 mt-3 regular-text text-center")
+                        ])
                     ])
-                ])
-            ], className="shadow-sm")
-        ], width=6),
-
-        # Client Performance
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Client Performance Metrics"),
-                dbc.CardBody([
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Bar(
-                                name='Transactions',
-                                x=client_data['Client'],
-                                y=client_data['Transactions'],
-                                marker_color='rgba(26, 118, 255, 0.8)',
-                                yaxis='y'
-                            ),
-                            go.Scatter(
-                                name='Market Share (%)',
-                                x=client_data['Client'],
-                                y=client_data['Market_Share'],
-                                mode='lines+markers',
-                                marker=dict(
-                                    size=8,
-                                    color='rgba(255, 128, 0, 0.8)'
-                                ),
-                                line=dict(
-                                    width=2,
-                                    color='rgba(255, 128, 0, 0.8)'
+                ], className="shadow-sm")
+            ], width=6)
+        ], className="mb-4"),
+
+        # Hourly Transaction Pattern
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Hourly Transaction Pattern"),
+                    dbc.CardBody([
+                        lazy_graph('hourly-pattern', 350),
+                        html.Div([
+                            html.P([
+                                "Peak Volume: ",
+                                html.Span(texts['peak-volume-slot'], id='peak-volume-slot'),
+                                " ",
+                                html.Span(
+                                    texts['peak-volume'],
+                                    id='peak-volume',
+                                    className="text-muted"
                                 ),
-                                yaxis='y2'
-                            )
-                        ]).update_layout(
-                            title='Client Transaction Activity',
-                            yaxis=dict(
-                                title='Number of Transactions',
-                                titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
-                                tickfont=dict(color='rgba(26, 118, 255, 0.8)')
-                            ),
-                            yaxis2=dict(
-                                title='Market Share (%)',
-                                titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
-                                overlaying='y',
-                                side='right'
-                            ),
-                            height=400,
-                            margin=dict(l=50, r=50, t=50, b=100),
-                            legend=dict(
-                                orientation="h",
-                                y=1.1,
-                                x=0.5,
-                                xanchor='center'
-                            ),
-                            xaxis_tickangle=-45
-                        )
-                    )
-                ])
-            ], className="shadow-sm")
-        ], width=6)
-    ], className="mb-4")
+                                html.Br(),
+                                "Peak Transactions: ",
+                                html.Span(texts['peak-count-slot'], id='peak-count-slot'),
+                                " ",
+                                html.Span(
+                                    texts['peak-count'],
+                                    id='peak-count',
+                                    className="text-muted"
+                                )
+                            ], className="mb-0 mt-3 regular-text")
+                        ])
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4"),
+
+        # Client Market Share and Performance
+        dbc.Row([
+            # Client Market Share
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Client Market Share"),
+                    dbc.CardBody([
+                        lazy_graph('client-share', 400),
+                        html.Div(
+                            [
+                                html.Div([
+                                    logos.client_logo(
+                                        CLIENT_LOGOS[client],
+                                        style={
+                                            'width': '60px',
+                                            'height': '30px',
+                                            'objectFit': 'contain',
+                                            'margin': '5px',
+                                            'padding': '5px',
+                                            'backgroundColor': '#ffffff',
+                                            'borderRadius': '4px',
+                                            'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'
+                                        }
+                                    )
+                                ]) for client in client_data['Client'].unique() 
+                                if client in CLIENT_LOGOS
+                            ],
+                            style={
+                                'display': 'flex',
+                                'flexWrap': 'wrap',
+                                'justifyContent': 'center',
+                                'alignItems': 'center',
+                                'marginTop': '20px',
+                                'gap': '10px'
+                            }
+                        ),
+                        html.Div([
+                            html.P([
+                                "Top Client: ",
+                                html.Span(texts['top-client'], id='top-client'),
+                                " ",
+                                html.Span(
+                                    texts['top-client-share'],
+                                    id='top-client-share',
+                                    className="text-muted"
+                                )
+                            ], className="mb-0 mt-3 regular-text text-center")
+                        ])
+                    ])
+                ], className="shadow-sm")
+            ], width=6),
+
+            # Client Performance
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(
+                        ["Client Performance Metrics", export_links('client-performance')],
+                        className="d-flex justify-content-between align-items-center"
+                    ),
+                    dbc.CardBody([
+                        lazy_graph('client-performance', 400)
+                    ])
+                ], className="shadow-sm")
+            ], width=6)
+        ], className="mb-4"),
+
+        # Weekday x half-hour load, overall or for a single client
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Weekly Load Heatmap"),
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id='heatmap-client',
+                                    options=[
+                                        {'label': client, 'value': client}
+                                        for client in (data.index.clients if data.index is not None else [])
+                                    ],
+                                    placeholder="All clients"
+                                )
+                            ], width=4),
+                            dbc.Col([
+                                dbc.RadioItems(
+                                    id='heatmap-measure',
+                                    options=[
+                                        {'label': 'Volume', 'value': 'Volume'},
+                                        {'label': 'Count', 'value': 'Count'}
+                                    ],
+                                    value='Volume',
+                                    inline=True
+                                )
+                            ], width='auto')
+                        ], className="g-2 align-items-center"),
+                        lazy_section('heatmap', dcc.Graph(id='heatmap-graph', figure=figures.placeholder(400)))
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4", style=None if data.index is not None else {'display': 'none'}),
+
+        # Half-hourly timeline, downsampled to the visible range on every zoom
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Transaction Timeline"),
+                    dbc.CardBody([
+                        lazy_section('timeline', dcc.Graph(id='timeline-graph', figure=figures.placeholder(400)))
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4", style=None if data.index is not None else {'display': 'none'}),
+
+        # Drill-down across client, country, month, weekday and half-hour
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Drill-down"),
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                html.P(
+                                    "Click a client, country, month, day or half-hour in the charts above",
+                                    id='drill-selection',
+                                    className="mb-0 regular-text"
+                                )
+                            ]),
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id='drill-by',
+                                    options=[
+                                        {'label': title, 'value': dim}
+                                        for dim, title in cube.DIMENSION_TITLES.items()
+                                    ],
+                                    value='month',
+                                    clearable=False
+                                )
+                            ], width=3),
+                            dbc.Col([
+                                dbc.Button("Clear", id='drill-clear', color="secondary", outline=True, size="sm")
+                            ], width='auto')
+                        ], className="g-2 align-items-center"),
+                        lazy_section('drill', dcc.Graph(id='drill-graph', figure=figures.placeholder(350))),
+                        dcc.Store(id='drill', data={})
+                    ])
+                ], className="shadow-sm")
+            ], width=12)
+        ], className="mb-4", style=None if data.index is not None else {'display': 'none'}),
+
+        # Live mode: the version this page has, and the values its live cards and metrics show
+        dcc.Interval(id='live-tick', interval=LIVE_INTERVAL * 1000, disabled=True),
+        dcc.Store(id='live-version', data=data.version),
+        dcc.Store(id='live-state', data={
+            'selection': None,
+            'texts': texts,
+            'series': live.series(tables)
+        })
+
+    ], fluid=True, className="p-4")
+
+
+# Cold start: a layout written ahead of time with python app.py --write-layout PATH
+# is served from LAYOUT_PATH while the data loads in the background. It is used only
+# if the code and the source files are the ones it was written from.
+LAYOUT_PATH = os.environ.get('LAYOUT_PATH')
+
+
+def _layout_key():
+    return {
+        'code': result_cache.CODE_VERSION,
+        'logos': logos.VERSION,
+        'sources': [[os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in dataset.source_paths()]
+    }
+
+
+def write_layout(path):
+    data = dataset.current()
+    layout = build_layout(data)
+    validate_layout(layout, layout)
+    header = dict(_layout_key(), version=data.version)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(json.dumps(header) + '\n')
+        f.write(to_json(layout))
+    os.replace(tmp, path)
+    return data.version
+
+
+# (data version, Payload) from LAYOUT_PATH, or None when it is missing or stale
+def read_layout(path):
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            body = f.read()
+        if {k: header.get(k) for k in ('code', 'logos', 'sources')} != _layout_key():
+            return None
+    except (OSError, ValueError):
+        return None
+    return header['version'], figure_cache.Payload(body)
+
+
+prebuilt = read_layout(LAYOUT_PATH) if LAYOUT_PATH else None
+
+
+def serve_layout():
+    # Dash calls this once when it is assigned and again to check ids on the first request;
+    # a prebuilt layout was checked when it was written, so until the data is in they get a stand-in
+    if prebuilt is not None and dataset.loaded() is None:
+        return html.Div()
+    return build_layout(dataset.current())
+
+
+app.layout = serve_layout
+
+
+# Lazy card loading
+app.clientside_callback(
+    ClientsideFunction(namespace='lazy', function_name='seen'),
+    Output({'type': 'card-visible', 'card': MATCH}, 'data'),
+    Input({'type': 'card-seen', 'card': MATCH}, 'n_clicks'),
+    prevent_initial_call=True
+)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='lazy', function_name='seen'),
+    Output({'type': 'section-visible', 'section': MATCH}, 'data'),
+    Input({'type': 'section-seen', 'section': MATCH}, 'n_clicks'),
+    prevent_initial_call=True
+)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='lazy', function_name='load_figure'),
+    Output({'type': 'card-graph', 'card': MATCH}, 'figure'),
+    Input({'type': 'card-visible', 'card': MATCH}, 'data'),
+    Input('filters', 'data'),
+    State({'type': 'card-visible', 'card': MATCH}, 'id'),
+    State('display-units', 'value'),
+    State('display-log', 'value'),
+    State('display-percent', 'value'),
+    prevent_initial_call=True
+)
+
+
+# Display toggles rework the figures already in the browser; no request reaches the server
+DISPLAY_INPUTS = [Input('display-units', 'value'), Input('display-log', 'value'), Input('display-percent', 'value')]
+
+app.clientside_callback(
+    ClientsideFunction(namespace='display', function_name='cards'),
+    Output({'type': 'card-graph', 'card': ALL}, 'figure', allow_duplicate=True),
+    DISPLAY_INPUTS,
+    State({'type': 'card-graph', 'card': ALL}, 'figure'),
+    prevent_initial_call=True
+)
+
+
+# Graphs drawn by server callbacks also get the toggles applied to each new figure
+for graph_id in ('heatmap-graph', 'timeline-graph', 'drill-graph'):
+    app.clientside_callback(
+        ClientsideFunction(namespace='display', function_name='graph'),
+        Output(graph_id, 'figure', allow_duplicate=True),
+        DISPLAY_INPUTS,
+        Input(graph_id, 'figure'),
+        prevent_initial_call=True
+    )
+
+
+# Filtering
+app.clientside_callback(
+    ClientsideFunction(namespace='filters', function_name='selection'),
+    Output('filters', 'data'),
+    Input('filter-dates', 'start_date'),
+    Input('filter-dates', 'end_date'),
+    Input('filter-clients', 'value'),
+    Input('filter-countries', 'value'),
+    Input('filter-tenant', 'value'),
+    State('filter-dates', 'min_date_allowed'),
+    State('filter-dates', 'max_date_allowed'),
+    State('filter-tenant', 'options'),
+    prevent_initial_call=True
+)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='filters', function_name='export_links'),
+    Output({'type': 'export-link', 'name': ALL, 'format': ALL}, 'href'),
+    Input('filters', 'data'),
+    State({'type': 'export-link', 'name': ALL, 'format': ALL}, 'id'),
+    prevent_initial_call=True
+)
+
+
+@app.callback(
+    [Output(summary_id, 'children') for summary_id in SUMMARY_IDS],
+    Output('dashboard-title', 'children'),
+    Input('filters', 'data'),
+    prevent_initial_call=True
+)
+def update_summaries(selection):
+    import filters
+
+    selection = filters.normalize(**selection) if selection else None
+    data = dataset.current()
+    texts = summary_texts(data.filtered_tables(selection))
+    return [texts[summary_id] for summary_id in SUMMARY_IDS] + [dashboard_title(data, selection)]
+
+
+# Another tenant has its own clients, countries and history; its whole history is shown first
+@app.callback(
+    Output('filter-clients', 'options'),
+    Output('filter-clients', 'value'),
+    Output('filter-countries', 'options'),
+    Output('filter-countries', 'value'),
+    Output('filter-dates', 'min_date_allowed'),
+    Output('filter-dates', 'max_date_allowed'),
+    Output('filter-dates', 'start_date'),
+    Output('filter-dates', 'end_date'),
+    Output('heatmap-client', 'options'),
+    Output('heatmap-client', 'value'),
+    Input('filter-tenant', 'value'),
+    prevent_initial_call=True
+)
+def switch_tenant(tenant):
+    index = dataset.current().index
+    if not tenant or not hasattr(index, 'span'):
+        raise PreventUpdate
+    clients = index.clients_of(tenant)
+    first, last = index.span(tenant)
+    return (
+        clients, [], index.countries_of(tenant), [], first, last, first, last,
+        [{'label': client, 'value': client} for client in clients], None
+    )
+
+
+# Live mode
+app.clientside_callback(
+    ClientsideFunction(namespace='live', function_name='toggle'),
+    Output('live-tick', 'disabled'),
+    Input('live-mode', 'value')
+)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='live', function_name='poll'),
+    Output('live-version', 'data'),
+    Input('live-tick', 'n_intervals'),
+    State('live-version', 'data'),
+    prevent_initial_call=True
+)
+
+
+# Runs only when the version changed, and sends only what changed with it
+@app.callback(
+    [Output(summary_id, 'children', allow_duplicate=True) for summary_id in SUMMARY_IDS],
+    [Output({'type': 'card-graph', 'card': card}, 'figure', allow_duplicate=True) for card in live.CARDS],
+    Output('live-state', 'data'),
+    Input('live-version', 'data'),
+    State('live-state', 'data'),
+    State('filters', 'data'),
+    State('display-units', 'value'),
+    [State({'type': 'card-visible', 'card': card}, 'data') for card in live.CARDS],
+    prevent_initial_call=True
+)
+def live_update(version, state, selection, units, *visible):
+    import figures
+    import filters
+
+    tables = dataset.current().filtered_tables(filters.normalize(**selection) if selection else None)
+    # Patches carry volume in the units the browser shows; after a units toggle every value differs,
+    # so the next patch replaces the series whole
+    series = live.series(tables, figures.VOLUME_UNITS.get(units, 1e6))
+    current = {'selection': selection, 'texts': summary_texts(tables), 'series': series}
+    # A filter change already reloads the cards and metrics, so it only moves the baseline
+    if state is None or state.get('selection') != selection:
+        return [no_update] * (len(SUMMARY_IDS) + len(live.CARDS)) + [current]
+    texts = live.text_updates(state['texts'], current['texts'], SUMMARY_IDS)
+    # Cards not loaded yet will fetch the new figure when they scroll into view
+    patches = [
+        live.figure_patch(state['series'][card], current['series'][card]) if shown else no_update
+        for card, shown in zip(live.CARDS, visible)
+    ]
+    return texts + patches + [current]
+
+
+# Visible x range from a zoom or pan; (None, None) for a reset, None for anything else
+def _zoom_range(relayout):
+    relayout = relayout or {}
+    if 'xaxis.range[0]' in relayout:
+        return relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    if 'xaxis.range' in relayout:
+        return tuple(relayout['xaxis.range'])
+    if relayout.get('xaxis.autorange'):
+        return None, None
+    return None
+
+
+@app.callback(
+    Output('timeline-graph', 'figure'),
+    Input('filters', 'data'),
+    Input('timeline-graph', 'relayoutData'),
+    Input({'type': 'section-visible', 'section': 'timeline'}, 'data'),
+    prevent_initial_call=True
+)
+def render_timeline(selection, relayout, visible):
+    import downsample
+    import figures
+    import filters
+
+    index = dataset.current().index
+    if index is None or not visible:
+        raise PreventUpdate
+    start, end = None, None
+    if ctx.triggered_id == 'timeline-graph':
+        zoom = _zoom_range(relayout)
+        if zoom is None:
+            raise PreventUpdate
+        start, end = zoom
+    selection = filters.normalize(**selection) if selection else None
+    times, volume, count = index.timeline(selection)
+    volume_times, volume = downsample.window(times, volume, start, end)
+    count_times, count = downsample.window(times, count, start, end)
+    # A new filter resets the zoom; zooming within one keeps it
+    return figures.timeline(
+        volume_times, volume, count_times, count,
+        'Half-hourly Volume and Transaction Count', repr(selection)
+    )
+
+
+# Drill-down, answered from the cube without touching the buckets
+DRILL_SOURCES = {
+    'client-share': 'client',
+    'client-performance': 'client',
+    'country-share': 'country',
+    'monthly-trends': 'month',
+    'daily-pattern': 'weekday',
+    'hourly-pattern': 'slot'
+}
+
+
+@app.callback(
+    Output('drill', 'data'),
+    [Input({'type': 'card-graph', 'card': card}, 'clickData') for card in DRILL_SOURCES],
+    Input('drill-clear', 'n_clicks'),
+    State('filters', 'data'),
+    State('drill', 'data'),
+    prevent_initial_call=True
+)
+def update_drill(*args):
+    import filters
+
+    drill = dict(args[-1] or {})
+    trigger = ctx.triggered_id
+    if trigger == 'drill-clear':
+        return {}
+    click = ctx.triggered[0]['value']
+    if not click or not click.get('points'):
+        raise PreventUpdate
+    selection = filters.normalize(**args[-2]) if args[-2] else None
+    data_cube = dataset.current().cube(selection)
+    if data_cube is None:
+        raise PreventUpdate
+    point = click['points'][0]
+    dim = DRILL_SOURCES[trigger['card']]
+    # The clicked card was drawn for the same selection, so its labels are this cube's
+    key = data_cube.key(dim, point.get('label', point.get('x')))
+    if key is None:
+        raise PreventUpdate
+    # Clicking a selected label again removes it
+    values = [value for value in drill.get(dim, []) if value != key]
+    if len(values) == len(drill.get(dim, [])):
+        values.append(key)
+    drill[dim] = values
+    return {dim: values for dim, values in drill.items() if values}
+
+
+@app.callback(
+    Output('drill-graph', 'figure'),
+    Output('drill-selection', 'children'),
+    Input('drill', 'data'),
+    Input('drill-by', 'value'),
+    Input('filters', 'data'),
+    Input({'type': 'section-visible', 'section': 'drill'}, 'data'),
+    prevent_initial_call=True
+)
+def render_drill(drill, by, selection, visible):
+    import cube
+    import figures
+    import filters
+
+    if not visible:
+        raise PreventUpdate
+    selection = filters.normalize(**selection) if selection else None
+    data_cube = dataset.current().cube(selection)
+    if data_cube is None:
+        raise PreventUpdate
+    # Drilled labels the filter bar now excludes are left out rather than matching nothing
+    drill = data_cube.known(drill or {})
+    total = data_cube.query(**drill)
+    frame = data_cube.query(by=(by,), **drill)
+    if by not in drill:
+        frame = frame[frame['count'] > 0]
+    frame = frame.assign(**{by: [data_cube.title(by, key) for key in frame[by]]})
+
+    def shown(dim, key):
+        return _short_slot(key) if dim == 'slot' else data_cube.title(dim, key)
+
+    selection = ' · '.join(
+        f"{cube.DIMENSION_TITLES[dim]}: {', '.join(shown(dim, v) for v in drill[dim])}"
+        for dim in cube.DIMENSIONS if dim in drill
+    ) or 'All transactions'
+    rate = total['success'] / total['count'] * 100 if total['count'] else 0
+    summary = [
+        selection + ' ',
+        html.Span(
+            f"(KES {total['volume']/1e6:,.1f}M, {total['count']:,} transactions, {rate:.1f}% success)",
+            className="text-muted"
+        )
+    ]
+    title = f"Volume and Success Rate by {cube.DIMENSION_TITLES[by]}"
+    return figures.drilldown(frame, by, title), summary
+
+
+@app.callback(
+    Output('heatmap-graph', 'figure'),
+    Input('heatmap-client', 'value'),
+    Input('heatmap-measure', 'value'),
+    Input('filters', 'data'),
+    Input({'type': 'section-visible', 'section': 'heatmap'}, 'data'),
+    prevent_initial_call=True
+)
+def render_heatmap(client, measure, selection, visible):
+    import figures
+    import filters
+
+    index = dataset.current().index
+    if index is None or not visible:
+        raise PreventUpdate
+    selection = filters.normalize(**selection) if selection else None
+    title = f"{'Volume' if measure == 'Volume' else 'Transactions'} by Day and Half-hour"
+    if client:
+        title += f" · {client}"
+    return figures.weekly_heatmap(index.week(selection, client), measure, title)
+
+
+# Pre-serialized, pre-compressed layout and figures, rebuilt once per data version
+payloads = figure_cache.FigureCache(shared=dataset.results)
+
+
+def _timed_layout(data):
+    return metrics.registry.timed('mockdash_build_duration_seconds', lambda: to_json(build_layout(data)),
+                                  payload='layout')
+
+
+def serve_cached_layout():
+    data = dataset.loaded()
+    if prebuilt is not None and (data is None or data.version == prebuilt[0]):
+        return figure_cache.respond(prebuilt[1])
+    data = dataset.current()
+    payload = payloads.get(data.version, 'layout', _timed_layout(data))
+    metrics.registry.observe('mockdash_payload_bytes', len(payload.body), payload='layout')
+    return figure_cache.respond(payload)
+
+
+# Replaces Dash's own _dash-layout view, which re-serializes on every page load
+server.view_functions[app.config.routes_pathname_prefix + '_dash-layout'] = serve_cached_layout
+
+
+@server.route(app.config.routes_pathname_prefix + '_figures/<card>')
+def serve_figure(card):
+    import figures
+    import filters
+
+    if card not in figures.CARDS:
+        abort(404)
+    data = dataset.current()
+    selection = filters.from_args(request.args)
+    payload = payloads.get(
+        data.version, (card, selection),
+        metrics.registry.timed(
+            'mockdash_build_duration_seconds',
+            lambda: to_json(figures.build(card, data.filtered_tables(selection))), payload=card
+        )
+    )
+    metrics.registry.observe('mockdash_payload_bytes', len(payload.body), payload=card)
+    return figure_cache.respond(payload)
+
+
+# A card's table, or every bucket the filter selects, streamed as CSV or XLSX
+@server.route(app.config.routes_pathname_prefix + '_export/<name>.<fmt>')
+def serve_export(name, fmt):
+    import export
+    import filters
+
+    data = dataset.current()
+    if fmt not in export.FORMATS or (name not in export.CARD_TABLES and name != export.BUCKETS):
+        abort(404)
+    selection = filters.from_args(request.args)
+    if name == export.BUCKETS:
+        if data.index is None:
+            abort(404)
+        frames = data.index.buckets(selection, export.CHUNK_ROWS)
+    else:
+        frames = [data.filtered_tables(selection)[export.CARD_TABLES[name]]]
+    response = Response(export.stream(frames, fmt, name), mimetype=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+# Logo images and the stylesheet bundle; their names change with their content
+@server.route(app.config.routes_pathname_prefix + '_static/<name>')
+def serve_static(name):
+    if name not in static_files.FILES:
+        abort(404)
+    response = send_from_directory(
+        static_files.STATIC_PATH, name, mimetype=static_files.mimetype(name), max_age=static_files.MAX_AGE
+    )
+    response.headers['Cache-Control'] = f'public, max-age={static_files.MAX_AGE}, immutable'
+    return response
+
+
+@server.route(app.config.routes_pathname_prefix + '_live/version')
+def serve_live_version():
+    data = dataset.current()
+    payload = payloads.get(data.version, 'live-version', lambda: to_json({'version': data.version}))
+    return figure_cache.respond(payload)
+
+
+# Background reloads warm the layout, so the first page load of a new version is a cache hit
+def warm_layout(data):
+    if prebuilt is not None and data.version == prebuilt[0]:
+        return
+    payloads.get(data.version, 'layout', _timed_layout(data))
+
+
+dataset.watch(on_load=warm_layout)
+if os.environ.get('INBOX_PATH'):
+    import rebuild
+    rebuild.start()
+
+
+# Compresses and caches what Dash serves itself: bundles, dependencies, callback responses
+compressor = compression.Compressor(
+    app.config.routes_pathname_prefix, lambda: getattr(dataset.loaded(), 'version', None)
+)
+server.after_request(compressor.after_request)
+
+
+# Callback response sizes before compression; registered after the compressor, so runs before it
+@server.after_request
+def record_callback_bytes(response):
+    if request.endpoint == CALLBACK_ENDPOINT and response.status_code == 200:
+        metrics.registry.observe('mockdash_payload_bytes', response.content_length or 0,
+                                 payload=_callback_name())
+    return response
+
+
+def _worker_metrics():
+    for cache, hits, misses in [('figures', payloads.hits, payloads.misses)] + [
+        (f'compression-{group}', stats['cache_hits'], stats['responses'] - stats['cache_hits'])
+        for group, stats in compressor.stats().items()
+    ]:
+        yield 'mockdash_cache_requests_total', {'cache': cache, 'result': 'hit'}, hits
+        yield 'mockdash_cache_requests_total', {'cache': cache, 'result': 'miss'}, misses
+    data = dataset.loaded()
+    if data is not None:
+        labels = {'version': data.version, 'source': data.source}
+        yield 'mockdash_data_loaded_timestamp_seconds', labels, data.loaded_at
+
+
+metrics.registry.collect(_worker_metrics)
+
+
+# Prometheus scrape target, added up across every worker on the host
+@server.route(app.config.routes_pathname_prefix + 'metrics')
+def serve_metrics():
+    extra = []
+    paths = [path for path in dataset.source_paths() if os.path.exists(path)]
+    if paths:
+        age = time.time() - max(os.path.getmtime(path) for path in paths)
+        extra.append(('mockdash_data_source_age_seconds', {}, age))
+    if dataset.results is not None:
+        stats = dataset.results.stats()
+        extra.append(('mockdash_result_cache_requests_total', {'result': 'hit'}, stats['hits']))
+        extra.append(('mockdash_result_cache_requests_total', {'result': 'miss'}, stats['misses']))
+    return Response(metrics.registry.render(extra), mimetype='text/plain; version=0.0.4')
+
+
+# Single requests profiled on demand when PROFILE_PATH is set (see profiling.py)
+profiling.install(server)
+
+
+# Bytes saved and time spent per endpoint group since the worker started
+@server.route(app.config.routes_pathname_prefix + '_compression/stats')
+def serve_compression_stats():
+    return jsonify(compressor.stats())
+
+
+# Shared result cache counters, for sizing RESULT_CACHE_MB and RESULT_CACHE_TTL
+@server.route(app.config.routes_pathname_prefix + '_cache/stats')
+def serve_cache_stats():
+    if dataset.results is None:
+        abort(404)
+    return jsonify(dataset.results.stats())
 
-], fluid=True, className="p-4")
 
 # Run the app
 if __name__ == '__main__':
+    # python app.py --write-layout PATH: prebuilt layout for LAYOUT_PATH, e.g. as part of the build
+    if sys.argv[1:2] == ['--write-layout']:
+        print(f'Layout for version {write_layout(sys.argv[2])} written to {sys.argv[2]}')
+        sys.exit()
     port = int(os.environ.get("PORT", 8080))
     app.run_server(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,126 @@
+// Presentation toggles (volume units, log axes, pie shares) applied to figures the browser
+// already has, so a toggle never reaches the server
+(function () {
+    var UNITS = {M: 1e6, B: 1e9};
+    var UNIT_NAMES = {M: 'Millions', B: 'Billions'};
+    // What figures.py builds: volume in millions, linear axes, pies labelled with percentages
+    var DEFAULTS = {units: 'M', log: false, percent: true};
+    // Traces on x/y axes; gauges, treemaps and heatmaps have none to rescale or log
+    var CARTESIAN = {bar: true, scatter: true, scattergl: true};
+
+    function settings(units, log, percent) {
+        return {
+            units: UNITS[units] ? units : DEFAULTS.units,
+            log: !!log,
+            percent: percent === undefined || percent === null ? DEFAULTS.percent : !!percent
+        };
+    }
+
+    // layout.meta.display records what was applied, so applying the same settings twice is a no-op
+    function applied(figure) {
+        var meta = figure.layout && figure.layout.meta;
+        return (meta && meta.display) || DEFAULTS;
+    }
+
+    function scale(values, ratio) {
+        return (values || []).map(function (value) {
+            return typeof value === 'number' ? value * ratio : value;
+        });
+    }
+
+    function retitle(axis, units) {
+        var title = axis && axis.title;
+        var text = typeof title === 'string' ? title : title && title.text;
+        if (!text) {
+            return axis;
+        }
+        text = text.replace(/Millions|Billions/, UNIT_NAMES[units]);
+        return Object.assign({}, axis, {
+            title: typeof title === 'string' ? text : Object.assign({}, title, {text: text})
+        });
+    }
+
+    function pieTemplates(trace, display) {
+        var value = 'KES %{value:,.2f}' + display.units;
+        return Object.assign(trace, {
+            texttemplate: display.percent ? '%{label}<br>%{percent}' : '%{label}<br>' + value,
+            hovertemplate: '<b>%{label}</b><br>Volume: ' + value + '<br>Share: %{percent}<extra></extra>'
+        });
+    }
+
+    // The weekly heatmap: z when it is volume, and the volume shown on hover either way
+    function heatmap(trace, ratio, display) {
+        var volume = trace.meta === 'volume';
+        return Object.assign({}, trace, {
+            z: volume ? (trace.z || []).map(function (row) { return scale(row, ratio); }) : trace.z,
+            customdata: (trace.customdata || []).map(function (row) {
+                return row.map(function (cell) { return [cell[0] * ratio].concat(cell.slice(1)); });
+            }),
+            colorbar: volume ? retitle(trace.colorbar, display.units) : trace.colorbar,
+            hovertemplate: '%{y} %{x}<br>KES %{customdata[0]:,.2f}' + display.units +
+                '<br>%{customdata[1]:,} transactions<extra></extra>'
+        });
+    }
+
+    // The figure with the settings applied, or null when they already are. Only traces
+    // marked as volume are rescaled; the log toggle applies to the primary y axis
+    function transform(figure, display) {
+        if (!figure || !figure.data || !figure.data.length) {
+            return null;
+        }
+        var was = applied(figure);
+        if (was.units === display.units && was.log === display.log && was.percent === display.percent) {
+            return null;
+        }
+        var ratio = UNITS[was.units] / UNITS[display.units];
+        var layout = Object.assign({}, figure.layout);
+        var cartesian = false;
+        var data = figure.data.map(function (trace) {
+            if (trace.type === 'pie') {
+                return trace.meta === 'volume'
+                    ? pieTemplates(Object.assign({}, trace, {values: scale(trace.values, ratio)}), display)
+                    : trace;
+            }
+            if (trace.type === 'heatmap') {
+                return heatmap(trace, ratio, display);
+            }
+            if (!CARTESIAN[trace.type]) {
+                return trace;
+            }
+            cartesian = true;
+            if (trace.meta !== 'volume') {
+                return trace;
+            }
+            var axis = 'yaxis' + (trace.yaxis || 'y').slice(1);
+            layout[axis] = retitle(layout[axis], display.units);
+            return Object.assign({}, trace, {y: scale(trace.y, ratio)});
+        });
+        if (cartesian) {
+            layout.yaxis = Object.assign({}, layout.yaxis, {type: display.log ? 'log' : 'linear'});
+        }
+        layout.meta = Object.assign({}, layout.meta, {display: display});
+        return Object.assign({}, figure, {data: data, layout: layout});
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        display: {
+            // For figures just fetched: always returns a figure
+            figure: function (figure, units, log, percent) {
+                return transform(figure, settings(units, log, percent)) || figure;
+            },
+
+            // Every card graph at once when a toggle changes
+            cards: function (units, log, percent, figures) {
+                var display = settings(units, log, percent);
+                return figures.map(function (figure) {
+                    return transform(figure, display) || window.dash_clientside.no_update;
+                });
+            },
+
+            // Graphs the server redraws, on a toggle and again whenever a new figure arrives
+            graph: function (units, log, percent, figure) {
+                return transform(figure, settings(units, log, percent)) || window.dash_clientside.no_update;
+            }
+        }
+    });
+})();
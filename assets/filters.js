@@ -0,0 +1,45 @@
+// Turns the filter bar into the selection sent with every figure request
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    filters: {
+        selection: function (start, end, clients, countries, tenant, minDate, maxDate, tenants) {
+            start = start && start.slice(0, 10);
+            end = end && end.slice(0, 10);
+            clients = clients || [];
+            countries = countries || [];
+            // The first tenant listed is the one shown without asking
+            if (tenants && tenants.length && tenant === tenants[0].value) {
+                tenant = null;
+            }
+            var fullRange = (!start || start === minDate) && (!end || end === maxDate);
+            // null means "everything", which every worker already has cached
+            if (fullRange && !clients.length && !countries.length && !tenant) {
+                return null;
+            }
+            return {
+                start: start || null,
+                end: end || null,
+                clients: clients.slice().sort(),
+                countries: countries.slice().sort(),
+                tenant: tenant || null
+            };
+        },
+
+        // Download links carry the same filter as the figure requests
+        export_links: function (selection, ids) {
+            var query = new URLSearchParams();
+            if (selection) {
+                ['start', 'end', 'tenant'].forEach(function (key) {
+                    if (selection[key]) {
+                        query.append(key, selection[key]);
+                    }
+                });
+                (selection.clients || []).forEach(function (c) { query.append('client', c); });
+                (selection.countries || []).forEach(function (c) { query.append('country', c); });
+            }
+            var suffix = query.toString() ? '?' + query.toString() : '';
+            return ids.map(function (id) {
+                return '_export/' + id.name + '.' + id.format + suffix;
+            });
+        }
+    }
+});
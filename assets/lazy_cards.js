@@ -0,0 +1,80 @@
+// Marks each .lazy-card visible once it nears the viewport so its figure can be requested.
+// The observer clicks the card's hidden card-seen button; nothing runs while nothing scrolls
+(function () {
+    var observer = null;
+
+    function reveal(card) {
+        var button = card.querySelector('.card-seen');
+        if (button) {
+            button.click();
+        }
+    }
+
+    function observeCards() {
+        document.querySelectorAll('.lazy-card:not([data-observed])').forEach(function (card) {
+            card.setAttribute('data-observed', '1');
+            if (observer) {
+                observer.observe(card);
+            } else {
+                reveal(card);
+            }
+        });
+    }
+
+    if ('IntersectionObserver' in window) {
+        observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    reveal(entry.target);
+                }
+            });
+        }, {rootMargin: '200px 0px'});
+    }
+
+    // Cards arrive whenever Dash renders the layout, so watch for them rather than poll
+    new MutationObserver(observeCards).observe(document.documentElement, {childList: true, subtree: true});
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        lazy: {
+            seen: function (n_clicks) {
+                return n_clicks ? true : window.dash_clientside.no_update;
+            },
+
+            // Figures come from a cacheable GET, so repeat visits revalidate with a 304;
+            // the display toggles are applied on arrival (see display.js)
+            load_figure: function (visible, filters, id, units, log, percent) {
+                if (!visible) {
+                    return window.dash_clientside.no_update;
+                }
+                var config = JSON.parse(document.getElementById('_dash-config').textContent);
+                var url = config.requests_pathname_prefix + '_figures/' + encodeURIComponent(id.card);
+                var query = new URLSearchParams();
+                if (filters) {
+                    if (filters.start) {
+                        query.append('start', filters.start);
+                    }
+                    if (filters.end) {
+                        query.append('end', filters.end);
+                    }
+                    (filters.clients || []).forEach(function (c) { query.append('client', c); });
+                    (filters.countries || []).forEach(function (c) { query.append('country', c); });
+                    if (filters.tenant) {
+                        query.append('tenant', filters.tenant);
+                    }
+                }
+                if (query.toString()) {
+                    url += '?' + query.toString();
+                }
+                return fetch(url, {cache: 'no-cache'}).then(function (response) {
+                    if (!response.ok) {
+                        throw new Error('Failed to load ' + url);
+                    }
+                    return response.json();
+                }).then(function (figure) {
+                    return window.dash_clientside.display.figure(figure, units, log, percent);
+                });
+            }
+        }
+    });
+})();
@@ -0,0 +1,23 @@
+// Live mode polling: a tick only asks for the data version, which is a 304 until it changes
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    live: {
+        toggle: function (on) {
+            return !on;
+        },
+
+        poll: function (n_intervals, known) {
+            var noUpdate = window.dash_clientside.no_update;
+            var config = JSON.parse(document.getElementById('_dash-config').textContent);
+            return fetch(config.requests_pathname_prefix + '_live/version', {cache: 'no-cache'})
+                .then(function (response) {
+                    return response.ok ? response.json() : null;
+                })
+                .then(function (body) {
+                    return body && body.version !== known ? body.version : noUpdate;
+                })
+                .catch(function () {
+                    return noUpdate;
+                });
+        }
+    }
+});
@@ -0,0 +1,41 @@
+# Compares two benchmark result files: python benchmarks/compare.py OLD.json NEW.json [--threshold 10]
+import argparse
+import json
+
+
+def flatten(node, prefix=''):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key not in ('meta', 'runs_ms', 'min_ms'):
+                yield from flatten(value, f'{prefix}.{key}' if prefix else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, node
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change reported as a regression')
+    args = parser.parse_args()
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    old_values, new_values = dict(flatten(old)), dict(flatten(new))
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    regressions = 0
+    for name, value in new_values.items():
+        if name not in old_values or not old_values[name]:
+            continue
+        change = (value - old_values[name]) / old_values[name] * 100
+        # Everything measured is a time or a size, so bigger is worse
+        worse = change > args.threshold and (name.endswith('_ms') or name.endswith('bytes'))
+        regressions += worse
+        flag = '  REGRESSION' if worse else ''
+        print(f'{name:70} {old_values[name]:>14,.1f} {value:>14,.1f} {change:+7.1f}%{flag}')
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+# Offline benchmark suite: import time, boot to first response, layout build, payload sizes,
+# ingestion and callback latency
+#
+#   python benchmarks/run.py [--rows N] [--repeat K] [--output PATH]
+#
+# Results are written as JSON (by default to benchmarks/results/<commit>.json);
+# compare two runs with python benchmarks/compare.py OLD.json NEW.json.
+import argparse
+import gzip
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(runs), 'min_ms': min(runs), 'runs_ms': runs}, result
+
+
+def sizes(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return {'bytes': len(body), 'gzip_bytes': len(gzip.compress(body, compresslevel=6))}
+
+
+# Variables an app process inherits; everything else, including the app's own settings
+# (data sources, tenant, layout, profiling, caches), is set by the benchmark or not at all
+INHERITED = ('PATH', 'HOME', 'USER', 'LANG', 'TMPDIR', 'TEMP', 'TMP', 'SYSTEMROOT', 'VIRTUAL_ENV')
+
+
+# Environment for a clean app process: no data source unless given, no shared cache or metrics files
+def app_env(**overrides):
+    env = {name: value for name, value in os.environ.items() if name in INHERITED or name.startswith('LC_')}
+    env.update(RESULT_CACHE_PATH='', METRICS_DIR='', PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.update(overrides)
+    return env
+
+
+def run_json(args, env):
+    output = subprocess.run(
+        [sys.executable] + args, cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Stages
+def bench_import(repeat):
+    code = 'import time; t = time.perf_counter(); import app; print((time.perf_counter() - t) * 1000)'
+    runs = [
+        float(subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, env=app_env(), check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1])
+        for _ in range(repeat)
+    ]
+    return {'app': {'median_ms': statistics.median(runs), 'min_ms': min(runs), 'runs_ms': runs}}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait(url, deadline):
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+                return
+        except (urllib.error.URLError, ConnectionError):
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+# A fresh server process, timed from launch until the page and then its layout answer over HTTP
+def bench_boot(env, repeat):
+    page, layout = [], []
+    for _ in range(repeat):
+        port = _free_port()
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=dict(env, PORT=str(port)),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait(f'http://127.0.0.1:{port}/', start + 120)
+            page.append((time.perf_counter() - start) * 1000)
+            _wait(f'http://127.0.0.1:{port}/_dash-layout', start + 120)
+            layout.append((time.perf_counter() - start) * 1000)
+        finally:
+            process.terminate()
+            process.wait()
+    return {
+        'page': {'median_ms': statistics.median(page), 'min_ms': min(page), 'runs_ms': page},
+        'layout': {'median_ms': statistics.median(layout), 'min_ms': min(layout), 'runs_ms': layout}
+    }
+
+
+# Startup with and without a layout prebuilt by python app.py --write-layout
+def bench_boots(workdir, repeat, **source):
+    env = app_env(**source)
+    path = os.path.join(workdir, 'layout-%s.json' % ('snapshot' if source else 'default'))
+    subprocess.run([sys.executable, 'app.py', '--write-layout', path], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+    return {'built': bench_boot(env, repeat), 'prebuilt': bench_boot(dict(env, LAYOUT_PATH=path), repeat)}
+
+
+def bench_ingest(rows, workdir, repeat):
+    import filters
+    import ingest
+    import snapshot
+    from benchmarks import synthetic
+
+    path = synthetic.write_csv(os.path.join(workdir, 'transactions.csv'), rows)
+    timing, aggregates = timed(lambda: ingest.ingest([path]), repeat)
+    tables_timing, _ = timed(aggregates.tables, repeat)
+    index_timing, _ = timed(lambda: filters.FactIndex.from_aggregates(aggregates), repeat)
+    snapshot_path = os.path.join(workdir, 'snapshot.bin')
+    snapshot_timing, _ = timed(
+        lambda: snapshot.write_snapshot(snapshot_path, snapshot.aggregate_tables(aggregates)), repeat
+    )
+    return {
+        'rows': rows,
+        'ingest': timing,
+        'rows_per_s': rows / (timing['median_ms'] / 1000),
+        'buckets': int(len(aggregates.facts)),
+        'tables': tables_timing,
+        'fact_index': index_timing,
+        'snapshot_write': snapshot_timing,
+        'snapshot_bytes': os.path.getsize(snapshot_path)
+    }, snapshot_path
+
+
+# Server callbacks timed through Dash's own endpoint; each run gets a fresh selection so
+# the per-process caches do not hide the work
+def _selection(i):
+    return {'start': '2024-02-01', 'end': f'2024-{3 + i % 9:02d}-{1 + i % 28:02d}', 'clients': ['Lemfi', 'Nala'],
+            'countries': []}
+
+
+# The section graphs only draw once their section is in view
+def _visible(section):
+    return {'type': 'section-visible', 'section': section}, 'data', True
+
+
+CALLBACKS = {
+    'update_summaries': ('total-transactions.children', lambda i: [('filters', 'data', _selection(i))], []),
+    'render_heatmap': ('heatmap-graph.figure', lambda i: [
+        ('heatmap-client', 'value', None), ('heatmap-measure', 'value', 'Volume'), ('filters', 'data', _selection(i)),
+        _visible('heatmap')
+    ], []),
+    'render_timeline': ('timeline-graph.figure', lambda i: [
+        ('filters', 'data', _selection(i)), ('timeline-graph', 'relayoutData', None), _visible('timeline')
+    ], []),
+    'render_drill': ('drill-graph.figure', lambda i: [
+        ('drill', 'data', {'client': ['Lemfi'], 'weekday': ['Friday']}),
+        ('drill-by', 'value', ['month', 'slot', 'country', 'client'][i % 4]), ('filters', 'data', _selection(i)),
+        _visible('drill')
+    ], [])
+}
+
+
+def _outputs(key):
+    specs = []
+    for part in key.strip('.').split('...'):
+        component, prop = part.rsplit('.', 1)
+        specs.append({'id': json.loads(component) if component.startswith('{') else component,
+                      'property': prop.split('@')[0]})
+    return specs if len(specs) > 1 else specs[0]
+
+
+# Images the page loads up front: the <img> src of each logo, fetched once per URL
+def _images(node, found):
+    if isinstance(node, dict):
+        if node.get('type') == 'Img':
+            found.add(node['props']['src'])
+        for value in node.values():
+            _images(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _images(value, found)
+    return found
+
+
+def bench_app(repeat):
+    from dash._utils import to_json
+
+    import app
+    import dataset
+    import figures
+
+    data = dataset.current()
+    client = app.server.test_client()
+    results = {'source': data.source}
+
+    results['layout_build'], layout = timed(lambda: app.build_layout(data), repeat)
+    results['layout_serialize'], body = timed(lambda: to_json(layout), repeat)
+    results['layout_size'] = sizes(body)
+    first, _ = timed(lambda: client.get('/_dash-layout', headers={'Accept-Encoding': 'gzip'}), 1)
+    warm, response = timed(lambda: client.get('/_dash-layout', headers={'Accept-Encoding': 'gzip'}), repeat)
+    results['layout_endpoint'] = {'cold_ms': first['median_ms'], 'warm': warm, 'sent_bytes': len(response.data)}
+    page = client.get('/').get_data(as_text=True)
+    sheets = re.findall(r'<link rel="stylesheet" href="([^"]+)"', page)
+    local = [href for href in sheets if not re.match(r'https?://', href)]
+    results['stylesheets'] = {'third_party': len(sheets) - len(local),
+                              'local_bytes': sum(len(client.get('/' + href).data) for href in local)}
+    # Everything the first page load fetches from this server, plain and compressed
+    urls = ['/', '/_dash-layout', '/_dash-dependencies'] + re.findall(r'<script src="(/[^"]+)"', page)
+    first_load = {'requests': len(urls), 'bytes': 0, 'sent_bytes': 0}
+    for url in urls:
+        first_load['bytes'] += len(client.get(url).data)
+        first_load['sent_bytes'] += len(client.get(url, headers={'Accept-Encoding': 'br, gzip'}).data)
+    results['first_load'] = first_load
+    images = sorted(_images(json.loads(body), set()))
+    results['images'] = {'requests': len(images), 'bytes': sum(len(client.get('/' + src).data) for src in images)}
+
+    results['figures'] = {}
+    for card in figures.CARDS:
+        build, figure = timed(lambda: figures.build(card, data.tables), repeat)
+        cold, _ = timed(lambda: client.get(f'/_figures/{card}'), 1)
+        warm, _ = timed(lambda: client.get(f'/_figures/{card}'), repeat)
+        results['figures'][card] = dict(build=build, endpoint_cold_ms=cold['median_ms'], endpoint_warm=warm,
+                                        **sizes(to_json(figure)))
+
+    results['callbacks'] = {}
+    if data.index is None:
+        results['compression'] = app.compressor.stats()
+        return results
+    for name, (output, inputs, state) in CALLBACKS.items():
+        # Live mode writes some of the same outputs; its keys carry an @ suffix
+        key = next(k for k in app.app.callback_map if output in k and '@' not in k)
+        runs = []
+        for i in range(repeat):
+            payload = {
+                'output': key,
+                'outputs': _outputs(key),
+                'inputs': [{'id': c, 'property': p, 'value': v} for c, p, v in inputs(i)],
+                'state': [{'id': c, 'property': p, 'value': v} for c, p, v in state],
+                'changedPropIds': [f'{c}.{p}' for c, p, _ in inputs(i)[:1]]
+            }
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json=payload,
+                                   headers={'Accept-Encoding': 'br, gzip'})
+            runs.append((time.perf_counter() - start) * 1000)
+            assert response.status_code in (200, 204), (name, response.status_code)
+        results['callbacks'][name] = {'median_ms': statistics.median(runs), 'min_ms': min(runs), 'runs_ms': runs,
+                                      'response_bytes': len(response.data)}
+    # Bytes before and after compression and time spent on it, per endpoint group
+    results['compression'] = app.compressor.stats()
+    return results
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000, help='synthetic transactions to ingest')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--stage', choices=['app'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: one app stage against whatever source the environment names
+    if args.stage == 'app':
+        print(json.dumps(bench_app(args.repeat)))
+        return
+
+    import dash
+    import numpy
+    import pandas
+    import plotly
+
+    results = {
+        'meta': {
+            'commit': commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'packages': {m.__name__: m.__version__ for m in (dash, numpy, pandas, plotly)},
+            'rows': args.rows,
+            'repeat': args.repeat
+        }
+    }
+    results['import'] = bench_import(args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        results['ingest'], snapshot_path = bench_ingest(args.rows, workdir, args.repeat)
+        results['boot'] = {
+            'default': bench_boots(workdir, args.repeat),
+            'snapshot': bench_boots(workdir, args.repeat, SNAPSHOT_PATH=snapshot_path)
+        }
+        stage = ['benchmarks/run.py', '--stage', 'app', '--repeat', str(args.repeat)]
+        results['app'] = {
+            'default': run_json(stage, app_env()),
+            'snapshot': run_json(stage, app_env(SNAPSHOT_PATH=snapshot_path))
+        }
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'wrote {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Seeded synthetic transaction exports in the raw format ingest.py reads
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+
+CLIENTS = ['Lemfi', 'Nala', 'Cellulant', 'DLocal', 'Ezremit', 'Wapi Pay', 'Zepz', 'Flutterwave', None]
+COUNTRIES = ['GBR', 'USA', 'CAN', 'DEU', 'FRA', 'ARE', 'ZAF', 'UGA', 'TZA', 'NGA', None]
+MESSAGES = [
+    'Insufficient balance in wallet', 'ERR_504: upstream request timed out', 'Daily limit exceeded',
+    'Receiver not registered for mobile money', 'soapenv:Fault faultcode=Server', 'Connection refused',
+    'Internal server error (500)', 'Account blocked by operator', 'Invalid amount format',
+    'General failure', 'Unknown response code 9999', None
+]
+
+
+def transactions(n, seed=0, start='2024-01-01', days=366):
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, n), unit='s')
+    failed = rng.random(n) < 0.04
+    return pd.DataFrame({
+        ingest.TIMESTAMP: ts,
+        ingest.AMOUNT: rng.gamma(2, 5000, n).round(2),
+        ingest.STATUS: np.where(failed, 'FAILED', 'SUCCESS'),
+        ingest.CLIENT: rng.choice(np.array(CLIENTS, dtype=object), n),
+        ingest.COUNTRY: rng.choice(np.array(COUNTRIES, dtype=object), n),
+        ingest.REMITTER: rng.integers(0, max(n // 10, 1), n).astype(str),
+        ingest.RECIPIENT: rng.integers(0, max(n // 4, 1), n).astype(str),
+        ingest.REASON: np.where(failed, rng.choice(np.array(MESSAGES, dtype=object), n), None)
+    })
+
+
+def write_csv(path, n, seed=0):
+    transactions(n, seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    # python benchmarks/synthetic.py ROWS OUTPUT.csv
+    write_csv(sys.argv[2], int(sys.argv[1]))
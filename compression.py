@@ -0,0 +1,126 @@
+# Compression and cache headers for the responses Dash and Flask build themselves
+#
+# An after_request hook compresses JSON, JavaScript, CSS and HTML with brotli or gzip,
+# whichever the client accepts, through figure_cache.Payload. Dash's component bundles
+# never change while a worker runs, so their compressed bytes are kept for good;
+# other bodies (_dash-dependencies, the index page, callback responses) are cached by
+# content hash for the current data version, so identical responses compress once.
+# Responses that are already encoded, such as the cached layout and figures, pass through.
+import hashlib
+import threading
+import time
+
+from flask import request
+
+import figure_cache
+
+COMPRESSIBLE = {
+    'application/json', 'application/javascript', 'text/javascript', 'text/css', 'text/html',
+    'image/svg+xml'
+}
+
+# Smaller bodies gain less than the encoding costs
+MIN_BYTES = 1024
+
+# One-off callback responses get a faster brotli setting than bundles
+DYNAMIC_BROTLI_QUALITY = 5
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class Compressor:
+    # prefix: Dash's routes_pathname_prefix; version: returns the data version being served
+    def __init__(self, prefix, version, max_entries=256):
+        self.prefix = prefix
+        self.version = version
+        self._bundles = {}
+        self._responses = figure_cache.FigureCache(max_entries, brotli_quality=DYNAMIC_BROTLI_QUALITY)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _group(self, path):
+        path = path[len(self.prefix):] if path.startswith(self.prefix) else path.lstrip('/')
+        for group in ('_dash-component-suites', '_dash-dependencies', '_dash-update-component',
+                      '_dash-layout', 'assets'):
+            if path.startswith(group):
+                return group.lstrip('_')
+        return 'index' if path == '' else 'other'
+
+    def _count(self, group, raw, sent, ms, hit):
+        with self._lock:
+            stats = self._stats.setdefault(group, {
+                'responses': 0, 'raw_bytes': 0, 'sent_bytes': 0, 'compress_ms': 0.0, 'cache_hits': 0
+            })
+            stats['responses'] += 1
+            stats['raw_bytes'] += raw
+            stats['sent_bytes'] += sent
+            stats['compress_ms'] += ms
+            stats['cache_hits'] += hit
+
+    def _payload(self, group, response):
+        body = response.get_data()
+        if group == 'dash-component-suites':
+            key = request.path
+            with self._lock:
+                payload = self._bundles.get(key)
+            if payload is None:
+                payload = figure_cache.Payload(body)
+                with self._lock:
+                    self._bundles[key] = payload
+                return payload, False
+            return payload, True
+        key = hashlib.sha256(body).digest()
+        built = []
+
+        def build():
+            built.append(key)
+            return body
+
+        payload = self._responses.get(self.version(), key, build)
+        return payload, not built
+
+    def after_request(self, response):
+        group = self._group(request.path)
+        if response.status_code != 200:
+            return response
+        # Dash adds ?m=<mtime> to asset URLs and fingerprints bundle names, so new content gets a new URL
+        if (group == 'assets' and request.args.get('m')) or (
+            group == 'dash-component-suites' and response.cache_control.max_age
+        ):
+            response.headers['Cache-Control'] = IMMUTABLE
+        accepted = {e.split(';')[0].strip() for e in (request.headers.get('Accept-Encoding') or '').split(',')}
+        # Responses that already negotiated their encoding (figure_cache.respond) pass through;
+        # files (send_file) are read in, generated streams are left alone
+        if (
+            not accepted & {'br', 'gzip'} or 'accept-encoding' in response.vary
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE
+            or (response.is_streamed and not response.direct_passthrough)
+        ):
+            return response
+        response.direct_passthrough = False
+        raw = response.content_length or len(response.get_data())
+        if raw < MIN_BYTES:
+            return response
+        start = time.perf_counter()
+        payload, hit = self._payload(group, response)
+        encoding, body, etag = payload.representation(request.headers.get('Accept-Encoding'))
+        if group in ('dash-dependencies', 'index'):
+            response.headers['Cache-Control'] = 'no-cache'
+            response.set_etag(etag)
+            if request.if_none_match.contains(etag):
+                response.status_code = 304
+                body, encoding = b'', None
+        response.set_data(body)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        self._count(group, raw, len(body), (time.perf_counter() - start) * 1000, hit)
+        return response
+
+    # Per endpoint group: bytes before and after compression, time spent, cache hits
+    def stats(self):
+        with self._lock:
+            stats = {group: dict(values) for group, values in self._stats.items()}
+        for values in stats.values():
+            values['saved'] = 1 - values['sent_bytes'] / values['raw_bytes'] if values['raw_bytes'] else 0.0
+        return stats
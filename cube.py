@@ -0,0 +1,107 @@
+# Dense client x country x month x weekday x half-hour cube for drill-down
+#
+# Every measure is one ndarray with an axis per dimension, so a slice is
+# fancy indexing and a roll-up is a sum over the axes not being kept.
+import numpy as np
+import pandas as pd
+
+import ingest
+
+DIMENSIONS = ['client', 'country', 'month', 'weekday', 'slot']
+MEASURES = ['volume', 'count', 'success']
+
+# Above this many cells the dense cube would cost more memory than it saves
+MAX_CELLS = 20_000_000
+
+DIMENSION_TITLES = {
+    'client': 'Client',
+    'country': 'Country',
+    'month': 'Month',
+    'weekday': 'Day',
+    'slot': 'Half-hour'
+}
+
+
+class Cube:
+    def __init__(self, labels, measures, titles=None):
+        # labels: dimension -> list of keys; measures: name -> ndarray shaped like the labels;
+        # titles: dimension -> {key: display label} where the two differ
+        self.labels = labels
+        self.measures = measures
+        self.titles = titles or {}
+        self.shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        self._lookup = {dim: {label: i for i, label in enumerate(labels[dim])} for dim in DIMENSIONS}
+
+    # Months are keyed by their first day, since display labels such as "January" repeat across years
+    @classmethod
+    def from_index(cls, index, max_cells=MAX_CELLS):
+        months = index.month_starts.astype('datetime64[D]')
+        labels = {
+            'client': list(index.clients),
+            'country': list(index.countries),
+            'month': [str(month) for month in months],
+            'weekday': list(ingest.DAYS),
+            'slot': list(ingest.SLOTS)
+        }
+        shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        cells = int(np.prod(shape))
+        if cells > max_cells:
+            return None
+        flat = np.ravel_multi_index(
+            (index.client_codes, index.country_codes, index.month_codes, index.weekdays, index.slots),
+            shape
+        )
+        measures = {
+            'volume': np.bincount(flat, weights=index.volume, minlength=cells).reshape(shape),
+            'count': np.bincount(flat, weights=index.count, minlength=cells).astype(np.int64).reshape(shape),
+            'success': np.bincount(flat, weights=index.success, minlength=cells).astype(np.int64).reshape(shape)
+        }
+        titles = {'month': dict(zip(labels['month'], ingest.month_labels(months.astype('datetime64[ns]'))))}
+        return cls(labels, measures, titles)
+
+    def title(self, dim, key):
+        return self.titles.get(dim, {}).get(key, key)
+
+    # The key of a label as a figure shows it, or None when this cube has no such label
+    def key(self, dim, label):
+        for key in self.labels[dim]:
+            if self.title(dim, key) == label:
+                return key
+        return None
+
+    # where without the keys this cube does not have, e.g. a client the filter bar excludes
+    def known(self, where):
+        where = {dim: [value for value in values if value in self._lookup[dim]] for dim, values in where.items()}
+        return {dim: values for dim, values in where.items() if values}
+
+    def _positions(self, dim, values):
+        lookup = self._lookup[dim]
+        unknown = [value for value in values if value not in lookup]
+        if unknown:
+            raise KeyError(f'Unknown {dim}: {", ".join(map(str, unknown))}')
+        return [lookup[value] for value in values]
+
+    # where: dimension -> labels to keep; by: dimensions kept in the result
+    def query(self, by=(), **where):
+        # Only the constrained axes are gathered; the rest stay full slices
+        positions = {dim: self._positions(dim, where[dim]) for dim in DIMENSIONS if where.get(dim)}
+        kept = tuple(DIMENSIONS.index(dim) for dim in by)
+        dropped = tuple(axis for axis in range(len(DIMENSIONS)) if axis not in kept)
+        # Summing keeps the remaining axes in DIMENSIONS order; transpose them into the requested one
+        order = [sorted(kept).index(axis) for axis in kept]
+        result = {}
+        for name, values in self.measures.items():
+            for dim, taken in positions.items():
+                values = values.take(taken, axis=DIMENSIONS.index(dim))
+            result[name] = values.sum(axis=dropped).transpose(order)
+        if not by:
+            return {name: value.item() for name, value in result.items()}
+        labels = [np.array(self.labels[dim], dtype=object) for dim in by]
+        labels = [values[positions[dim]] if dim in positions else values for dim, values in zip(by, labels)]
+        grids = np.meshgrid(*labels, indexing='ij')
+        frame = pd.DataFrame({dim: grid.ravel() for dim, grid in zip(by, grids)})
+        for name, values in result.items():
+            frame[name] = values.ravel()
+        count = frame['count'].to_numpy()
+        frame['success_rate'] = np.where(count > 0, frame['success'] / np.maximum(count, 1) * 100, np.nan)
+        return frame
@@ -0,0 +1,423 @@
+# Dashboard tables straight from a transactions database, aggregated in SQL
+#
+#   DATABASE_PATH=transactions.db                         SQLite, e.g. for local testing
+#   DATABASE_MODULE=psycopg2 DATABASE_DSN='dbname=...'    any DB-API 2.0 driver
+#
+#   python database.py DATABASE FILE [FILE ...]           loads raw exports into SQLite
+#
+# The table holds the raw export columns ingest.py reads, one row per transaction. Every
+# card's numbers come from its own GROUP BY, with the filter as a WHERE clause, so only
+# aggregated rows leave the database. The queries behind a table set run side by side
+# on a bounded pool of connections, and each one's time is recorded by card under
+# mockdash_query_duration_seconds. Distinct users are exact COUNT(DISTINCT)s here.
+import importlib
+import os
+import queue
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import failures
+import filters
+import heatmap
+import ingest
+import metrics
+
+DATABASE_PATH = os.environ.get('DATABASE_PATH')
+DATABASE_MODULE = os.environ.get('DATABASE_MODULE')
+DATABASE_DSN = os.environ.get('DATABASE_DSN', '')
+DATABASE_TABLE = os.environ.get('DATABASE_TABLE', 'transactions')
+
+# Connections open at once per worker, and seconds a query waits for one to come free
+POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 4))
+POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+
+# The queries behind one table set, by card
+CARDS = ['monthly', 'hourly', 'daily', 'country', 'client', 'failure', 'users']
+
+SUCCESS = 'CASE WHEN LOWER(TRIM(status)) IN ({}) THEN 1 ELSE 0 END'.format(
+    ', '.join(f"'{status}'" for status in ingest.SUCCESS_STATUSES)
+)
+CLIENT = f"COALESCE(client, '{ingest.OTHER_CLIENT}')"
+COUNTRY = f"COALESCE(country, '{ingest.UNKNOWN_COUNTRY}')"
+SUMS = 'COALESCE(SUM(amount), 0), COUNT(*)'
+
+
+# Placeholders in the driver's paramstyle, numbered in the order values are added
+class _Params:
+    def __init__(self, style):
+        self.style = style
+        self.values = []
+
+    def __call__(self, value):
+        self.values.append(value)
+        n = len(self.values)
+        return {'qmark': '?', 'format': '%s', 'numeric': f':{n}', 'named': f':p{n}', 'pyformat': f'%(p{n})s'}[
+            self.style
+        ]
+
+    def bound(self):
+        if self.style in ('named', 'pyformat'):
+            return {f'p{i}': value for i, value in enumerate(self.values, 1)}
+        return self.values
+
+
+# At most size connections, opened on first use and reused; a query waits up to timeout
+# seconds for one before giving up with TimeoutError
+class Pool:
+    def __init__(self, connect, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f'no database connection came free within {self.timeout:g}s')
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+                # Ends the read transaction, so the next query sees new rows
+                connection.rollback()
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Stands in for filters.FactIndex over a table of raw transactions. The SQL for the derived
+# columns is PostgreSQL's; other databases override it in a subclass, as SQLiteSource does.
+# With the format and pyformat paramstyles a literal % in it has to be written %%.
+class DataSource:
+    TIMESTAMP = '"timestamp"'
+    DAY = 'CAST({ts} AS DATE)'
+    MONTH = "CAST(DATE_TRUNC('month', {ts}) AS DATE)"
+    # Monday is 0, as in ingest.DAYS
+    WEEKDAY = 'CAST(EXTRACT(ISODOW FROM {ts}) AS INTEGER) - 1'
+    SLOT = 'CAST(EXTRACT(HOUR FROM {ts}) AS INTEGER) * 2 + CAST(EXTRACT(MINUTE FROM {ts}) AS INTEGER) / 30'
+
+    def __init__(self, connect, paramstyle, table=DATABASE_TABLE, pool_size=POOL_SIZE):
+        self.paramstyle = paramstyle
+        self.table = table
+        self.pool = Pool(connect, pool_size)
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix='database')
+        self.day, self.month, self.weekday, self.slot = (
+            expression.format(ts=self.TIMESTAMP) for expression in (self.DAY, self.MONTH, self.WEEKDAY, self.SLOT)
+        )
+        self.clients, self.countries = [], []
+        self.first_day = self.last_day = None
+
+    def _fetch(self, card, statements):
+        start = time.perf_counter()
+        results = []
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                    results.append(cursor.fetchall())
+            finally:
+                cursor.close()
+        metrics.registry.observe('mockdash_query_duration_seconds', time.perf_counter() - start, card=card)
+        return results
+
+    def _where(self, selection, params, condition=None):
+        clauses = [condition] if condition else []
+        if selection is not None:
+            start, end, clients, countries, _ = selection
+            if start:
+                clauses.append(f'{self.TIMESTAMP} >= {params(start)}')
+            if end:
+                clauses.append(f'{self.TIMESTAMP} < {params(str((pd.Timestamp(end) + pd.Timedelta(days=1)).date()))}')
+            # Plain IN lists, so an index on the column still applies
+            for column, values, missing in (
+                ('client', clients, ingest.OTHER_CLIENT), ('country', countries, ingest.UNKNOWN_COUNTRY)
+            ):
+                if values:
+                    clause = f"{column} IN ({', '.join(params(value) for value in values)})"
+                    if missing in values:
+                        clause = f'({clause} OR {column} IS NULL)'
+                    clauses.append(clause)
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    def _grouped(self, keys, columns, selection, condition=None, order=True):
+        params = _Params(self.paramstyle)
+        where = self._where(selection, params, condition)
+        keys = ', '.join(keys)
+        sql = f'SELECT {keys}, {columns} FROM {self.table}{where} GROUP BY {keys}'
+        return (sql + f' ORDER BY {keys}' if order else sql), params.bound()
+
+    # Everyone who sent or received within the selection, optionally by month, counted once
+    def _users(self, selection, by_month):
+        params = _Params(self.paramstyle)
+        month = f'{self.month} AS month, ' if by_month else ''
+        # The same WHERE twice, so its values are bound twice
+        people = (
+            f'SELECT {month}remitter_id AS id FROM {self.table}{self._where(selection, params)} UNION '
+            f'SELECT {month}recipient_id AS id FROM {self.table}{self._where(selection, params)}'
+        )
+        if by_month:
+            return f'SELECT month, COUNT(DISTINCT id) FROM ({people}) users GROUP BY month', params.bound()
+        return f'SELECT COUNT(DISTINCT id) FROM ({people}) users', params.bound()
+
+    def _statements(self, selection):
+        totals = _Params(self.paramstyle)
+        return {
+            'monthly': [self._grouped(
+                [self.month], f'{SUMS}, SUM({SUCCESS}), COUNT(DISTINCT remitter_id), COUNT(DISTINCT recipient_id)',
+                selection
+            )],
+            'hourly': [self._grouped([self.slot], SUMS, selection, order=False)],
+            'daily': [self._grouped([self.weekday], SUMS, selection, order=False)],
+            'country': [self._grouped([COUNTRY], SUMS, selection, order=False)],
+            'client': [self._grouped([CLIENT], SUMS, selection, order=False)],
+            # Raw messages, classified into categories here as ingest.py does
+            'failure': [self._grouped(['failure_reason'], 'COUNT(*)', selection, f'{SUCCESS} = 0', order=False)],
+            'users': [
+                (
+                    f'SELECT COUNT(DISTINCT remitter_id), COUNT(DISTINCT recipient_id) FROM {self.table}'
+                    f'{self._where(selection, totals)}',
+                    totals.bound()
+                ),
+                self._users(selection, by_month=False),
+                self._users(selection, by_month=True)
+            ]
+        }
+
+    def tables(self, selection=None):
+        futures = {
+            card: self._executor.submit(self._fetch, card, statements)
+            for card, statements in self._statements(selection).items()
+        }
+        rows = {card: future.result() for card, future in futures.items()}
+
+        monthly = _frame(rows['monthly'][0], ['month', 'volume', 'count', 'success', 'remitters', 'recipients'])
+        monthly.index = pd.DatetimeIndex(pd.to_datetime(monthly.pop('month')))
+        reasons = _frame(rows['failure'][0], ['reason', 'count'])
+        reasons = reasons.groupby(failures.classify(reasons['reason'].values), observed=True)['count'].sum()
+        reasons.index = reasons.index.astype(str)
+        reasons = reasons.sort_index()
+        return ingest.assemble_tables(
+            monthly=monthly,
+            hourly=_frame(rows['hourly'][0], ['slot', 'volume', 'count']).set_index('slot'),
+            daily=_frame(rows['daily'][0], ['weekday', 'volume', 'count']).set_index('weekday'),
+            country=_frame(rows['country'][0], ['country', 'volume', 'count']).set_index('country'),
+            client=_frame(rows['client'][0], ['client', 'volume', 'count']).set_index('client'),
+            reasons=reasons[reasons > 0],
+            remitters=dict(zip(monthly.index, monthly['remitters'])),
+            recipients=dict(zip(monthly.index, monthly['recipients'])),
+            users=_user_totals(*rows['users'])
+        )
+
+    # Weekday x half-hour grid for a filter, optionally narrowed to one client
+    def week(self, selection=None, client=None):
+        if client is not None:
+            start, end, _, countries, tenant = selection or (None, None, (), (), None)
+            selection = filters.normalize(start, end, [client], countries, tenant)
+        [rows] = self._fetch('week', [self._grouped([self.weekday, self.slot], SUMS, selection, order=False)])
+        cells = _frame(rows, ['weekday', 'slot', 'volume', 'count'])
+        return heatmap.week_table(*heatmap.week_grid(
+            cells['weekday'].values, cells['slot'].values, cells['volume'].values, cells['count'].values
+        ))
+
+    # Half-hourly volume and count over every slot between the first and last selected day
+    def timeline(self, selection=None):
+        [rows] = self._fetch('timeline', [self._grouped([self.day, self.slot], SUMS, selection, order=False)])
+        if not rows:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0), np.empty(0, dtype=np.int64)
+        cells = _frame(rows, ['day', 'slot', 'volume', 'count'])
+        days = pd.to_datetime(cells['day']).values.astype('datetime64[D]')
+        first = days.min()
+        slot = (days - first).astype(np.int64) * 48 + cells['slot'].values
+        n = int(slot.max()) + 1
+        times = first.astype('datetime64[ns]') + np.arange(n) * np.timedelta64(ingest.SLOT_NS, 'ns')
+        volume = np.bincount(slot, weights=cells['volume'].values, minlength=n)
+        count = np.bincount(slot, weights=cells['count'].values, minlength=n).astype(np.int64)
+        return times, volume, count
+
+    # The per-day buckets a filter selects, read from the cursor chunk_rows at a time; the
+    # export holds one pooled connection until it is done
+    def buckets(self, selection=None, chunk_rows=50_000):
+        sql, params = self._grouped([self.day, self.slot, CLIENT, COUNTRY], f'{SUMS}, SUM({SUCCESS})', selection)
+        start = time.perf_counter()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    chunk = _frame(rows, ['day', 'slot', 'client', 'country', 'volume', 'count', 'success'])
+                    yield pd.DataFrame({
+                        'Date': pd.to_datetime(chunk['day']).dt.strftime('%Y-%m-%d'),
+                        'Half_Hour': np.asarray(ingest.SLOTS, dtype=object)[chunk['slot'].values],
+                        'Client': chunk['client'].astype(str),
+                        'Country': chunk['country'].astype(str),
+                        'Volume': chunk['volume'],
+                        'Transactions': chunk['count'],
+                        'Successful': chunk['success']
+                    })
+            finally:
+                cursor.close()
+        metrics.registry.observe('mockdash_query_duration_seconds', time.perf_counter() - start, card='buckets')
+
+    # Client x country x month x weekday x slot sums of a selection, shaped for cube.Cube.from_index
+    def cells(self, selection=None):
+        [rows] = self._fetch('drill', [self._grouped(
+            [CLIENT, COUNTRY, self.month, self.weekday, self.slot], f'{SUMS}, SUM({SUCCESS})', selection, order=False
+        )])
+        cells = _frame(rows, ['client', 'country', 'month', 'weekday', 'slot', 'volume', 'count', 'success'])
+        months = pd.to_datetime(cells['month']).values.astype('datetime64[M]')
+        month_starts = np.unique(months)
+        client_codes, clients = pd.factorize(cells['client'].astype(str), sort=True)
+        country_codes, countries = pd.factorize(cells['country'].astype(str), sort=True)
+        return types.SimpleNamespace(
+            clients=list(clients), countries=list(countries), month_starts=month_starts,
+            client_codes=client_codes, country_codes=country_codes,
+            month_codes=np.searchsorted(month_starts, months),
+            weekdays=cells['weekday'].values, slots=cells['slot'].values,
+            volume=cells['volume'].values, count=cells['count'].values, success=cells['success'].values
+        )
+
+    # Filter options and date range; read once per load rather than per page
+    def describe(self):
+        statements = [
+            (f'SELECT DISTINCT {CLIENT} FROM {self.table}', []),
+            (f'SELECT DISTINCT {COUNTRY} FROM {self.table}', []),
+            (f'SELECT MIN({self.TIMESTAMP}), MAX({self.TIMESTAMP}) FROM {self.table}', [])
+        ]
+        clients, countries, [(first, last)] = self._fetch('describe', statements)
+        self.clients = sorted(str(client) for client, in clients)
+        self.countries = sorted(str(country) for country, in countries)
+        self.first_day = str(pd.Timestamp(first).date()) if first is not None else None
+        self.last_day = str(pd.Timestamp(last).date()) if last is not None else None
+        return self
+
+    # Changes when rows arrive, late ones included, or are deleted; the count is a full scan
+    # on some databases, so DATA_RELOAD_INTERVAL bounds how often it runs
+    def stamp(self):
+        [[row]] = self._fetch('stamp', [(
+            f'SELECT COUNT(*), MAX({self.TIMESTAMP}), COALESCE(SUM(amount), 0) FROM {self.table}', []
+        )])
+        return tuple(map(str, row))
+
+    def close(self):
+        self._executor.shutdown()
+        self.pool.close()
+
+
+class SQLiteSource(DataSource):
+    DAY = 'DATE({ts})'
+    MONTH = "STRFTIME('%Y-%m-01', {ts})"
+    WEEKDAY = "(CAST(STRFTIME('%w', {ts}) AS INTEGER) + 6) % 7"
+    SLOT = "CAST(STRFTIME('%H', {ts}) AS INTEGER) * 2 + CAST(STRFTIME('%M', {ts}) AS INTEGER) / 30"
+
+    def __init__(self, path, table=DATABASE_TABLE, pool_size=POOL_SIZE):
+        import sqlite3
+
+        self.path = path
+        # Read-only; pooled connections are handed between threads
+        uri = f'file:{os.path.abspath(path)}?mode=ro'
+        super().__init__(
+            lambda: sqlite3.connect(uri, uri=True, check_same_thread=False), sqlite3.paramstyle, table, pool_size
+        )
+
+
+# module: a DB-API 2.0 module or its name; the rest is passed to its connect()
+class DBAPISource(DataSource):
+    def __init__(self, module, *args, table=DATABASE_TABLE, pool_size=POOL_SIZE, **kwargs):
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        super().__init__(lambda: module.connect(*args, **kwargs), module.paramstyle, table, pool_size)
+
+
+# Driver values (Decimal, date, ...) as plain numpy columns
+def _frame(rows, columns):
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in ('volume',):
+        if column in frame:
+            frame[column] = frame[column].astype(np.float64)
+    for column in ('slot', 'weekday', 'count', 'success', 'remitters', 'recipients'):
+        if column in frame:
+            frame[column] = frame[column].fillna(0).astype(np.int64)
+    return frame
+
+
+# The figures hll.user_totals estimates, counted exactly; Users is everyone who sent or received
+def _user_totals(totals, users, active):
+    (remitters, recipients), = totals
+    (distinct,), = users
+    monthly = dict(sorted((pd.Timestamp(month), users) for month, users in active))
+    months = list(monthly)
+    growth = 0.0
+    if len(months) > 1 and monthly[months[0]]:
+        growth = ((monthly[months[-1]] / monthly[months[0]]) ** (1 / (len(months) - 1)) - 1) * 100
+    return {
+        'Users': int(distinct),
+        'Remitters': int(remitters),
+        'Recipients': int(recipients),
+        'Monthly_Growth': round(growth, 2)
+    }
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+# The configured source, shared by every load in this worker so the pool outlives reloads
+def default_source():
+    global _source
+    if _source is None and (DATABASE_PATH or DATABASE_MODULE):
+        with _source_lock:
+            if _source is None:
+                if DATABASE_PATH:
+                    _source = SQLiteSource(DATABASE_PATH)
+                else:
+                    _source = DBAPISource(DATABASE_MODULE, DATABASE_DSN)
+    return _source
+
+
+# Copies raw exports into a SQLite table with the columns and indexes the queries expect
+def load_files(path, paths, table=DATABASE_TABLE, chunksize=ingest.CHUNKSIZE):
+    import sqlite3
+
+    rows = 0
+    with sqlite3.connect(path) as connection:
+        for file in paths:
+            for chunk in ingest.read_chunks(file, chunksize):
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                chunk[ingest.TIMESTAMP] = pd.to_datetime(chunk[ingest.TIMESTAMP]).dt.strftime('%Y-%m-%d %H:%M:%S')
+                chunk[ingest.AMOUNT] = pd.to_numeric(chunk[ingest.AMOUNT], errors='coerce')
+                chunk.to_sql(table, connection, if_exists='append', index=False)
+                rows += len(chunk)
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_timestamp ON {table} ("timestamp")')
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_client ON {table} (client, "timestamp")')
+    return rows
+
+
+if __name__ == '__main__':
+    # python database.py DATABASE FILE [FILE ...]
+    rows = load_files(sys.argv[1], sys.argv[2:])
+    print(f'loaded {rows:,} transactions into {sys.argv[1]}')
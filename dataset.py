@@ -0,0 +1,321 @@
+# Where the dashboard tables come from, and which version of them is being served
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# pandas, numpy and the modules built on them are imported where they are first
+# needed, so a worker can answer requests before any data is loaded
+import result_cache
+
+logger = logging.getLogger(__name__)
+
+# Real data replaces the built-in tables, in order of preference:
+# SNAPSHOT_PATH - columnar snapshot shared by all workers through mmap
+# PARTITIONS_PATH - store partitioned by tenant, year, month and client (see partitions.py)
+# ROLLUP_PATH - current state of the incremental rollup store
+# DATABASE_PATH / DATABASE_MODULE - transactions database queried in SQL (see database.py)
+# TRANSACTIONS_PATH - raw transaction exports (comma-separated CSV/Parquet paths)
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+PARTITIONS_PATH = os.environ.get('PARTITIONS_PATH')
+ROLLUP_PATH = os.environ.get('ROLLUP_PATH')
+DATABASE_PATH = os.environ.get('DATABASE_PATH')
+DATABASE_MODULE = os.environ.get('DATABASE_MODULE')
+TRANSACTIONS_PATH = os.environ.get('TRANSACTIONS_PATH')
+
+# Tenant of a partitioned store shown when the page asks for none; the first one by default
+TENANT = os.environ.get('TENANT')
+
+# Filtered table sets kept per worker for the current version
+FILTER_CACHE_SIZE = 32
+
+# Drill-down cubes kept per worker, one per filter selection
+CUBE_CACHE_SIZE = 8
+
+# Filtered results shared with the other workers on this host, or None
+results = result_cache.open_default()
+
+# Seconds between checks for a new snapshot or rollup version on disk
+RELOAD_INTERVAL = float(os.environ.get('DATA_RELOAD_INTERVAL', 5))
+
+
+def default_tables():
+    import pandas as pd
+
+    # Monthly data
+    monthly_data = pd.DataFrame({
+        'Month': ['January', 'February', 'March', 'April', 'May', 'June', 
+                 'July', 'August', 'September', 'October', 'November', 'December'],
+        'Transactions': [133641, 171044, 200841, 204680, 197654, 189258, 
+                        182504, 183429, 84383, 169780, 138824, 68452],
+        'Volume': [2013687811.26, 2490772705.46, 2776712059.66, 2771003331.42, 2732297727.71, 
+                   2539282672.75, 2551967296.20, 2890018921.76, 1411203322.06, 2230387153.64, 
+                   1849984455.07, 987131225.49],
+        'Success_Rate': [95.47, 97.72, 96.65, 97.87, 99.05, 98.17, 
+                        95.36, 95.11, 94.85, 98.13, 94.52, 94.03],
+        'Unique_Remitters': [20610, 20219, 17487, 26118, 16178, 23345, 
+                            28163, 28799, 23795, 34715, 25236, 18104],
+        'Unique_Recipients': [34553, 50852, 75630, 85424, 66600, 73019, 
+                             67567, 71636, 42967, 80602, 63104, 38295]
+    })
+
+    # Failure data
+    failure_data = pd.DataFrame({
+        'Reason': ['General Failure', 'Limit Exceeded', 'Invalid Credit Party', 
+                   'Insufficient Balance', 'SOAP Error', 'Timed Out', 'System Error',
+                   'Connectivity Error', 'Invalid Account', 'Invalid Details', 'Other'],
+        'Total': [833, 11376, 5416, 31173, 1248, 1640, 485, 194, 557, 4695, 2312],
+        'Percentage': [1.39, 18.98, 9.04, 52.02, 2.08, 2.74, 0.81, 0.32, 0.93, 7.83, 3.86]
+    })
+
+    # Updated hourly data with half-hour intervals
+    hourly_data = pd.DataFrame({
+        'Hour': ['12:00:00 AM', '12:30:00 AM', '1:00:00 AM', '1:30:00 AM', '2:00:00 AM', '2:30:00 AM', 
+                '3:00:00 AM', '3:30:00 AM', '4:00:00 AM', '4:30:00 AM', '5:00:00 AM', '5:30:00 AM', 
+                '6:00:00 AM', '6:30:00 AM', '7:00:00 AM', '7:30:00 AM', '8:00:00 AM', '8:30:00 AM', 
+                '9:00:00 AM', '9:30:00 AM', '10:00:00 AM', '10:30:00 AM', '11:00:00 AM', '11:30:00 AM',
+                '12:00:00 PM', '12:30:00 PM', '1:00:00 PM', '1:30:00 PM', '2:00:00 PM', '2:30:00 PM',
+                '3:00:00 PM', '3:30:00 PM', '4:00:00 PM', '4:30:00 PM', '5:00:00 PM', '5:30:00 PM',
+                '6:00:00 PM', '6:30:00 PM', '7:00:00 PM', '7:30:00 PM', '8:00:00 PM', '8:30:00 PM',
+                '9:00:00 PM', '9:30:00 PM', '10:00:00 PM', '10:30:00 PM', '11:00:00 PM', '11:30:00 PM'],
+        'Volume': [239901818.81, 244991276.09, 225345783.38, 239690642.99, 261409055.99, 286688826.43,
+                  336935592.92, 365831601.29, 426891279.31, 475891128.44, 518967965.34, 558806726.45,
+                  593022936.74, 611179510.15, 685317245.20, 667263464.74, 692677269.65, 697109566.67,
+                  739877303.90, 735930672.71, 744234540.79, 759891766.66, 784129511.47, 760450859.64,
+                  796315758.28, 783213808.44, 834070722.89, 841420254.91, 802473919.21, 800976384.25,
+                  785374503.63, 766217167.73, 762218552.20, 721923234.09, 658575263.68, 643863311.42,
+                  611843138.71, 611227839.98, 585600775.32, 533709014.43, 509964810.15, 461427440.03,
+                  444715572.40, 400121854.04, 355988522.99, 336914663.10, 293197740.74, 250658084.10],
+        'Count': [13227, 12799, 12627, 13473, 15001, 16630, 19864, 22101, 26156, 29393, 32579, 35504,
+                  38688, 40719, 44114, 43998, 46626, 47937, 50107, 50920, 53048, 51906, 54098, 54047,
+                  56413, 66726, 69391, 60756, 60297, 60479, 59526, 58740, 56640, 53619, 50586, 48568,
+                  45561, 44122, 40435, 37372, 33066, 29971, 27130, 24256, 21395, 19049, 16791, 14891]
+    })
+
+    # Country data - excluding Unknown
+    country_data = pd.DataFrame({
+        'Country': ['CAN', 'FIN', 'GBR', 'GER', 'IRL', 'KEN', 'NGA', 'UGA', 'USA', 'Unknown'],
+        'Volume': [1517951948.64, 307421630.62, 11315946583.70, 101630751.00, 153890861.47,
+                   846415656.43, 101777855.36, 896761980.11, 6791147045.70, 4772819388.13],
+        'Transactions': [118717, 28193, 864380, 6034, 10630, 68183, 9028, 1609, 402476, 327200],
+        'Market_Share': [5.66, 1.15, 42.21, 0.38, 0.57, 3.16, 0.38, 3.35, 25.33, 17.81]
+    })
+
+    # Daily data 
+    daily_data = pd.DataFrame({
+        'Day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+        'Volume': [3446887082.69, 3542203701.92, 3856600588.57, 4174561072.82, 
+                   5582156391.24, 3962547257.90, 2679492587.34],
+        'Count': [231857, 236668, 249814, 264715, 348966, 297996, 231426]
+    })
+
+    # Client data
+    client_data = pd.DataFrame({
+        'Client': ['Lemfi', 'Cellulant', 'Nala', 'DLocal', 'Wapipay', 'Hello FXBud', 
+                  'Finpesa', 'Tangent', 'Others'],
+        'Volume': [11606556833.85, 6280089643.65, 8055904624.99, 248808932.68, 
+                   1510015.74, 617699.08, 973692826.00, 76931592.49, 0.00],
+        'Transactions': [836080, 443517, 560706, 16028, 174, 103, 1571, 3090, 0],
+        'Market_Share': [42.60, 23.05, 29.57, 0.91, 0.01, 0.00, 3.57, 0.28, 0.00]
+    })
+
+    # User totals
+    users_data = pd.DataFrame({
+        'Users': [1000000],
+        'Remitters': [monthly_data['Unique_Remitters'].sum()],
+        'Recipients': [monthly_data['Unique_Recipients'].sum()],
+        'Monthly_Growth': [27.66]
+    })
+
+    return {
+        'monthly': monthly_data,
+        'hourly': hourly_data,
+        'daily': daily_data,
+        'country': country_data,
+        'client': client_data,
+        'failure': failure_data,
+        'users': users_data
+    }
+
+
+class Dataset:
+    def __init__(self, tables, version, source, index=None):
+        self.tables = tables
+        self.version = version
+        self.source = source
+        # filters.FactIndex over the per-day buckets when the source has them, a
+        # partitions.PartitionIndex for a partitioned store or a database.DataSource
+        self.index = index
+        self.loaded_at = time.time()
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+        self._cubes = OrderedDict()
+
+    # Drill-down cube of the buckets a normalized selection matches, built on first use;
+    # None without buckets or when it would be too large
+    def cube(self, selection=None):
+        if self.index is None:
+            return None
+        with self._lock:
+            if selection in self._cubes:
+                self._cubes.move_to_end(selection)
+                return self._cubes[selection]
+        import cube
+        data_cube = cube.Cube.from_index(self.index.cells(selection))
+        with self._lock:
+            self._cubes[selection] = data_cube
+            while len(self._cubes) > CUBE_CACHE_SIZE:
+                self._cubes.popitem(last=False)
+        return data_cube
+
+    def filtered_tables(self, selection):
+        if selection is None or self.index is None:
+            return self.tables
+        with self._lock:
+            if selection in self._filtered:
+                self._filtered.move_to_end(selection)
+                return self._filtered[selection]
+        if results is not None:
+            tables = results.get(
+                self.version, ('tables', selection), lambda: self.index.tables(selection), result_cache.Tables
+            )
+        else:
+            tables = self.index.tables(selection)
+        with self._lock:
+            self._filtered[selection] = tables
+            while len(self._filtered) > FILTER_CACHE_SIZE:
+                self._filtered.popitem(last=False)
+        return tables
+
+
+def _stat(path):
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# Files the current source is read from; none for the built-in tables
+def source_paths():
+    if SNAPSHOT_PATH:
+        return [SNAPSHOT_PATH]
+    if PARTITIONS_PATH:
+        import rollup
+        return [os.path.join(PARTITIONS_PATH, rollup.MANIFEST)]
+    if ROLLUP_PATH:
+        import rollup
+        return [os.path.join(ROLLUP_PATH, rollup.MANIFEST)]
+    if DATABASE_PATH:
+        return [DATABASE_PATH]
+    if TRANSACTIONS_PATH:
+        return TRANSACTIONS_PATH.split(',')
+    return []
+
+
+# Changes whenever the data behind the current source changes on disk or in the database
+def source_stamp():
+    paths = source_paths()
+    if paths:
+        return tuple(_stat(path) for path in paths)
+    if DATABASE_MODULE:
+        import database
+        return database.default_source().stamp()
+    return None
+
+
+def _from_aggregates(aggregates, version, source):
+    import filters
+
+    tables = aggregates.tables()
+    return Dataset(tables, version, source, filters.FactIndex.from_aggregates(aggregates, tables['monthly']))
+
+
+def load():
+    import database
+    import filters
+    import hll
+    import ingest
+    import partitions
+    import rollup
+    import snapshot
+
+    if SNAPSHOT_PATH:
+        snap = snapshot.Snapshot(SNAPSHOT_PATH)
+        tables = {name: snap.table(name) for name in ingest.TABLES}
+        sketches = {
+            name + 's': hll.Sketches.from_frames(snap.table(f'{name}_sketches'), snap.table(f'{name}_registers'))
+            for name in ('remitter', 'recipient')
+        }
+        index = filters.FactIndex(snap.table('facts'), snap.table('failures'), tables['monthly'], **sketches)
+        return Dataset(tables, snap.version, 'snapshot', index)
+    if PARTITIONS_PATH:
+        store = partitions.PartitionedStore(PARTITIONS_PATH)
+        index = partitions.PartitionIndex(store, TENANT)
+        return Dataset(index.tables(), f'partitions-{store.version}', 'partitions', index)
+    if ROLLUP_PATH:
+        store = rollup.RollupStore(ROLLUP_PATH)
+        return _from_aggregates(store.load(), f'rollup-{store.version}', 'rollup')
+    if DATABASE_PATH or DATABASE_MODULE:
+        source = database.default_source().describe()
+        version = hashlib.sha256(repr(source_stamp()).encode()).hexdigest()[:16]
+        return Dataset(source.tables(), f'database-{version}', 'database', source)
+    if TRANSACTIONS_PATH:
+        aggregates = ingest.ingest(TRANSACTIONS_PATH.split(','))
+        version = hashlib.sha256(repr(source_stamp()).encode()).hexdigest()[:16]
+        return _from_aggregates(aggregates, version, 'transactions')
+    return Dataset(default_tables(), 'default', 'default')
+
+
+_lock = threading.Lock()
+_current = None
+_stamp = None
+_checked = 0.0
+_watching = False
+
+
+# Loads the source again if it changed on disk since the last check
+def refresh():
+    global _current, _stamp, _checked
+    with _lock:
+        stamp = source_stamp()
+        if _current is None or stamp != _stamp:
+            _current = load()
+            _stamp = stamp
+        _checked = time.monotonic()
+    return _current
+
+
+# The Dataset being served, or None before the first load finishes
+def loaded():
+    return _current
+
+
+# Requests already holding a Dataset keep using it while a newer one is loaded
+def current():
+    if _current is not None and (_watching or time.monotonic() - _checked < RELOAD_INTERVAL):
+        return _current
+    return refresh()
+
+
+# Moves reloads off the request path: a thread loads each new version and
+# swaps it in, so requests never wait for a load after the first one
+def watch(on_load=None):
+    global _watching
+    if _watching or source_stamp() is None or multiprocessing.parent_process() is not None:
+        return
+
+    def run():
+        loaded = current()
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                data = refresh()
+                if data is not loaded and on_load is not None:
+                    on_load(data)
+                loaded = data
+            except Exception:
+                logger.exception('Reloading %s failed', loaded.source)
+
+    _watching = True
+    threading.Thread(target=run, name='dataset-watch', daemon=True).start()
@@ -0,0 +1,51 @@
+# Largest-Triangle-Three-Buckets downsampling for long time series
+#
+# Keeps the first and last points and, from each bucket in between, the point
+# forming the largest triangle with the previous pick and the next bucket's
+# mean, so peaks and dips survive where plain striding would drop them.
+import numpy as np
+
+# Points sent per trace, roughly one per horizontal pixel of a full-width card
+POINTS = 2000
+
+
+# Positions of the points to keep, in order
+def lttb(x, y, threshold=POINTS):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points sit outside them
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[hi:edges[i + 2]].mean()
+            next_y = y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+# Points of a datetime64 series inside [start, end], downsampled for display
+def window(times, values, start=None, end=None, threshold=POINTS):
+    # Plotly sends axis ranges as strings like '2024-03-05 12:34:56.789'
+    start = np.datetime64(start, 'ns') if start is not None else None
+    end = np.datetime64(end, 'ns') if end is not None else None
+    lo = np.searchsorted(times, start, 'left') if start is not None else 0
+    hi = np.searchsorted(times, end, 'right') if end is not None else len(times)
+    # One point either side keeps the line running to the edges of the view
+    lo, hi = max(lo - 1, 0), min(hi + 1, len(times))
+    times, values = times[lo:hi], values[lo:hi]
+    keep = lttb(times.astype(np.int64), values, threshold)
+    return times[keep], values[keep]
@@ -0,0 +1,196 @@
+# CSV and XLSX exports streamed in chunks, so no export is ever held in memory whole
+#
+# Each export is an iterable of DataFrames with the same columns: a card's table as one
+# frame, or the per-day buckets behind a filter a chunk at a time (see
+# filters.FactIndex.buckets). The writers below turn them into bytes as they go; XLSX
+# is written with zipfile onto a pipe the response drains, one worksheet per
+# SHEET_ROWS rows. A long export keeps its worker thread busy, so run gunicorn with
+# threads (--worker-class gthread) to keep other requests moving meanwhile.
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+# Cards whose numbers can be downloaded, and the table behind each
+CARD_TABLES = {
+    'monthly-trends': 'monthly',
+    'failure-treemap': 'failure',
+    'client-performance': 'client'
+}
+# Row-level export of the buckets the current filter selects
+BUCKETS = 'buckets'
+
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Rows per frame read from the buckets
+CHUNK_ROWS = 50_000
+
+# Excel's limit, less the header row
+SHEET_ROWS = 1_048_575
+
+INF = float('inf')
+
+
+def csv_stream(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+# Write-only file object for zipfile; zipfile sees it cannot seek and writes data descriptors
+class _Pipe(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _text(value):
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+# Number cells only take finite values: NaN is left blank and infinities are written as text
+def _number(value):
+    if value != value:
+        return '<c/>'
+    if value in (INF, -INF):
+        return _text(value)
+    return f'<c><v>{value}</v></c>'
+
+
+def _column(series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return [_number(value) for value in series.tolist()]
+    return [_text(value) for value in series.tolist()]
+
+
+def _rows(frame, first_row):
+    cells = zip(*(_column(frame[column]) for column in frame.columns))
+    return ''.join(
+        f'<row r="{first_row + i}">' + ''.join(row) + '</row>' for i, row in enumerate(cells)
+    ).encode('utf-8')
+
+
+SHEET_START = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = b'</sheetData></worksheet>'
+
+
+# The one default cell format every cell uses; Excel asks to repair workbooks without it
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _workbook(sheets):
+    content_types = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    relationships = ''.join(
+        f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+        f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    names = ''.join(
+        f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(sheets, 1)
+    )
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{content_types}</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{names}</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}'
+            f'<Relationship Id="rId{len(sheets) + 1}" Target="styles.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+            '</Relationships>'
+        ),
+        'xl/styles.xml': STYLES
+    }
+
+
+def xlsx_stream(frames, title):
+    # Sheet names are limited to 31 characters, leaving room for a number
+    title = title[:27]
+    pipe = _Pipe()
+    sheets = []
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        sheet, written = None, 0
+        for frame in frames:
+            while len(frame):
+                if sheet is None or written == SHEET_ROWS:
+                    if sheet is not None:
+                        sheet.write(SHEET_END)
+                        sheet.close()
+                    sheets.append(title if not sheets else f'{title} {len(sheets) + 1}')
+                    sheet = workbook.open(f'xl/worksheets/sheet{len(sheets)}.xml', 'w', force_zip64=True)
+                    sheet.write(SHEET_START)
+                    sheet.write(_rows(pd.DataFrame([list(frame.columns)], columns=frame.columns), 1))
+                    written = 0
+                part, frame = frame.iloc[:SHEET_ROWS - written], frame.iloc[SHEET_ROWS - written:]
+                sheet.write(_rows(part, written + 2))
+                written += len(part)
+                yield pipe.drain()
+        if sheet is None:
+            sheets.append(title)
+            sheet = workbook.open('xl/worksheets/sheet1.xml', 'w')
+            sheet.write(SHEET_START)
+        sheet.write(SHEET_END)
+        sheet.close()
+        for name, body in _workbook(sheets).items():
+            workbook.writestr(name, body)
+    yield pipe.drain()
+
+
+def stream(frames, fmt, title):
+    return csv_stream(frames) if fmt == 'csv' else xlsx_stream(frames, title)
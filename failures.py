@@ -0,0 +1,88 @@
+# Maps raw provider error messages onto the dashboard's failure categories
+#
+# All patterns live in one regex of anchored lookaheads, tried in order, so the
+# first category whose pattern appears anywhere in a message wins. Each distinct
+# message is classified once; rows are then mapped with a single take().
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+OTHER = 'Other'
+
+# In priority order: specific phrases first, catch-alls like "invalid" last
+PATTERNS = [
+    ('Insufficient Balance', r'insufficient|not enough (?:funds|balance)|low balance|\bnsf\b'),
+    ('Limit Exceeded', r'limit|exceed(?:s|ed)? (?:the )?(?:max|daily|monthly|allowed)|too many|velocity|threshold'),
+    ('Invalid Credit Party', r'credit party|invalid (?:msisdn|beneficiary|recipient|receiver|payee)'
+                             r'|(?:recipient|beneficiary|receiver|payee) (?:not found|not registered|invalid)'
+                             r'|unregistered'),
+    ('Invalid Account', r'invalid account|account (?:not found|closed|blocked|suspended|inactive|invalid|frozen)'
+                        r'|dormant'),
+    ('SOAP Error', r'soap|\bxml\b|fault ?code|wsdl'),
+    ('Timed Out', r'timed? ?out|deadline exceeded|no response|took too long'),
+    ('Connectivity Error', r'connect|network|socket|unreachable|\bdns\b|\bssl\b|\btls\b|refused|reset by peer'),
+    ('System Error', r'system (?:error|failure)|internal (?:server )?error|\b5\d\d\b|exception'
+                     r'|service unavailable|bad gateway'),
+    ('General Failure', r'general (?:failure|error)|generic (?:failure|error)|failed to process|declined'),
+    ('Invalid Details', r'invalid|mismatch|incorrect|malformed|missing|wrong format|bad request'),
+]
+
+LABELS = [label for label, _ in PATTERNS] + [OTHER]
+
+_MATCHER = re.compile(
+    '|'.join(f'(?=.*?(?P<c{i}>{pattern}))' for i, (_, pattern) in enumerate(PATTERNS)),
+    re.IGNORECASE | re.DOTALL
+)
+
+# Distinct messages seen so far -> position in LABELS
+_cache = {}
+_cache_lock = threading.Lock()
+MAX_CACHE = 100_000
+
+
+def classify_message(message):
+    if not isinstance(message, str):
+        return len(LABELS) - 1
+    code = _cache.get(message)
+    if code is None:
+        match = _MATCHER.match(message)
+        code = int(match.lastgroup[1:]) if match else len(LABELS) - 1
+        with _cache_lock:
+            if len(_cache) >= MAX_CACHE:
+                _cache.clear()
+            _cache[message] = code
+    return code
+
+
+# Categorical of LABELS, one per message; missing messages are Other
+def classify(messages):
+    codes, uniques = pd.factorize(pd.Series(messages, copy=False), use_na_sentinel=True)
+    lookup = np.fromiter(
+        (classify_message(message) for message in np.asarray(uniques, dtype=object)),
+        dtype=np.int8, count=len(uniques)
+    )
+    # The extra slot maps the NA sentinel (-1) to Other
+    lookup = np.append(lookup, np.int8(len(LABELS) - 1))
+    return pd.Categorical.from_codes(lookup.take(codes), categories=LABELS)
+
+
+if __name__ == '__main__':
+    # python failures.py FILE [FILE ...]: category counts and the commonest unmatched messages
+    import sys
+
+    import ingest
+
+    counts = pd.Series(0, index=LABELS)
+    unmatched = pd.Series(dtype=np.int64)
+    for path in sys.argv[1:]:
+        for chunk in ingest.read_chunks(path):
+            messages = chunk[ingest.REASON].dropna().astype(str)
+            labels = classify(messages.values)
+            counts = counts.add(pd.Series(labels).value_counts(), fill_value=0)
+            other = messages[np.asarray(labels) == OTHER].value_counts()
+            unmatched = unmatched.add(other, fill_value=0)
+    print(counts.reindex(LABELS).astype(np.int64).to_string())
+    print('\nUnmatched:')
+    print(unmatched.sort_values(ascending=False).head(20).astype(np.int64).to_string())
@@ -0,0 +1,107 @@
+# Serialized payloads cached once per data version, pre-compressed and served with ETags
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+import result_cache
+
+# brotli is optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Payload:
+    # brotli_quality: 9 for payloads built once and served often, lower for one-off responses
+    def __init__(self, body, brotli_quality=9):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded = {'gzip': gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(body, quality=brotli_quality)
+
+    # Codec for result_cache: the body and its compressed forms as raw blocks
+    @staticmethod
+    def dumps(payload):
+        encodings = sorted(payload.encoded)
+        return result_cache.pack(
+            {'etag': payload.etag, 'encodings': encodings},
+            [payload.body] + [payload.encoded[encoding] for encoding in encodings]
+        )
+
+    @staticmethod
+    def loads(blob):
+        header, blocks = result_cache.unpack(blob)
+        payload = Payload.__new__(Payload)
+        payload.body, payload.etag = blocks[0], header['etag']
+        payload.encoded = dict(zip(header['encodings'], blocks[1:]))
+        return payload
+
+    # Smallest representation the client accepts, with its own ETag
+    def representation(self, accept_encoding):
+        accepted = [e.split(';')[0].strip() for e in (accept_encoding or '').split(',')]
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.encoded:
+                return encoding, self.encoded[encoding], f'{self.etag}-{encoding}'
+        return None, self.body, self.etag
+
+
+def respond(payload, mimetype='application/json', cache_control='no-cache'):
+    encoding, body, etag = payload.representation(request.headers.get('Accept-Encoding'))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    # no-cache still lets the browser keep the body, it just revalidates with If-None-Match
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class FigureCache:
+    # shared: optional result_cache.ResultCache consulted before building
+    def __init__(self, max_entries=256, shared=None, brotli_quality=9):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._version = None
+        self._payloads = OrderedDict()
+        # Lookups answered from this worker's memory, and the rest
+        self.hits = 0
+        self.misses = 0
+
+    # Entries from older data versions are dropped as soon as a new version is seen
+    def get(self, version, key, build):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._payloads = OrderedDict()
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self._payloads.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if payload is None:
+            if self.shared is not None:
+                payload = self.shared.get(
+                    version, ('payload', key), lambda: Payload(build(), self.brotli_quality), Payload
+                )
+            else:
+                payload = Payload(build(), self.brotli_quality)
+            with self._lock:
+                if version == self._version:
+                    self._payloads[key] = payload
+                    while len(self._payloads) > self.max_entries:
+                        self._payloads.popitem(last=False)
+        return payload
@@ -0,0 +1,637 @@
+# Figure builders for each dashboard card, called when the card is first shown
+import numpy as np
+import plotly.graph_objects as go
+
+import ingest
+
+# Marks the traces that plot KES volume in millions, pies included; assets/display.js
+# rescales them in the browser to the unit picked, dividing by the same numbers
+VOLUME = 'volume'
+VOLUME_UNITS = {'M': 1e6, 'B': 1e9}
+
+
+# Monthly Transaction Analysis
+def monthly_trends(tables):
+    monthly_data = tables['monthly']
+    return go.Figure(data=[
+        go.Bar(
+            name='Volume',
+            x=monthly_data['Month'],
+            y=monthly_data['Volume']/1e6,
+            meta=VOLUME,
+            marker_color='rgba(26, 118, 255, 0.8)',
+            yaxis='y'
+        ),
+        go.Scatter(
+            name='Success Rate',
+            x=monthly_data['Month'],
+            y=monthly_data['Success_Rate'],
+            mode='lines+markers',
+            marker=dict(
+                size=8,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title='Monthly Volume and Success Rate Trends',
+        yaxis=dict(
+            title='Volume (KES Millions)',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Success Rate (%)',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right',
+            range=[90, 100]
+        ),
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=30),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        )
+    )
+
+
+# Success Rate Performance
+def success_gauge(tables):
+    monthly_data = tables['monthly']
+    return go.Figure(
+        go.Indicator(
+            mode="gauge+number",
+            value=monthly_data['Success_Rate'].mean(),
+            title={"text": "Average Success Rate",
+                   "font": {"size": 16},
+                   "align": "center"},
+            number={"suffix": "%",
+                   "font": {"size": 28}},
+            gauge={
+                'axis': {'range': [0, 100]},
+                'bar': {'color': "#006400"},  # Dark green
+                'steps': [
+                    {'range': [0, 75], 'color': 'rgba(0, 100, 0, 0.2)'},
+                    {'range': [75, 85], 'color': 'rgba(0, 100, 0, 0.4)'},
+                    {'range': [85, 100], 'color': 'rgba(0, 100, 0, 0.6)'}
+                ],
+                'threshold': {
+                    'line': {'color': "red", 'width': 2},
+                    'thickness': 0.75,
+                    'value': monthly_data['Success_Rate'].mean()
+                }
+            }
+        )
+    ).update_layout(
+        height=300,
+        margin=dict(l=30, r=30, t=30, b=30)
+    )
+
+
+# Countries the selection has transactions from, not counting unknown ones
+def active_countries(tables):
+    country_data = tables['country']
+    active = (country_data['Transactions'] > 0) & (country_data['Country'] != ingest.UNKNOWN_COUNTRY)
+    return int(active.sum())
+
+
+# The three numbers under the user activity labels
+def user_counts(tables):
+    users_data = tables['users']
+    return [
+        f"{active_countries(tables):,}",
+        f"{users_data['Remitters'].iloc[0]:,}",
+        f"{users_data['Recipients'].iloc[0]:,}"
+    ]
+
+
+# User Activity Metrics
+def user_activity(tables):
+    return go.Figure(data=[
+        go.Scatter(
+            x=[0.2, 0.5, 0.8],
+            y=[1.15, 1.15, 1.15],
+            mode='text',
+            text=['🌍', '👥', '👤'],
+            textfont=dict(size=24),
+            hoverinfo='none',
+            showlegend=False
+        ),
+        go.Scatter(
+            x=[0.2, 0.5, 0.8],
+            y=[1, 1, 1],
+            mode='text',
+            text=['Active Countries', 'Total Remitters', 'Total Recipients'],
+            textfont=dict(size=14),
+            hoverinfo='none',
+            showlegend=False
+        ),
+        go.Scatter(
+            x=[0.2, 0.5, 0.8],
+            y=[0.85, 0.85, 0.85],
+            mode='text',
+            text=user_counts(tables),
+            textfont=dict(size=24, color='#2E86C1'),
+            hoverinfo='none',
+            showlegend=False
+        )
+    ]).update_layout(
+        height=300,
+        showlegend=False,
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            showticklabels=False,
+            range=[0, 1]
+        ),
+        yaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            showticklabels=False,
+            range=[0.5, 1.2]
+        ),
+        margin=dict(l=20, r=20, t=20, b=20),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+
+
+# Monthly User Activity
+def monthly_users(tables):
+    monthly_data = tables['monthly']
+    return go.Figure(data=[
+        go.Bar(
+            name='Remitters',
+            x=monthly_data['Month'],
+            y=monthly_data['Unique_Remitters'],
+            marker_color='rgba(26, 118, 255, 0.8)'
+        ),
+        go.Bar(
+            name='Recipients',
+            x=monthly_data['Month'],
+            y=monthly_data['Unique_Recipients'],
+            marker_color='rgba(255, 128, 0, 0.8)'
+        )
+    ]).update_layout(
+        title='Monthly Active Users',
+        barmode='group',
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=30),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        )
+    )
+
+
+# Geographic Distribution
+def country_share(tables):
+    country_data = tables['country']
+    return go.Figure(
+        go.Pie(
+            labels=country_data['Country'],
+            values=country_data['Volume']/1e6,
+            meta=VOLUME,
+            textinfo='label+percent',
+            hole=0.3,
+            hovertemplate=(
+                "<b>%{label}</b><br>" +
+                "Volume: KES %{value:,.2f}M<br>" +
+                "Share: %{percent}<extra></extra>"
+            )
+        )
+    ).update_layout(
+        title='Transaction Volume by Country',
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=30)
+    )
+
+
+# Daily Transaction Pattern
+def daily_pattern(tables):
+    daily_data = tables['daily']
+    return go.Figure(data=[
+        go.Bar(
+            name='Volume',
+            x=daily_data['Day'],
+            y=daily_data['Volume']/1e6,
+            meta=VOLUME,
+            marker_color='rgba(26, 118, 255, 0.8)',
+            yaxis='y'
+        ),
+        go.Scatter(
+            name='Transactions',
+            x=daily_data['Day'],
+            y=daily_data['Count'],
+            mode='lines+markers',
+            marker=dict(
+                size=8,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title='Daily Transaction Patterns',
+        yaxis=dict(
+            title='Volume (KES Millions)',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Number of Transactions',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right'
+        ),
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=30),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        )
+    )
+
+
+# Failure Analysis
+def failure_treemap(tables):
+    failure_data = tables['failure']
+    return go.Figure(
+        go.Treemap(
+            labels=failure_data['Reason'],
+            parents=[''] * len(failure_data),
+            values=failure_data['Total'],
+            textinfo='label+value+percent parent',
+            hovertemplate=(
+                "<b>%{label}</b><br>" +
+                "Count: %{value}<br>" +
+                "Percentage: %{percentParent:.1%}<extra></extra>"
+            ),
+            marker=dict(
+                colors=failure_data['Total'],
+                colorscale=[[0, '#ffebee'], [1, '#c62828']],
+                showscale=True
+            ),
+            textfont=dict(size=13)
+        )
+    ).update_layout(
+        title='Transaction Failure Distribution',
+        height=400,
+        margin=dict(l=20, r=20, t=50, b=20)
+    )
+
+
+# Hourly Transaction Pattern
+def hourly_pattern(tables):
+    hourly_data = tables['hourly']
+    return go.Figure(data=[
+        go.Scatter(
+            x=hourly_data['Hour'],
+            y=hourly_data['Volume']/1e6,
+            meta=VOLUME,
+            mode='lines+markers',
+            name='Volume',
+            marker=dict(
+                size=6,
+                color='rgba(26, 118, 255, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(26, 118, 255, 0.8)'
+            ),
+            yaxis='y'
+        ),
+        go.Scatter(
+            x=hourly_data['Hour'],
+            y=hourly_data['Count'],
+            mode='lines+markers',
+            name='Transaction Count',
+            marker=dict(
+                size=6,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title='Hourly Volume and Transaction Count Distribution',
+        xaxis_title='Hour of Day',
+        yaxis=dict(
+            title='Volume (KES Millions)',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Number of Transactions',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right'
+        ),
+        height=350,
+        margin=dict(l=50, r=50, t=50, b=100),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        ),
+        xaxis=dict(
+            tickangle=-45,
+            tickmode='array',
+            ticktext=hourly_data['Hour'],
+            tickvals=list(range(len(hourly_data)))
+        )
+    )
+
+
+# Client Market Share
+def client_share(tables):
+    client_data = tables['client']
+    return go.Figure(
+        data=[go.Pie(
+            labels=client_data['Client'],
+            values=client_data['Volume']/1e6,
+            meta=VOLUME,
+            textinfo='label+percent',
+            hole=0.4,
+            marker=dict(
+                colors=['rgb(82, 109, 255)', 'rgb(255, 99, 71)',
+                       'rgb(32, 178, 170)', 'rgb(255, 159, 64)',
+                       'rgb(153, 102, 255)', 'rgb(255, 99, 132)',
+                       'rgb(75, 192, 192)', 'rgb(54, 162, 235)']
+            ),
+            hovertemplate=(
+                "<b>%{label}</b><br>" +
+                "Volume: KES %{value:,.2f}M<br>" +
+                "Share: %{percent}<extra></extra>"
+            )
+        )]
+    ).update_layout(
+        title={
+            'text': 'Transaction Volume by Client',
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        height=400,
+        margin=dict(l=20, r=20, t=50, b=20),
+        showlegend=True,
+        legend=dict(
+            orientation="v",
+            yanchor="middle",
+            y=0.5,
+            xanchor="left",
+            x=1.1,
+            font=dict(size=11)
+        )
+    )
+
+
+# Client Performance Metrics
+def client_performance(tables):
+    client_data = tables['client']
+    return go.Figure(data=[
+        go.Bar(
+            name='Transactions',
+            x=client_data['Client'],
+            y=client_data['Transactions'],
+            marker_color='rgba(26, 118, 255, 0.8)',
+            yaxis='y'
+        ),
+        go.Scatter(
+            name='Market Share (%)',
+            x=client_data['Client'],
+            y=client_data['Market_Share'],
+            mode='lines+markers',
+            marker=dict(
+                size=8,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title='Client Transaction Activity',
+        yaxis=dict(
+            title='Number of Transactions',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Market Share (%)',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right'
+        ),
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=100),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        ),
+        xaxis_tickangle=-45
+    )
+
+
+# Drill-down breakdown answered from the cube
+def drilldown(frame, by, title):
+    return go.Figure(data=[
+        go.Bar(
+            name='Volume',
+            x=frame[by],
+            y=frame['volume']/1e6,
+            meta=VOLUME,
+            marker_color='rgba(26, 118, 255, 0.8)',
+            yaxis='y'
+        ),
+        go.Scatter(
+            name='Success Rate',
+            x=frame[by],
+            y=frame['success_rate'],
+            mode='lines+markers',
+            marker=dict(
+                size=6,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            line=dict(
+                width=2,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title=title,
+        yaxis=dict(
+            title='Volume (KES Millions)',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Success Rate (%)',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right'
+        ),
+        height=350,
+        margin=dict(l=50, r=50, t=50, b=80),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        ),
+        xaxis_tickangle=-45
+    )
+
+
+# Weekday x half-hour heatmap of either volume or transaction count
+def weekly_heatmap(week, measure, title):
+    days = list(dict.fromkeys(week['Day']))
+    hours = list(dict.fromkeys(week['Hour']))
+    volume = (week['Volume'].to_numpy() / 1e6).reshape(len(days), len(hours))
+    count = week['Count'].to_numpy().reshape(len(days), len(hours))
+    if measure == 'Count':
+        z, colorbar = count, 'Transactions'
+    else:
+        z, colorbar = volume, 'KES Millions'
+    return go.Figure(data=[
+        go.Heatmap(
+            z=z,
+            x=hours,
+            y=days,
+            customdata=np.dstack([volume, count]),
+            # display.js rescales z only when it is volume; the hover volume always
+            meta=VOLUME if measure != 'Count' else None,
+            colorscale='Blues',
+            colorbar=dict(title=colorbar),
+            hovertemplate='%{y} %{x}<br>KES %{customdata[0]:,.2f}M<br>%{customdata[1]:,} transactions<extra></extra>'
+        )
+    ]).update_layout(
+        title=title,
+        xaxis_title='Hour of Day',
+        yaxis=dict(autorange='reversed'),
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=80),
+        xaxis_tickangle=-45
+    )
+
+
+# Above this many points per trace the browser draws with WebGL instead of SVG
+GL_POINTS = 1000
+
+
+def _line(n):
+    return go.Scattergl if n > GL_POINTS else go.Scatter
+
+
+# Half-hourly volume and transaction count over the whole period, already downsampled
+def timeline(volume_times, volume, count_times, count, title, revision):
+    return go.Figure(data=[
+        _line(len(volume))(
+            x=volume_times.astype('datetime64[m]'),
+            y=volume/1e6,
+            meta=VOLUME,
+            mode='lines',
+            name='Volume',
+            line=dict(
+                width=1,
+                color='rgba(26, 118, 255, 0.8)'
+            ),
+            yaxis='y'
+        ),
+        _line(len(count))(
+            x=count_times.astype('datetime64[m]'),
+            y=count,
+            mode='lines',
+            name='Transaction Count',
+            line=dict(
+                width=1,
+                color='rgba(255, 128, 0, 0.8)'
+            ),
+            yaxis='y2'
+        )
+    ]).update_layout(
+        title=title,
+        yaxis=dict(
+            title='Volume (KES Millions)',
+            titlefont=dict(color='rgba(26, 118, 255, 0.8)'),
+            tickfont=dict(color='rgba(26, 118, 255, 0.8)')
+        ),
+        yaxis2=dict(
+            title='Number of Transactions',
+            titlefont=dict(color='rgba(255, 128, 0, 0.8)'),
+            tickfont=dict(color='rgba(255, 128, 0, 0.8)'),
+            overlaying='y',
+            side='right'
+        ),
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=30),
+        legend=dict(
+            orientation="h",
+            y=1.1,
+            x=0.5,
+            xanchor='center'
+        ),
+        # Keeps the zoom when the downsampled points are swapped in
+        uirevision=revision
+    )
+
+
+CARDS = {
+    'monthly-trends': monthly_trends,
+    'success-gauge': success_gauge,
+    'user-activity': user_activity,
+    'monthly-users': monthly_users,
+    'country-share': country_share,
+    'daily-pattern': daily_pattern,
+    'failure-treemap': failure_treemap,
+    'hourly-pattern': hourly_pattern,
+    'client-share': client_share,
+    'client-performance': client_performance
+}
+
+
+def build(card, tables):
+    return CARDS[card](tables)
+
+
+# Empty figure shown until the card is filled, sized like the real one
+def placeholder(height):
+    return {
+        'data': [],
+        'layout': {
+            'height': height,
+            'xaxis': {'visible': False},
+            'yaxis': {'visible': False},
+            'paper_bgcolor': 'white',
+            'plot_bgcolor': 'white'
+        }
+    }
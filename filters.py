@@ -0,0 +1,273 @@
+# Date range and client/country filtering over the per-day buckets
+#
+# Buckets are kept sorted by day, so a date range is two binary searches and a
+# slice of views; client and country filters only mask the rows in that slice.
+import types
+
+import numpy as np
+import pandas as pd
+
+import heatmap
+import hll
+import ingest
+
+DAY = np.timedelta64(1, 'D')
+
+
+def _codes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return np.asarray(values.cat.codes), list(values.cat.categories.astype(str))
+    codes, labels = pd.factorize(values, sort=True)
+    return codes, list(map(str, labels))
+
+
+def _days(values):
+    return np.asarray(values, dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+# Snapshots already store buckets in day order, so this is usually a no-op
+def _sorted_by_day(frame):
+    days = _days(frame['date'])
+    if len(days) > 1 and np.any(days[1:] < days[:-1]):
+        return frame.iloc[np.argsort(days, kind='stable')]
+    return frame
+
+
+# Normalized filter: (start, end, clients, countries, tenant), or None for "everything"
+# of the default tenant. Only partitioned sources have tenants (see partitions.py).
+def normalize(start=None, end=None, clients=None, countries=None, tenant=None):
+    start = str(pd.Timestamp(start).date()) if start else None
+    end = str(pd.Timestamp(end).date()) if end else None
+    clients = tuple(sorted(set(clients))) if clients else ()
+    countries = tuple(sorted(set(countries))) if countries else ()
+    tenant = tenant or None
+    if not (start or end or clients or countries or tenant):
+        return None
+    return (start, end, clients, countries, tenant)
+
+
+def from_args(args):
+    return normalize(
+        args.get('start'), args.get('end'), args.getlist('client'), args.getlist('country'), args.get('tenant')
+    )
+
+
+def to_query(selection):
+    if selection is None:
+        return {}
+    start, end, clients, countries, tenant = selection
+    query = {'client': list(clients), 'country': list(countries)}
+    if start:
+        query['start'] = start
+    if end:
+        query['end'] = end
+    if tenant:
+        query['tenant'] = tenant
+    return query
+
+
+class FactIndex:
+    # remitters, recipients: hll.Sketches per month, client and country, when the source has them
+    def __init__(self, facts, failures, monthly=None, remitters=None, recipients=None):
+        facts = _sorted_by_day(facts)
+        self.days = _days(facts['date'])
+        self.months = self.days.astype('datetime64[M]')
+        self.month_starts = np.unique(self.months)
+        self.month_codes = np.searchsorted(self.month_starts, self.months).astype(np.int32)
+        # 1970-01-01 was a Thursday
+        self.weekdays = ((self.days.astype(np.int64) + 3) % 7).astype(np.int8)
+        self.slots = np.asarray(facts['slot'], dtype=np.int8)
+        self.client_codes, self.clients = _codes(facts['client'])
+        self.country_codes, self.countries = _codes(facts['country'])
+        self.volume = np.asarray(facts['volume'], dtype=np.float64)
+        self.count = np.asarray(facts['count'], dtype=np.int64)
+        self.success = np.asarray(facts['success'], dtype=np.int64)
+
+        failures = _sorted_by_day(failures)
+        self.failure_days = _days(failures['date'])
+        self.failure_clients = np.asarray(pd.Categorical(failures['client'], categories=self.clients).codes)
+        self.failure_countries = np.asarray(pd.Categorical(failures['country'], categories=self.countries).codes)
+        self.reason_codes, self.reasons = _codes(failures['reason'])
+        self.failure_count = np.asarray(failures['count'], dtype=np.int64)
+
+        # Distinct users are not additive: filtered counts merge the matching sketches, and
+        # without sketches every filter shows the unfiltered monthly counts
+        self.sketches = None
+        if remitters is not None and recipients is not None:
+            self.sketches = {'remitters': remitters, 'recipients': recipients}
+            self.sketch_months = {name: s.months for name, s in self.sketches.items()}
+            self.sketch_clients = {
+                name: np.asarray(pd.Categorical(s.keys['client'], categories=self.clients).codes)
+                for name, s in self.sketches.items()
+            }
+            self.sketch_countries = {
+                name: np.asarray(pd.Categorical(s.keys['country'], categories=self.countries).codes)
+                for name, s in self.sketches.items()
+            }
+        self.remitters, self.recipients = {}, {}
+        if monthly is not None:
+            for month, row in zip(self.month_starts, monthly.itertuples()):
+                self.remitters[pd.Timestamp(month)] = row.Unique_Remitters
+                self.recipients[pd.Timestamp(month)] = row.Unique_Recipients
+
+    @classmethod
+    def from_aggregates(cls, aggregates, monthly=None):
+        frames = aggregates.fact_frames()
+        return cls(frames['facts'], frames['failures'], monthly, aggregates.remitters, aggregates.recipients)
+
+    @property
+    def first_day(self):
+        return str(self.days[0]) if len(self.days) else None
+
+    @property
+    def last_day(self):
+        return str(self.days[-1]) if len(self.days) else None
+
+    def _range(self, days, start, end):
+        lo = np.searchsorted(days, np.datetime64(start, 'D'), 'left') if start else 0
+        hi = np.searchsorted(days, np.datetime64(end, 'D') + DAY, 'left') if end else len(days)
+        return slice(lo, hi)
+
+    def _mask(self, client_codes, country_codes, clients, countries):
+        mask = None
+        if clients:
+            wanted = [self.clients.index(c) for c in clients if c in self.clients]
+            mask = np.isin(client_codes, wanted)
+        if countries:
+            wanted = [self.countries.index(c) for c in countries if c in self.countries]
+            country_mask = np.isin(country_codes, wanted)
+            mask = country_mask if mask is None else mask & country_mask
+        return mask
+
+    # Row positions of the buckets matching a normalized filter
+    def select(self, selection):
+        if selection is None:
+            return slice(None), slice(None)
+        start, end, clients, countries, _ = selection
+        rows = self._range(self.days, start, end)
+        mask = self._mask(self.client_codes[rows], self.country_codes[rows], clients, countries)
+        if mask is not None:
+            rows = np.flatnonzero(mask) + rows.start
+        failure_rows = self._range(self.failure_days, start, end)
+        mask = self._mask(
+            self.failure_clients[failure_rows], self.failure_countries[failure_rows], clients, countries
+        )
+        if mask is not None:
+            failure_rows = np.flatnonzero(mask) + failure_rows.start
+        return rows, failure_rows
+
+    # Sketches are per month, so a date range counts the users of every month it touches
+    def _sketches(self, name, selection):
+        sketches = self.sketches[name]
+        if selection is None:
+            return sketches
+        start, end, clients, countries, _ = selection
+        months = self.sketch_months[name]
+        keep = np.ones(len(months), dtype=bool)
+        if start:
+            keep &= months >= np.datetime64(start, 'M')
+        if end:
+            keep &= months <= np.datetime64(end, 'M')
+        mask = self._mask(self.sketch_clients[name], self.sketch_countries[name], clients, countries)
+        if mask is not None:
+            keep &= mask
+        return sketches.take(np.flatnonzero(keep))
+
+    def tables(self, selection=None):
+        rows, failure_rows = self.select(selection)
+        volume, count, success = self.volume[rows], self.count[rows], self.success[rows]
+
+        def sums(codes, n, columns=('volume', 'count')):
+            weights = {'volume': volume, 'count': count, 'success': success}
+            return pd.DataFrame({
+                column: np.bincount(codes, weights=weights[column], minlength=n) for column in columns
+            })
+
+        monthly = sums(self.month_codes[rows], len(self.month_starts), ('volume', 'count', 'success'))
+        monthly.index = pd.DatetimeIndex(self.month_starts.astype('datetime64[ns]'))
+        monthly = monthly[monthly['count'] > 0]
+        country = sums(self.country_codes[rows], len(self.countries))
+        country.index = self.countries
+        client = sums(self.client_codes[rows], len(self.clients))
+        client.index = self.clients
+        reasons = pd.Series(
+            np.bincount(self.reason_codes[failure_rows], weights=self.failure_count[failure_rows],
+                        minlength=len(self.reasons)),
+            index=self.reasons
+        )
+        return ingest.assemble_tables(
+            monthly=monthly,
+            hourly=sums(self.slots[rows], 48),
+            daily=sums(self.weekdays[rows], 7),
+            country=country[country['count'] > 0],
+            client=client[client['count'] > 0],
+            reasons=reasons[reasons > 0],
+            **self._users(selection)
+        )
+
+    def _users(self, selection):
+        if self.sketches is None:
+            return {'remitters': self.remitters, 'recipients': self.recipients}
+        remitters = self._sketches('remitters', selection)
+        recipients = self._sketches('recipients', selection)
+        return {
+            'remitters': remitters.by_month(),
+            'recipients': recipients.by_month(),
+            'users': hll.user_totals(remitters, recipients)
+        }
+
+    # The selected buckets as rows, chunk_rows at a time
+    def buckets(self, selection=None, chunk_rows=50_000):
+        rows, _ = self.select(selection)
+        rows = np.arange(len(self.days))[rows]
+        for lo in range(0, len(rows), chunk_rows):
+            chunk = rows[lo:lo + chunk_rows]
+            count = self.count[chunk]
+            yield pd.DataFrame({
+                'Date': np.datetime_as_string(self.days[chunk], unit='D'),
+                'Half_Hour': np.asarray(ingest.SLOTS, dtype=object)[self.slots[chunk]],
+                'Client': np.asarray(self.clients, dtype=object)[self.client_codes[chunk]],
+                'Country': np.asarray(self.countries, dtype=object)[self.country_codes[chunk]],
+                'Volume': self.volume[chunk],
+                'Transactions': count,
+                'Successful': self.success[chunk]
+            })
+
+    # Weekday x half-hour grid for a filter, optionally narrowed to one client
+    def week(self, selection=None, client=None):
+        if client is not None:
+            start, end, _, countries, tenant = selection or (None, None, (), (), None)
+            selection = normalize(start, end, [client], countries, tenant)
+        rows, _ = self.select(selection)
+        return heatmap.week_table(*heatmap.week_grid(
+            self.weekdays[rows], self.slots[rows], self.volume[rows], self.count[rows]
+        ))
+
+    # The selected buckets with only the clients, countries and months they contain,
+    # shaped for cube.Cube.from_index
+    def cells(self, selection=None):
+        rows, _ = self.select(selection)
+        clients, client_codes = np.unique(self.client_codes[rows], return_inverse=True)
+        countries, country_codes = np.unique(self.country_codes[rows], return_inverse=True)
+        months, month_codes = np.unique(self.month_codes[rows], return_inverse=True)
+        return types.SimpleNamespace(
+            clients=[self.clients[i] for i in clients], countries=[self.countries[i] for i in countries],
+            month_starts=self.month_starts[months],
+            client_codes=client_codes, country_codes=country_codes, month_codes=month_codes,
+            weekdays=self.weekdays[rows], slots=self.slots[rows],
+            volume=self.volume[rows], count=self.count[rows], success=self.success[rows]
+        )
+
+    # Half-hourly volume and count over every slot between the first and last selected day
+    def timeline(self, selection=None):
+        rows, _ = self.select(selection)
+        days = self.days[rows]
+        if not len(days):
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0), np.empty(0, dtype=np.int64)
+        first = days.min()
+        slot = (days - first).astype(np.int64) * 48 + self.slots[rows]
+        n = int(slot.max()) + 1
+        times = first.astype('datetime64[ns]') + np.arange(n) * np.timedelta64(ingest.SLOT_NS, 'ns')
+        volume = np.bincount(slot, weights=self.volume[rows], minlength=n)
+        count = np.bincount(slot, weights=self.count[rows], minlength=n).astype(np.int64)
+        return times, volume, count
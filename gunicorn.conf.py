@@ -0,0 +1,12 @@
+# Gunicorn hooks that keep METRICS_DIR to the workers of the running master (see metrics.py)
+import metrics
+
+
+# A new master starts with no numbers from a previous deploy, benchmark or build step
+def on_starting(server):
+    metrics.registry.discard()
+
+
+# An exited worker's counters and histograms carry on in the archive; its gauges go
+def child_exit(server, worker):
+    metrics.registry.retire(worker.pid)
@@ -0,0 +1,65 @@
+# Weekday x half-hour load grid, binned in one np.bincount over a combined slot index
+import sys
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+CELLS = 7 * 48
+
+
+def week_grid(weekdays, slots, volume, count=None):
+    cell = np.asarray(weekdays, dtype=np.int64) * 48 + np.asarray(slots, dtype=np.int64)
+    volume_grid = np.bincount(cell, weights=volume, minlength=CELLS).reshape(7, 48)
+    if count is None:
+        count_grid = np.bincount(cell, minlength=CELLS).reshape(7, 48)
+    else:
+        count_grid = np.bincount(cell, weights=count, minlength=CELLS).astype(np.int64).reshape(7, 48)
+    return volume_grid, count_grid
+
+
+# Raw transaction timestamps, one row per transaction
+def from_timestamps(timestamps, amounts):
+    ts = np.asarray(timestamps, dtype='datetime64[ns]')
+    days = ts.astype('datetime64[D]')
+    # 1970-01-01 was a Thursday
+    weekdays = (days.astype(np.int64) + 3) % 7
+    slots = (ts - days).astype(np.int64) // ingest.SLOT_NS
+    return week_grid(weekdays, slots, np.asarray(amounts, dtype=np.float64))
+
+
+def week_table(volume_grid, count_grid):
+    return pd.DataFrame({
+        'Day': np.repeat(ingest.DAYS, 48),
+        'Hour': np.tile(ingest.SLOTS, 7),
+        'Volume': volume_grid.ravel().astype(np.float64),
+        'Count': count_grid.ravel().astype(np.int64)
+    })
+
+
+# Streams raw exports chunk by chunk, optionally for a single client
+def from_files(paths, client=None, chunksize=ingest.CHUNKSIZE):
+    volume_grid = np.zeros((7, 48))
+    count_grid = np.zeros((7, 48), dtype=np.int64)
+    for path in paths:
+        for chunk in ingest.read_chunks(path, chunksize):
+            if client is not None:
+                chunk = chunk[chunk[ingest.CLIENT].astype(object) == client]
+            amounts = pd.to_numeric(chunk[ingest.AMOUNT], errors='coerce').fillna(0.0)
+            volume, count = from_timestamps(pd.to_datetime(chunk[ingest.TIMESTAMP], cache=True), amounts)
+            volume_grid += volume
+            count_grid += count
+    return week_table(volume_grid, count_grid)
+
+
+if __name__ == '__main__':
+    # python heatmap.py FILE [FILE ...] [--client NAME]
+    args = sys.argv[1:]
+    client = None
+    if '--client' in args:
+        position = args.index('--client')
+        client = args[position + 1]
+        args = args[:position] + args[position + 2:]
+    week = from_files(args, client)
+    print(week.sort_values('Volume', ascending=False).head(10).to_string(index=False))
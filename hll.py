@@ -0,0 +1,153 @@
+# HyperLogLog sketches of distinct user ids, one per month, client and country
+#
+# A sketch is 2**P one-byte registers holding the longest run of leading zeros
+# seen among the hashes routed to it. Sketches merge by taking the register-wise
+# maximum, so the distinct count of any combination of buckets comes from
+# merging their sketches, with a standard error of about 1.04 / sqrt(2**P).
+import numpy as np
+import pandas as pd
+
+P = 12
+M = 1 << P
+ALPHA = 0.7213 / (1 + 1.079 / M)
+KEYS = ['month', 'client', 'country']
+
+
+def hash_ids(ids):
+    # Ids are hashed as strings, so numeric and text exports of the same ids agree
+    return pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False)
+
+
+# Register index from the top P bits, rank from the leading zeros of the rest
+def _index_rank(hashes):
+    index = (hashes >> np.uint64(64 - P)).astype(np.int64)
+    rest = (hashes & np.uint64((1 << (64 - P)) - 1)).astype(np.float64)
+    # rest < 2**52 converts exactly, so frexp gives the exact bit length
+    _, bits = np.frexp(rest)
+    rank = np.where(rest > 0, 64 - P - bits + 1, 64 - P + 1).astype(np.uint8)
+    return index, rank
+
+
+def estimate(registers):
+    registers = np.atleast_2d(registers)
+    raw = ALPHA * M * M / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    # Linear counting is more accurate while many registers are still empty
+    small = M * np.log(M / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * M) & (zeros > 0), small, raw)
+
+
+# Register-wise maximum of the rows sharing a group code
+def _reduce(codes, registers, n):
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    merged = np.zeros((n, M), dtype=np.uint8)
+    if len(order):
+        merged[codes[starts]] = np.maximum.reduceat(registers[order], starts, axis=0)
+    return merged
+
+
+def _empty_keys():
+    return pd.DataFrame({
+        'month': pd.DatetimeIndex([]),
+        'client': np.array([], dtype=object),
+        'country': np.array([], dtype=object)
+    })
+
+
+class Sketches:
+    def __init__(self, keys=None, registers=None):
+        # keys: one (month, client, country) row per sketch; registers: uint8 array, one row per key
+        self.keys = keys if keys is not None else _empty_keys()
+        self.registers = registers if registers is not None else np.zeros((0, M), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_ids(cls, month, client, country, ids):
+        ids = pd.Series(ids)
+        present = ids.notna().values
+        if not present.any():
+            return cls()
+        frame = pd.DataFrame({
+            'month': np.asarray(month, dtype='datetime64[ns]')[present],
+            'client': np.asarray(client, dtype=object)[present],
+            'country': np.asarray(country, dtype=object)[present]
+        })
+        # Both number the groups in order of first appearance
+        grouped = frame.groupby(KEYS, sort=False)
+        codes = grouped.ngroup().values
+        keys = grouped.size().index.to_frame(index=False)
+        index, rank = _index_rank(hash_ids(ids.values[present]))
+        registers = np.zeros((len(keys), M), dtype=np.uint8)
+        np.maximum.at(registers, (codes, index), rank)
+        return cls(keys, registers)
+
+    @classmethod
+    def concat(cls, sketches):
+        sketches = [s for s in sketches if len(s)]
+        if not sketches:
+            return cls()
+        if len(sketches) == 1:
+            return sketches[0]
+        keys = pd.concat([s.keys for s in sketches], ignore_index=True)
+        codes, unique = pd.factorize(pd.MultiIndex.from_frame(keys[KEYS]))
+        registers = _reduce(codes, np.concatenate([s.registers for s in sketches]), len(unique))
+        return cls(unique.to_frame(index=False, name=KEYS), registers)
+
+    def merge(self, other):
+        return Sketches.concat([self, other])
+
+    def take(self, rows):
+        return Sketches(self.keys.iloc[rows].reset_index(drop=True), self.registers[rows])
+
+    @property
+    def months(self):
+        return np.asarray(self.keys['month'], dtype='datetime64[ns]').astype('datetime64[M]')
+
+    def split_by_month(self):
+        months = self.months
+        for month in np.unique(months):
+            yield pd.Timestamp(month), self.take(np.flatnonzero(months == month))
+
+    def by_month(self):
+        months = self.months
+        unique, codes = np.unique(months, return_inverse=True)
+        counts = estimate(_reduce(codes, self.registers, len(unique))) if len(unique) else []
+        return {pd.Timestamp(month): int(round(count)) for month, count in zip(unique, counts)}
+
+    def union(self):
+        return self.registers.max(axis=0) if len(self) else np.zeros(M, dtype=np.uint8)
+
+    def total(self):
+        return int(round(estimate(self.union())[0]))
+
+    # Flat frames for the columnar snapshot
+    def frames(self):
+        keys = self.keys.copy()
+        for column in ('client', 'country'):
+            keys[column] = keys[column].astype('category')
+        return {'keys': keys, 'registers': pd.DataFrame({'registers': self.registers.ravel()})}
+
+    @classmethod
+    def from_frames(cls, keys, registers):
+        return cls(keys, np.asarray(registers['registers'], dtype=np.uint8).reshape(-1, M))
+
+
+# Headline user figures; remitters and recipients share one id space, so their union is every user
+def user_totals(remitters, recipients):
+    users = np.maximum(remitters.union(), recipients.union())
+    monthly = Sketches.concat([remitters, recipients]).by_month()
+    months = sorted(monthly)
+    growth = 0.0
+    if len(months) > 1 and monthly[months[0]]:
+        # Compound average month-over-month growth in monthly active users
+        growth = ((monthly[months[-1]] / monthly[months[0]]) ** (1 / (len(months) - 1)) - 1) * 100
+    return {
+        'Users': int(round(estimate(users)[0])),
+        'Remitters': remitters.total(),
+        'Recipients': recipients.total(),
+        'Monthly_Growth': round(growth, 2)
+    }
@@ -0,0 +1,312 @@
+# Streaming ingestion of raw transaction exports into the dashboard tables
+import numpy as np
+import pandas as pd
+
+import failures
+import hll
+
+# Raw export columns
+TIMESTAMP = 'timestamp'
+AMOUNT = 'amount'
+STATUS = 'status'
+CLIENT = 'client'
+COUNTRY = 'country'
+REMITTER = 'remitter_id'
+RECIPIENT = 'recipient_id'
+REASON = 'failure_reason'
+COLUMNS = [TIMESTAMP, AMOUNT, STATUS, CLIENT, COUNTRY, REMITTER, RECIPIENT, REASON]
+
+SUCCESS_STATUSES = ['success', 'successful', 'completed']
+
+# Labels used when a row has no client, country or failure reason
+OTHER_CLIENT = 'Others'
+UNKNOWN_COUNTRY = 'Unknown'
+OTHER_REASON = failures.OTHER
+
+# Rows per chunk read from disk
+CHUNKSIZE = 500_000
+
+# Tables shown by the dashboard
+TABLES = ['monthly', 'hourly', 'daily', 'country', 'client', 'failure', 'users']
+
+# Partial aggregates are kept per (day, half-hour slot, client, country)
+FACT_KEYS = ['date', 'slot', 'client', 'country']
+FAILURE_KEYS = ['date', 'client', 'country', 'reason']
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SLOT_NS = 30 * 60 * 10**9
+
+
+def slot_label(slot):
+    hour, minute = divmod(slot * 30, 60)
+    return f"{hour % 12 or 12}:{minute:02d}:00 {'AM' if hour < 12 else 'PM'}"
+
+
+SLOTS = [slot_label(slot) for slot in range(48)]
+
+
+# Reading
+def read_chunks(path, chunksize=CHUNKSIZE):
+    if str(path).endswith(('.parquet', '.pq')):
+        # pyarrow is only needed for Parquet exports
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [c for c in COLUMNS if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            path,
+            usecols=lambda column: column in COLUMNS,
+            dtype={CLIENT: 'category', COUNTRY: 'category', STATUS: 'category',
+                   REASON: 'category', REMITTER: str, RECIPIENT: str},
+            chunksize=chunksize
+        )
+
+
+def _as_label(series, default):
+    series = series.astype(object)
+    return series.where(series.notna(), default)
+
+
+def prepare_chunk(chunk):
+    ts = pd.to_datetime(chunk[TIMESTAMP], cache=True).values.astype('datetime64[ns]')
+    date = ts.astype('datetime64[D]')
+    slot = ((ts - date).astype(np.int64) // SLOT_NS).astype(np.int8)
+    status = chunk[STATUS].astype(str).str.strip().str.lower()
+    n = len(chunk)
+    return pd.DataFrame({
+        'date': date.astype('datetime64[ns]'),
+        'slot': slot,
+        'client': _as_label(chunk[CLIENT], OTHER_CLIENT) if CLIENT in chunk else OTHER_CLIENT,
+        'country': _as_label(chunk[COUNTRY], UNKNOWN_COUNTRY) if COUNTRY in chunk else UNKNOWN_COUNTRY,
+        'volume': pd.to_numeric(chunk[AMOUNT], errors='coerce').fillna(0.0).values,
+        'count': np.ones(n, dtype=np.int64),
+        'success': status.isin(SUCCESS_STATUSES).values.astype(np.int64),
+        'reason': failures.classify(chunk[REASON].values) if REASON in chunk else OTHER_REASON,
+        'remitter': chunk[REMITTER].values if REMITTER in chunk else None,
+        'recipient': chunk[RECIPIENT].values if RECIPIENT in chunk else None,
+    }, index=chunk.index)
+
+
+def _sketch(rows, column):
+    if rows[column] is None or not rows[column].notna().any():
+        return hll.Sketches()
+    month = rows['date'].values.astype('datetime64[M]')
+    return hll.Sketches.from_ids(month, rows['client'].values, rows['country'].values, rows[column].values)
+
+
+# Mergeable partial aggregates
+class Aggregates:
+    def __init__(self, facts=None, failures=None, remitters=None, recipients=None):
+        self.facts = facts if facts is not None else empty_facts()
+        self.failures = failures if failures is not None else empty_failures()
+        # hll.Sketches of user ids per month, client and country
+        self.remitters = remitters if remitters is not None else hll.Sketches()
+        self.recipients = recipients if recipients is not None else hll.Sketches()
+        self._pending = []
+        self._pending_rows = 0
+
+    @classmethod
+    def from_chunk(cls, chunk):
+        return cls.from_rows(prepare_chunk(chunk))
+
+    # rows: a chunk after prepare_chunk
+    @classmethod
+    def from_rows(cls, rows):
+        facts = rows.groupby(FACT_KEYS, sort=False, observed=True)[['volume', 'count', 'success']].sum()
+        failed = rows[rows['success'] == 0]
+        failures = failed.groupby(FAILURE_KEYS, sort=False, observed=True)['count'].sum()
+        return cls(facts, failures, _sketch(rows, 'remitter'), _sketch(rows, 'recipient'))
+
+    def merge(self, other):
+        other.compact()
+        self._pending.append((other.facts, other.failures, other.remitters, other.recipients))
+        self._pending_rows += len(other.facts)
+        # Re-group lazily so merging many chunks stays linear in the number of buckets
+        if self._pending_rows > max(len(self.facts), 1_000_000):
+            self.compact()
+        return self
+
+    def compact(self):
+        if not self._pending:
+            return self
+        facts = [self.facts] + [pending[0] for pending in self._pending]
+        failures = [self.failures] + [pending[1] for pending in self._pending]
+        self.facts = pd.concat(facts).groupby(level=FACT_KEYS, sort=False, observed=True).sum()
+        self.failures = pd.concat(failures).groupby(level=FAILURE_KEYS, sort=False, observed=True).sum()
+        self.remitters = hll.Sketches.concat([self.remitters] + [pending[2] for pending in self._pending])
+        self.recipients = hll.Sketches.concat([self.recipients] + [pending[3] for pending in self._pending])
+        self._pending = []
+        self._pending_rows = 0
+        return self
+
+    # Flat bucket tables sorted by date, as stored in snapshots
+    def fact_frames(self):
+        self.compact()
+        facts = self.facts.reset_index().sort_values('date', kind='stable', ignore_index=True)
+        failures = self.failures.reset_index().sort_values('date', kind='stable', ignore_index=True)
+        for frame in (facts, failures):
+            for column in ('client', 'country', 'reason'):
+                if column in frame:
+                    frame[column] = frame[column].astype('category')
+        return {'facts': facts, 'failures': failures}
+
+    def tables(self):
+        self.compact()
+        return build_tables(self.facts, self.failures, self.remitters, self.recipients)
+
+
+def empty_facts():
+    index = pd.MultiIndex.from_arrays(
+        [pd.DatetimeIndex([]), np.array([], dtype=np.int8), np.array([], dtype=object),
+         np.array([], dtype=object)],
+        names=FACT_KEYS
+    )
+    return pd.DataFrame({
+        'volume': np.array([], dtype=np.float64),
+        'count': np.array([], dtype=np.int64),
+        'success': np.array([], dtype=np.int64)
+    }, index=index)
+
+
+def empty_failures():
+    index = pd.MultiIndex.from_arrays(
+        [pd.DatetimeIndex([]), np.array([], dtype=object), np.array([], dtype=object),
+         np.array([], dtype=object)],
+        names=FAILURE_KEYS
+    )
+    return pd.Series(np.array([], dtype=np.int64), index=index, name='count')
+
+
+# Dashboard tables
+def share(values):
+    total = values.sum()
+    return (values / total * 100).round(2) if total else values * 0.0
+
+
+def labels_last(frame, column, label):
+    return pd.concat([frame[frame[column] != label], frame[frame[column] == label]], ignore_index=True)
+
+
+def month_labels(months):
+    months = pd.DatetimeIndex(months)
+    if months.year.nunique() > 1:
+        return [f"{MONTHS[m.month - 1][:3]} {m.year}" for m in months]
+    return [MONTHS[m.month - 1] for m in months]
+
+
+def build_tables(facts, failures, remitters=None, recipients=None):
+    facts = facts.reset_index()
+    dates = pd.DatetimeIndex(facts['date'])
+    monthly = facts.groupby(dates.to_period('M').to_timestamp())[['volume', 'count', 'success']].sum()
+    return assemble_tables(
+        monthly=monthly,
+        hourly=facts.groupby('slot')[['volume', 'count']].sum(),
+        daily=facts.groupby(dates.dayofweek)[['volume', 'count']].sum(),
+        country=facts.groupby('country')[['volume', 'count']].sum(),
+        client=facts.groupby('client')[['volume', 'count']].sum(),
+        reasons=failures.groupby(level='reason').sum(),
+        remitters=remitters.by_month() if remitters is not None else {},
+        recipients=recipients.by_month() if recipients is not None else {},
+        users=hll.user_totals(remitters, recipients) if remitters is not None and recipients is not None else None
+    )
+
+
+# Builds the six tables from per-dimension sums: monthly is indexed by month start,
+# hourly by slot, daily by weekday, country and client by label, reasons by reason.
+# remitters and recipients map a month start to its distinct user count; users holds
+# the distinct totals over the whole period (see hll.user_totals).
+def assemble_tables(monthly, hourly, daily, country, client, reasons, remitters=None, recipients=None,
+                    users=None):
+    remitters = remitters or {}
+    recipients = recipients or {}
+
+    monthly = monthly.sort_index()
+    monthly_data = pd.DataFrame({
+        'Month': month_labels(monthly.index),
+        'Transactions': monthly['count'].values.astype(np.int64),
+        'Volume': monthly['volume'].values.astype(np.float64),
+        'Success_Rate': (monthly['success'] / monthly['count'] * 100).round(2).values,
+        'Unique_Remitters': np.array([remitters.get(month, 0) for month in monthly.index], dtype=np.int64),
+        'Unique_Recipients': np.array([recipients.get(month, 0) for month in monthly.index], dtype=np.int64)
+    })
+
+    hourly = hourly.reindex(range(48), fill_value=0)
+    hourly_data = pd.DataFrame({
+        'Hour': SLOTS,
+        'Volume': hourly['volume'].values.astype(np.float64),
+        'Count': hourly['count'].values.astype(np.int64)
+    })
+
+    daily = daily.reindex(range(7), fill_value=0)
+    daily_data = pd.DataFrame({
+        'Day': DAYS,
+        'Volume': daily['volume'].values.astype(np.float64),
+        'Count': daily['count'].values.astype(np.int64)
+    })
+
+    country = country.sort_index()
+    country_data = pd.DataFrame({
+        'Country': country.index.astype(str),
+        'Volume': country['volume'].values.astype(np.float64),
+        'Transactions': country['count'].values.astype(np.int64),
+        'Market_Share': share(country['volume']).values
+    })
+    country_data = labels_last(country_data, 'Country', UNKNOWN_COUNTRY)
+
+    client = client.sort_values('volume', ascending=False, kind='stable')
+    client_data = pd.DataFrame({
+        'Client': client.index.astype(str),
+        'Volume': client['volume'].values.astype(np.float64),
+        'Transactions': client['count'].values.astype(np.int64),
+        'Market_Share': share(client['volume']).values
+    })
+    client_data = labels_last(client_data, 'Client', OTHER_CLIENT)
+
+    reasons = reasons.sort_values(ascending=False, kind='stable')
+    failure_data = pd.DataFrame({
+        'Reason': reasons.index.astype(str),
+        'Total': reasons.values.astype(np.int64),
+        'Percentage': share(reasons).values
+    })
+    failure_data = labels_last(failure_data, 'Reason', OTHER_REASON)
+
+    return {
+        'monthly': monthly_data,
+        'hourly': hourly_data,
+        'daily': daily_data,
+        'country': country_data,
+        'client': client_data,
+        'failure': failure_data,
+        'users': users_table(users, monthly_data)
+    }
+
+
+# Without sketches the best available totals are the monthly counts summed, which over-count
+def users_table(users, monthly_data):
+    if users is None:
+        users = {
+            'Users': int(monthly_data['Unique_Remitters'].sum() + monthly_data['Unique_Recipients'].sum()),
+            'Remitters': int(monthly_data['Unique_Remitters'].sum()),
+            'Recipients': int(monthly_data['Unique_Recipients'].sum()),
+            'Monthly_Growth': 0.0
+        }
+    return pd.DataFrame({column: [value] for column, value in users.items()})
+
+
+# Entry points
+def ingest(paths, chunksize=CHUNKSIZE):
+    aggregates = Aggregates()
+    for path in paths:
+        for chunk in read_chunks(path, chunksize):
+            aggregates.merge(Aggregates.from_chunk(chunk))
+    return aggregates.compact()
+
+
+def build_tables_from_files(paths, chunksize=CHUNKSIZE):
+    return ingest(paths, chunksize).tables()
@@ -0,0 +1,79 @@
+# Live mode: only the values that changed since the browser's last copy are sent
+#
+# Each live card is reduced to the numbers it plots, in the order its figure
+# plots them. Comparing two of those gives a Patch of assignments and appends,
+# so a refresh costs as much as the change, never a whole figure.
+import math
+
+from dash import Patch, no_update
+
+
+def _values(series):
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in series.tolist()]
+
+
+# Card -> {'x': [...], 'y': [[...] per trace]}, {'value': number} or {'text': [...]}, matching
+# figures.py; volume is divided by volume_scale, 1e6 for the millions the figures start in
+def series(tables, volume_scale=1e6):
+    import figures
+
+    monthly = tables['monthly']
+    hourly = tables['hourly']
+    return {
+        'monthly-trends': {
+            'x': _values(monthly['Month']),
+            'y': [_values(monthly['Volume']/volume_scale), _values(monthly['Success_Rate'])]
+        },
+        'success-gauge': {
+            'value': float(monthly['Success_Rate'].mean()) if len(monthly) else None
+        },
+        'hourly-pattern': {
+            'x': _values(hourly['Hour']),
+            'y': [_values(hourly['Volume']/volume_scale), _values(hourly['Count'])]
+        },
+        'user-activity': {
+            'text': figures.user_counts(tables)
+        }
+    }
+
+
+CARDS = ['monthly-trends', 'success-gauge', 'hourly-pattern', 'user-activity']
+
+# Trace holding the numbers of a text card
+TEXT_TRACE = 2
+
+
+def _patch_list(target, key, old, new):
+    if old == new:
+        return False
+    shared = min(len(old), len(new))
+    changed = [i for i in range(shared) if old[i] != new[i]]
+    # Past half the points one assignment is smaller than many
+    if len(new) < len(old) or len(changed) * 2 > shared:
+        target[key] = new
+        return True
+    for i in changed:
+        target[key][i] = new[i]
+    if len(new) > shared:
+        target[key].extend(new[shared:])
+    return True
+
+
+def figure_patch(old, new):
+    patch = Patch()
+    changed = False
+    if 'value' in new:
+        if old.get('value') != new['value']:
+            patch['data'][0]['value'] = new['value']
+            changed = True
+    elif 'text' in new:
+        changed = _patch_list(patch['data'][TEXT_TRACE], 'text', old['text'], new['text'])
+    else:
+        for trace, (old_y, new_y) in enumerate(zip(old['y'], new['y'])):
+            changed |= _patch_list(patch['data'][trace], 'x', old['x'], new['x'])
+            changed |= _patch_list(patch['data'][trace], 'y', old_y, new_y)
+    return patch if changed else no_update
+
+
+def text_updates(old, new, ids):
+    return [new[i] if old.get(i) != new[i] else no_update for i in ids]
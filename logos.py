@@ -0,0 +1,131 @@
+# Right-sized, fingerprinted logo images for the header and the client market share card
+#
+#   python logos.py   (needs Pillow)
+#
+# Writes WebP, and AVIF where Pillow supports it, at 1x and 2x into static/ (see
+# static_files.py). The client logos share one sprite sheet, so the card loads them
+# in a single request. Without a build the app uses the original files under assets/.
+import io
+import os
+
+from dash import html
+
+import static_files
+
+ASSETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+MANIFEST = 'logos.json'
+
+HEADER = 'vngrd.PNG'
+HEADER_HEIGHT = 150
+CLIENT_DIR = 'CLIENT_LOGOS'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Content box of a client logo: 60x30 less 5px padding on each side
+CELL = (50, 20)
+DENSITIES = (1, 2)
+# Preferred first; the last one is the <img> fallback every browser gets
+FORMATS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 85, 'method': 6}
+}
+
+
+def _encode(image, fmt, directory, stem):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.upper(), **FORMATS[fmt])
+    return static_files.write(buffer.getvalue(), stem, f'.{fmt}', directory)
+
+
+# Scaled to fit the box, centred on a transparent background
+def _fit(image, width, height):
+    from PIL import Image
+
+    scale = min(width / image.width, height / image.height)
+    size = (max(round(image.width * scale), 1), max(round(image.height * scale), 1))
+    cell = Image.new('RGBA', (width, height))
+    cell.paste(image.resize(size, Image.LANCZOS), ((width - size[0]) // 2, (height - size[1]) // 2))
+    return cell
+
+
+def build(assets=ASSETS_PATH, directory=static_files.STATIC_PATH):
+    from PIL import Image, features
+
+    formats = [fmt for fmt in FORMATS if features.check(fmt)]
+    if 'webp' not in formats:
+        raise RuntimeError('Pillow was built without WebP support')
+    with Image.open(os.path.join(assets, HEADER)) as source:
+        header = source.convert('RGBA')
+    width = round(header.width * HEADER_HEIGHT / header.height)
+    manifest = {'header': {'width': width, 'height': HEADER_HEIGHT}}
+    for density in DENSITIES:
+        image = header.resize((width * density, HEADER_HEIGHT * density), Image.LANCZOS)
+        for fmt in formats:
+            manifest['header'].setdefault(fmt, []).append(
+                _encode(image, fmt, directory, f'header-{density}x')
+            )
+
+    names = sorted(
+        name for name in os.listdir(os.path.join(assets, CLIENT_DIR))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    logos = []
+    for name in names:
+        with Image.open(os.path.join(assets, CLIENT_DIR, name)) as source:
+            logos.append(source.convert('RGBA'))
+    manifest['sprite'] = {
+        'width': CELL[0] * len(names),
+        'height': CELL[1],
+        'cells': {f'{CLIENT_DIR}/{name}': i * CELL[0] for i, name in enumerate(names)}
+    }
+    for density in DENSITIES:
+        cell_width, cell_height = CELL[0] * density, CELL[1] * density
+        sprite = Image.new('RGBA', (cell_width * len(logos), cell_height))
+        for i, logo in enumerate(logos):
+            sprite.paste(_fit(logo, cell_width, cell_height), (i * cell_width, 0))
+        for fmt in formats:
+            manifest['sprite'].setdefault(fmt, []).append(
+                _encode(sprite, fmt, directory, f'client-logos-{density}x')
+            )
+
+    files = [name for entry in manifest.values() for fmt in formats for name in entry[fmt]]
+    return static_files.save_manifest(MANIFEST, manifest, files, directory)
+
+
+# The last build, or None; VERSION changes with it
+manifest, VERSION = static_files.load_manifest(MANIFEST)
+
+
+def _src_set(names):
+    return ', '.join(f'_static/{name} {density}x' for name, density in zip(names, DENSITIES))
+
+
+# <picture> with the preferred formats as sources and the last one as the <img>
+def _picture(entry, **props):
+    formats = [fmt for fmt in FORMATS if fmt in entry]
+    image = html.Img(src=f'_static/{entry[formats[-1]][0]}', srcSet=_src_set(entry[formats[-1]]), **props)
+    if len(formats) == 1:
+        return image
+    return html.Picture([
+        html.Source(type=f'image/{fmt}', srcSet=_src_set(entry[fmt])) for fmt in formats[:-1]
+    ] + [image])
+
+
+def header_logo(className, style):
+    if manifest is None:
+        return html.Img(src=f'assets/{HEADER}', className=className, style=style)
+    return _picture(manifest['header'], className=className, style=style)
+
+
+# path is relative to assets/, as in app.CLIENT_LOGOS
+def client_logo(path, style):
+    if manifest is None or path not in manifest['sprite']['cells']:
+        return html.Img(src=f'assets/{path}', style=style)
+    offset = manifest['sprite']['cells'][path]
+    # The sprite is drawn unscaled and shifted so only this logo's cell shows
+    return _picture(manifest['sprite'], style=dict(style, objectFit='none', objectPosition=f'-{offset}px 0'))
+
+
+if __name__ == '__main__':
+    built = build()
+    for fmt in FORMATS:
+        for name in built['header'].get(fmt, []) + built['sprite'].get(fmt, []):
+            print(f'{name}: {os.path.getsize(os.path.join(static_files.STATIC_PATH, name)):,} bytes')
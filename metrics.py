@@ -0,0 +1,299 @@
+# Request, callback and payload metrics in the Prometheus text format
+#
+# METRICS_DIR - directory each worker writes its numbers to (default: metrics/ in
+# the app's private cache directory; empty keeps them in the worker). Gunicorn
+# workers do not share memory, so every process writes metrics-<pid>.json there
+# every FLUSH_INTERVAL seconds, and whichever worker answers /metrics adds up the
+# files there. When a worker exits, its counters and histograms are folded into
+# metrics-archive.json, so totals never go down and Prometheus sees no false reset;
+# its gauges, which only describe a running process, are dropped. gunicorn.conf.py
+# retires each worker as it exits and empties the directory when the master starts.
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+import result_cache
+
+# fcntl is Unix-only; elsewhere a scrape may race a worker being retired
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(result_cache.APP_DIR, 'metrics'))
+
+# Seconds between writes of this worker's numbers
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+# Counters and histograms of exited workers, and the lock that keeps a scrape from
+# reading a worker both there and in its own file
+ARCHIVE = 'metrics-archive.json'
+LOCK = '.metrics.lock'
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'mockdash_requests_total': ('counter', 'HTTP requests by route, method and status', None),
+    'mockdash_request_duration_seconds': ('histogram', 'HTTP request latency by route', SECONDS),
+    'mockdash_callback_duration_seconds': ('histogram', 'Dash callback request latency by callback', SECONDS),
+    'mockdash_build_duration_seconds': ('histogram', 'Time to build and serialize a payload on a cache miss',
+                                        SECONDS),
+    'mockdash_query_duration_seconds': ('histogram', 'Data source query time by card, pool wait included',
+                                        SECONDS),
+    'mockdash_payload_bytes': ('histogram', 'Serialized size of the layout and figures served, uncompressed',
+                               BYTES),
+    'mockdash_cache_requests_total': ('counter', 'Per-worker cache lookups by cache and result', None),
+    'mockdash_data_loaded_timestamp_seconds': ('gauge', 'When each live worker loaded the data it serves', None),
+    'mockdash_data_source_age_seconds': ('gauge', 'Seconds since the data source files last changed', None),
+    'mockdash_result_cache_requests_total': ('counter', 'Shared result cache lookups on this host', None)
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self, directory=METRICS_DIR, interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        # Functions returning (name, labels, value) samples, read at every flush
+        self._collectors = []
+        self._flusher = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._start()
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _key(labels))
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-1] += value
+        self._start()
+
+    # Wraps build so its duration is observed under name
+    def timed(self, name, build, **labels):
+        def run():
+            start = time.perf_counter()
+            try:
+                return build()
+            finally:
+                self.observe(name, time.perf_counter() - start, **labels)
+        return run
+
+    def collect(self, collector):
+        self._collectors.append(collector)
+
+    def _snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), list(counts)] for (name, labels), counts in self._histograms.items()]
+        gauges = []
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                sample = [name, sorted(labels.items()), value]
+                (gauges if METRICS[name][0] == 'gauge' else counters).append(sample)
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def flush(self):
+        if not self.directory:
+            return
+        result_cache.private_directory(self.directory)
+        path = self._path(os.getpid())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        with open(os.path.join(self.directory, LOCK), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    # Adds the counters and histograms of a process that has exited to the archive and
+    # deletes its file
+    def retire(self, pid):
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        name = os.path.basename(self._path(pid))
+        with self._locked(exclusive=True):
+            snapshot = _read(os.path.join(self.directory, name))
+            if snapshot is not None:
+                counters, histograms = {}, {}
+                for part in (_read(os.path.join(self.directory, ARCHIVE)), snapshot):
+                    if part is not None:
+                        _add(counters, histograms, part)
+                path = os.path.join(self.directory, ARCHIVE)
+                with open(path + '.tmp', 'w') as f:
+                    json.dump({
+                        'counters': [[metric, list(labels), value] for (metric, labels), value in counters.items()],
+                        'histograms': [
+                            [metric, list(labels), counts] for (metric, labels), counts in histograms.items()
+                        ],
+                        'gauges': []
+                    }, f)
+                os.replace(path + '.tmp', path)
+            self._remove(name)
+            self._remove(name + '.tmp')
+
+    # Deletes every process's numbers and the archive, for a master starting afresh
+    def discard(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith('metrics-') and name.endswith(('.json', '.tmp')):
+                self._remove(name)
+
+    # The flush thread starts with the first sample, so processes that never serve stay quiet
+    def _start(self):
+        if self._flusher is not None or not self.directory:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self._snapshot()]
+        self.flush()
+        for name in os.listdir(self.directory):
+            pid = _pid(name)
+            if pid is not None and not _alive(pid):
+                self.retire(pid)
+        with self._locked(exclusive=False):
+            snapshots = [
+                _read(os.path.join(self.directory, name)) for name in os.listdir(self.directory)
+                if name == ARCHIVE or _pid(name) is not None
+            ]
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    # Every worker's numbers added up, as Prometheus text; extra: (name, labels, value) for this scrape only
+    def render(self, extra=()):
+        counters, histograms, gauges = {}, {}, {}
+        for snapshot in self._snapshots():
+            _add(counters, histograms, snapshot)
+            for name, labels, value in snapshot['gauges']:
+                gauges[(name, tuple(map(tuple, labels)) + (('pid', str(snapshot['pid'])),))] = value
+        for name, labels, value in extra:
+            target = gauges if METRICS[name][0] == 'gauge' else counters
+            target[(name, _key(labels))] = value
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            samples = sorted((key, value) for key, value in {**counters, **gauges}.items() if key[0] == name)
+            series = sorted((key, counts) for key, counts in histograms.items() if key[0] == name)
+            if not samples and not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (_, labels), value in samples:
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            for (_, labels), counts in series:
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(counts[-1])}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+# Adds a snapshot's counters and histograms to totals keyed on (name, labels)
+def _add(counters, histograms, snapshot):
+    for name, labels, value in snapshot['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, counts in snapshot['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        total = histograms.setdefault(key, [0] * len(counts))
+        for i, count in enumerate(counts):
+            total[i] += count
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# The process a metrics-<pid>.json file belongs to, or None for any other file
+def _pid(name):
+    if not (name.startswith('metrics-') and name.endswith('.json')):
+        return None
+    try:
+        return int(name[len('metrics-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
@@ -0,0 +1,240 @@
+# Rollups and raw exports partitioned by tenant, year, month and client
+#
+#   python partitions.py STORE TENANT FILE [FILE ...] [--title TITLE]
+#
+# STORE/manifest.json                              every partition, with its months, sizes and files
+# STORE/<tenant>/<YYYY>/<MM>/<client>.snap         mergeable aggregates, as in rollup.py
+# STORE/<tenant>/<YYYY>/<MM>/<client>/*.csv.gz     the raw rows behind them, one file per batch
+#
+# A tenant is a business unit with its own clients and history. Queries name the tenant,
+# months and clients they need and the manifest says which partitions hold them, so a
+# month of one client reads one partition however many years the store holds.
+import argparse
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import filters
+import ingest
+import rollup
+
+# Indexes over recently queried partition sets kept per worker
+INDEX_CACHE_SIZE = 8
+
+
+def partition_key(tenant, month, client):
+    return f"{quote(tenant, safe='')}/{month[:4]}/{month[5:7]}/{quote(client, safe='')}"
+
+
+# (month, client, raw rows, prepared rows) for each partition a chunk touches
+def split_chunk(chunk):
+    rows = ingest.prepare_chunk(chunk)
+    months = rows['date'].dt.strftime('%Y-%m')
+    groups = rows.groupby([months, rows['client']], sort=False).indices
+    for (month, client), positions in groups.items():
+        yield month, client, chunk.iloc[positions], rows.iloc[positions]
+
+
+class PartitionedStore(rollup.RollupStore):
+    def _read_manifest(self):
+        manifest = super()._read_manifest()
+        manifest.setdefault('tenants', {})
+        manifest.setdefault('partitions', {})
+        return manifest
+
+    # Every partition key, so load() with no keys reads the whole store
+    def months(self):
+        return sorted(self.manifest['partitions'])
+
+    def _partition_path(self, key):
+        path = os.path.join(self.path, *key.split('/')) + rollup.PARTITION_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def tenants(self):
+        return sorted({p['tenant'] for p in self.manifest['partitions'].values()})
+
+    def title(self, tenant):
+        return self.manifest['tenants'].get(tenant, {}).get('title', tenant)
+
+    def partitions(self, tenant):
+        return {key: p for key, p in self.manifest['partitions'].items() if p['tenant'] == tenant}
+
+    # Partition pruning: the partitions a filter can match, from the manifest alone
+    def keys(self, tenant, start=None, end=None, clients=()):
+        first, last = (start or '')[:7], (end or '')[:7]
+        return sorted(
+            key for key, p in self.partitions(tenant).items()
+            if (not first or p['month'] >= first) and (not last or p['month'] <= last)
+            and (not clients or p['client'] in clients)
+        )
+
+    # Aggregates alone carry no tenant and no raw rows to keep, so they cannot be placed
+    def append(self, aggregates):
+        raise NotImplementedError('a partitioned store is appended to with append_files(paths, tenant)')
+
+    # Writes the raw rows of every partition the files touch, then merges their aggregates
+    def append_files(self, paths, tenant, title=None, chunksize=ingest.CHUNKSIZE):
+        batch = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.csv.gz"
+        aggregates, raw = {}, {}
+        with self.locked():
+            for path in paths:
+                for chunk in ingest.read_chunks(path, chunksize):
+                    for month, client, chunk_rows, rows in split_chunk(chunk):
+                        key = partition_key(tenant, month, client)
+                        raw_path = os.path.join(self.path, *key.split('/'), batch)
+                        if key not in raw:
+                            os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+                        chunk_rows.to_csv(raw_path, mode='a', header=key not in raw, index=False,
+                                          compression='gzip')
+                        raw[key] = (month, client, os.path.relpath(raw_path, self.path))
+                        partial = ingest.Aggregates.from_rows(rows)
+                        aggregates[key] = aggregates[key].merge(partial) if key in aggregates else partial
+            for key, partial in aggregates.items():
+                month, client, raw_path = raw[key]
+                current = self.read_partition(key)
+                merged = current.merge(partial).compact() if current is not None else partial.compact()
+                entry = self.manifest['partitions'].get(key, {'raw': []})
+                self._write_partition(key, merged)
+                self._record(key, tenant, month, client, merged, entry['raw'] + [raw_path])
+            if title:
+                self.manifest['tenants'][tenant] = {'title': title}
+            if aggregates or title:
+                self._commit()
+        return sorted(aggregates)
+
+    # Re-aggregates one partition from its raw files, e.g. after a fix to ingest.py
+    def rebuild_partition(self, key):
+        with self.locked():
+            entry = self.manifest['partitions'][key]
+            merged = ingest.ingest([os.path.join(self.path, path) for path in entry['raw']])
+            self._write_partition(key, merged)
+            self._record(key, entry['tenant'], entry['month'], entry['client'], merged, entry['raw'])
+            self._commit()
+
+    def _record(self, key, tenant, month, client, aggregates, raw):
+        facts = aggregates.facts
+        dates = facts.index.get_level_values('date')
+        self.manifest['partitions'][key] = {
+            'tenant': tenant,
+            'month': month,
+            'client': client,
+            'first_day': str(dates.min().date()),
+            'last_day': str(dates.max().date()),
+            'countries': sorted(map(str, facts.index.get_level_values('country').unique())),
+            'buckets': int(len(facts)),
+            'transactions': int(facts['count'].sum()),
+            'raw': raw,
+            'updated': datetime.now(timezone.utc).isoformat()
+        }
+
+    def _commit(self):
+        self.manifest['version'] += 1
+        self._write_atomic(os.path.join(self.path, rollup.MANIFEST), self._dump_manifest)
+
+
+# Stands in for filters.FactIndex over a partitioned store: each query builds or reuses
+# a FactIndex over just the partitions its tenant, months and clients can match
+class PartitionIndex:
+    def __init__(self, store, tenant=None, cache_size=INDEX_CACHE_SIZE):
+        self.store = store
+        self.tenants = store.tenants()
+        # The tenant a selection without one is about
+        self.tenant = tenant if tenant in self.tenants else (self.tenants[0] if self.tenants else tenant)
+        self.titles = {name: store.title(name) for name in self.tenants}
+        self.cache_size = cache_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _partitions(self, tenant):
+        return self.store.partitions(tenant or self.tenant).values()
+
+    def clients_of(self, tenant=None):
+        return sorted({p['client'] for p in self._partitions(tenant)})
+
+    def countries_of(self, tenant=None):
+        return sorted({c for p in self._partitions(tenant) for c in p['countries']})
+
+    # (first day, last day) held for a tenant
+    def span(self, tenant=None):
+        partitions = list(self._partitions(tenant))
+        if not partitions:
+            return None, None
+        return min(p['first_day'] for p in partitions), max(p['last_day'] for p in partitions)
+
+    @property
+    def clients(self):
+        return self.clients_of()
+
+    @property
+    def countries(self):
+        return self.countries_of()
+
+    @property
+    def first_day(self):
+        return self.span()[0]
+
+    @property
+    def last_day(self):
+        return self.span()[1]
+
+    def _index(self, keys):
+        keys = tuple(keys)
+        with self._lock:
+            if keys in self._indexes:
+                self._indexes.move_to_end(keys)
+                return self._indexes[keys]
+        index = filters.FactIndex.from_aggregates(self.store.load(keys))
+        with self._lock:
+            self._indexes[keys] = index
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    # Every partition of a tenant, for the unfiltered view
+    def full(self, tenant=None):
+        return self._index(self.store.keys(tenant or self.tenant))
+
+    # The FactIndex a selection needs, and the selection to run against it
+    def _pruned(self, selection, clients=None):
+        if selection is None:
+            return self.full(), None
+        start, end, selected, countries, tenant = selection
+        keys = self.store.keys(tenant or self.tenant, start, end, clients or selected)
+        return self._index(keys), selection
+
+    def tables(self, selection=None):
+        index, selection = self._pruned(selection)
+        return index.tables(selection)
+
+    def week(self, selection=None, client=None):
+        index, selection = self._pruned(selection, [client] if client else None)
+        return index.week(selection, client)
+
+    def timeline(self, selection=None):
+        index, selection = self._pruned(selection)
+        return index.timeline(selection)
+
+    def buckets(self, selection=None, chunk_rows=50_000):
+        index, selection = self._pruned(selection)
+        return index.buckets(selection, chunk_rows)
+
+    def cells(self, selection=None):
+        index, selection = self._pruned(selection)
+        return index.cells(selection)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('store')
+    parser.add_argument('tenant')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--title', help='Name shown in the dashboard title, e.g. "Mobile Wallet Transfer"')
+    args = parser.parse_args()
+
+    store = PartitionedStore(args.store)
+    for key in store.append_files(args.files, args.tenant, args.title):
+        print(f"updated {key}: {store.manifest['partitions'][key]['transactions']:,} transactions")
@@ -0,0 +1,145 @@
+# Opt-in profiles of single requests, as pstats and as folded stacks for flame graphs
+#
+# PROFILE_PATH - directory profiles are written to. Unset or empty (the default), the
+# app is not wrapped at all, so profiling costs nothing while it is off.
+# With it set, a request sent with an X-Profile header or a profile query parameter
+#
+#   curl -H 'X-Profile: 1' http://localhost:8080/_dash-layout
+#   http://localhost:8080/?profile=1
+#
+# runs under cProfile while a sampler records the stack of the thread serving it, and
+# leaves two files named in the response's X-Profile header:
+#
+#   <name>.prof       python -m pstats <name>.prof, or snakeviz
+#   <name>.collapsed  flamegraph.pl <name>.collapsed > <name>.svg, or speedscope
+#
+# Everything from the first before_request hook to the compressed body is covered, so
+# pandas aggregation, Plotly figure validation and JSON encoding each show up as their
+# own frames. One request is profiled at a time; others are served as usual meanwhile.
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+PROFILE_PATH = os.environ.get('PROFILE_PATH', '')
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.001))
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _requested(environ):
+    if environ.get('HTTP_X_PROFILE'):
+        return True
+    return 'profile' in parse_qs(environ.get('QUERY_STRING', ''), keep_blank_values=True)
+
+
+# function (file:line), with files under the app relative to it
+def _frame_name(code):
+    path = code.co_filename
+    if path.startswith(ROOT):
+        path = os.path.relpath(path, ROOT)
+    else:
+        # Packages by their path under site-packages or the standard library
+        path = re.sub(r'^.*[/\\](site-packages|dist-packages|lib[/\\]python[\d.]+)[/\\]', '', path)
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'.replace(';', ',')
+
+
+# Stacks are cut at root, leaving out the server frames beneath it
+class Sampler:
+    def __init__(self, thread_id, root, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                if frame.f_code is self.root:
+                    break
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+
+# WSGI middleware around the Flask app; see the top of the file
+class Profiler:
+    def __init__(self, app, directory):
+        self.app = app
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if not _requested(environ) or not self._lock.acquire(blocking=False):
+            return self.app(environ, start_response)
+        try:
+            return self._profile(environ, start_response)
+        finally:
+            self._lock.release()
+
+    def _profile(self, environ, start_response):
+        slug = re.sub(r'[^\w.-]+', '_', environ.get('PATH_INFO', '').strip('/')) or 'index'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{slug}"
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured.append((status, headers, exc_info))
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with Sampler(threading.get_ident(), sys._getframe().f_code) as sampler:
+            profile.enable()
+            try:
+                # Responses built in full, so the profile covers writing the body too
+                result = self.app(environ, capture)
+                try:
+                    body = b''.join(result)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            finally:
+                profile.disable()
+        elapsed = time.perf_counter() - start
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path + '.prof')
+        with open(path + '.collapsed', 'w') as f:
+            f.write(sampler.collapsed())
+
+        status, headers, exc_info = captured[0]
+        headers = [(key, value) for key, value in headers if key.lower() != 'content-length'] + [
+            ('Content-Length', str(len(body))),
+            ('X-Profile', name),
+            ('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+        ]
+        start_response(status, headers, exc_info)
+        return [body]
+
+
+# Wraps the Flask app's WSGI callable when PROFILE_PATH is set
+def install(server, directory=PROFILE_PATH):
+    if directory:
+        server.wsgi_app = Profiler(server.wsgi_app, directory)
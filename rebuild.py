@@ -0,0 +1,166 @@
+# Rebuilds the rollup store and snapshot when new exports land, off the request path
+#
+# INBOX_PATH - directory new transaction exports are dropped into
+# ROLLUP_PATH and SNAPSHOT_PATH say where the results go. One worker per host
+# holds the lock and hands each rebuild to a separate process; every worker
+# then picks the new snapshot up through dataset.watch().
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dash._utils import to_json
+
+import dataset
+import figure_cache
+import figures
+import ingest
+import result_cache
+import rollup
+import snapshot
+
+# fcntl is Unix-only; elsewhere every worker runs its own scheduler
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INBOX_PATH = os.environ.get('INBOX_PATH')
+
+# Seconds between looks at the inbox
+REBUILD_INTERVAL = float(os.environ.get('REBUILD_INTERVAL', 30))
+
+EXTENSIONS = ('.csv', '.parquet', '.pq')
+PROCESSED = 'processed'
+# Elects the one scheduler per host and is held for its lifetime; the rebuild process
+# itself queues on the store's own lock (rollup.LOCK) like every other writer
+LOCK = '.rebuild.lock'
+
+
+# Figures for the unfiltered view of a new version, built before any worker asks
+def _warm(version, tables):
+    results = result_cache.open_default()
+    if results is None:
+        return
+    for card in figures.CARDS:
+        results.get(
+            version, ('payload', (card, None)),
+            lambda: figure_cache.Payload(to_json(figures.build(card, tables))),
+            figure_cache.Payload
+        )
+
+
+# Runs in the pool process
+def rebuild(inbox, store_path, snapshot_path, paths):
+    store = rollup.RollupStore(store_path)
+    store.append_files(paths)
+    # Moved as soon as they are in the store, so a failed snapshot never appends them twice
+    processed = os.path.join(inbox, PROCESSED)
+    os.makedirs(processed, exist_ok=True)
+    for path in paths:
+        os.replace(path, os.path.join(processed, os.path.basename(path)))
+    # Written to a temporary file and renamed over the old snapshot
+    version = snapshot.write_snapshot(snapshot_path, snapshot.aggregate_tables(store.load()))
+    # Read back the way workers read it, so the warmed payloads match theirs byte for byte
+    snap = snapshot.Snapshot(snapshot_path)
+    _warm(version, {name: snap.table(name) for name in ingest.TABLES})
+    return version
+
+
+class Scheduler:
+    def __init__(self, inbox, store_path, snapshot_path, interval=REBUILD_INTERVAL):
+        self.inbox = inbox
+        self.store_path = store_path
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self._seen = {}
+        self._lock_file = None
+        self._pool = None
+        self._future = None
+
+    # Only one process per host rebuilds; the others keep trying in case it exits
+    def _acquire(self):
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self.store_path, exist_ok=True)
+        lock_file = open(os.path.join(self.store_path, LOCK), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+        return True
+
+    # Files whose size and mtime held still since the last look, so half-written copies wait
+    def _ready(self):
+        try:
+            names = sorted(os.listdir(self.inbox))
+        except FileNotFoundError:
+            return []
+        seen, ready = {}, []
+        for name in names:
+            path = os.path.join(self.inbox, name)
+            if not name.endswith(EXTENSIONS) or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            seen[path] = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(path) == seen[path]:
+                ready.append(path)
+        self._seen = seen
+        return ready
+
+    def poll(self):
+        if self._future is not None:
+            if not self._future.done():
+                return
+            try:
+                logger.info('Snapshot %s written', self._future.result())
+            except Exception:
+                logger.exception('Rebuild failed')
+            self._future = None
+        if not self._acquire():
+            return
+        ready = self._ready()
+        if not ready:
+            return
+        if self._pool is None:
+            # spawn, since forking a process that serves requests on threads is unsafe
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        self._future = self._pool.submit(rebuild, self.inbox, self.store_path, self.snapshot_path, ready)
+        self._seen = {}
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Inbox check failed')
+            time.sleep(self.interval)
+
+
+def configured():
+    return bool(INBOX_PATH and dataset.ROLLUP_PATH and dataset.SNAPSHOT_PATH)
+
+
+def start():
+    # Pool processes re-import the main module under spawn; only the parent schedules
+    if not configured() or multiprocessing.parent_process() is not None:
+        return None
+    scheduler = Scheduler(INBOX_PATH, dataset.ROLLUP_PATH, dataset.SNAPSHOT_PATH)
+    threading.Thread(target=scheduler.run, name='rebuild', daemon=True).start()
+    return scheduler
+
+
+if __name__ == '__main__':
+    # INBOX_PATH=... ROLLUP_PATH=... SNAPSHOT_PATH=... python rebuild.py
+    if not configured():
+        sys.exit('INBOX_PATH, ROLLUP_PATH and SNAPSHOT_PATH must all be set')
+    logging.basicConfig(level=logging.INFO)
+    Scheduler(INBOX_PATH, dataset.ROLLUP_PATH, dataset.SNAPSHOT_PATH).run()
@@ -0,0 +1,316 @@
+# Filtered results shared by every worker on the host through one SQLite file
+#
+# Entries are keyed on the data version plus a normalized key, evicted least
+# recently used once the file passes its size budget, and expire after a TTL.
+# Hit and miss counters live in the same file so they cover all workers.
+#
+# A hit is a plain read: each worker counts hits and misses in memory and adds them to
+# the file in batches, and an entry's last use is only rewritten once it is
+# USED_RESOLUTION seconds stale, so workers do not queue on SQLite's write lock.
+#
+# The file lives in a directory only the app's user can reach, and values are stored
+# as a JSON header plus raw bytes, never pickles, so reading an entry cannot run code.
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import stat
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-user state the app keeps between runs, shared by its workers
+APP_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'mockdash')
+
+# RESULT_CACHE_PATH='' turns the shared cache off
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', os.path.join(APP_DIR, 'results.sqlite'))
+RESULT_CACHE_MB = float(os.environ.get('RESULT_CACHE_MB', 256))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 3600))
+
+# Seconds an entry's last use may lag behind; LRU order is only this precise
+USED_RESOLUTION = 60
+# Hits and misses a worker holds before adding them to the file, or seconds it holds them
+COUNT_BATCH = 100
+COUNT_SECONDS = 10
+
+
+# Entries written by a different build of the app are never served
+def _code_version():
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(root)):
+        if name.endswith('.py'):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+CODE_VERSION = _code_version()
+
+_TABLES = '''
+CREATE TABLE IF NOT EXISTS entries (
+    version TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (version, key)
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+def _check_owner(path, st):
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise PermissionError(f'{path} belongs to uid {st.st_uid}, not to this user')
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f'{path} is writable by other users')
+
+
+# Creates path as a directory only this user can use, or checks that an existing one is
+def private_directory(path):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f'{path} is not a directory')
+    _check_owner(path, st)
+    return path
+
+
+# Creates the file as 0600 if missing; an existing one must be this user's and not shared
+def _private_file(path):
+    private_directory(os.path.dirname(os.path.abspath(path)))
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        _check_owner(path, os.fstat(fd))
+    finally:
+        os.close(fd)
+
+
+# A JSON header followed by the raw blocks it lists the sizes of
+def pack(header, blocks=()):
+    head = json.dumps({'header': header, 'sizes': [len(block) for block in blocks]}).encode('utf-8')
+    return struct.pack('<I', len(head)) + head + b''.join(blocks)
+
+
+def unpack(blob):
+    blob = memoryview(blob)
+    (size,) = struct.unpack_from('<I', blob)
+    head = json.loads(bytes(blob[4:4 + size]))
+    blocks, offset = [], 4 + size
+    for length in head['sizes']:
+        blocks.append(bytes(blob[offset:offset + length]))
+        offset += length
+    return head['header'], blocks
+
+
+# Codec for a table set: {name: DataFrame with a default index}. Numeric columns are
+# stored as raw arrays, text columns as JSON lists.
+class Tables:
+    @staticmethod
+    def dumps(tables):
+        import numpy as np
+
+        header, blocks = {}, []
+        for name, frame in tables.items():
+            columns = []
+            for column in frame.columns:
+                values = frame[column]
+                if values.dtype.kind in 'biuf':
+                    array = np.ascontiguousarray(values.to_numpy())
+                    columns.append({'name': column, 'dtype': array.dtype.str, 'block': len(blocks)})
+                    blocks.append(array.tobytes())
+                else:
+                    columns.append({'name': column, 'values': [None if v is None else str(v) for v in values]})
+            header[name] = columns
+        return pack(header, blocks)
+
+    @staticmethod
+    def loads(blob):
+        import numpy as np
+        import pandas as pd
+
+        header, blocks = unpack(blob)
+        return {
+            name: pd.DataFrame({
+                column['name']: (
+                    np.frombuffer(blocks[column['block']], dtype=column['dtype']).copy()
+                    if 'block' in column else pd.Series(column['values'], dtype=object)
+                )
+                for column in columns
+            })
+            for name, columns in header.items()
+        }
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes, ttl):
+        _private_file(path)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_since = time.time()
+        self._pending_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    # One connection per thread; WAL lets readers in other workers run during a write
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_TABLES)
+            self._local.connection = connection
+        return connection
+
+    def _add_counters(self, connection, counts):
+        for name, value in counts.items():
+            if value:
+                connection.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                    (name, value)
+                )
+
+    # Counts held in memory since the last flush, now cleared
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_since = time.time()
+        return pending
+
+    def _count(self, name):
+        with self._pending_lock:
+            self._pending[name] = self._pending.get(name, 0) + 1
+            due = (
+                sum(self._pending.values()) >= COUNT_BATCH or time.time() - self._pending_since >= COUNT_SECONDS
+            )
+        if due:
+            self.flush()
+
+    # Adds this worker's held hits and misses to the shared counters in one transaction
+    def flush(self):
+        pending = self._take_pending()
+        if not any(pending.values()):
+            return
+        try:
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._add_counters(connection, pending)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            self._restore(pending)
+
+    # Counts a failed write took, kept for the next one
+    def _restore(self, pending):
+        with self._pending_lock:
+            for name, value in pending.items():
+                self._pending[name] = self._pending.get(name, 0) + value
+
+    def _lookup(self, version, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, created, used FROM entries WHERE version = ? AND key = ?', (version, key)
+        ).fetchone()
+        if row is not None and now - row[1] < self.ttl:
+            if now - row[2] >= USED_RESOLUTION:
+                connection.execute('UPDATE entries SET used = ? WHERE version = ? AND key = ?', (now, version, key))
+            self._count('hits')
+            return row[0]
+        self._count('misses')
+        return None
+
+    def _store(self, version, key, blob):
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        pending = {}
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO entries (version, key, value, size, created, used) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (version, key, blob, len(blob), now, now)
+            )
+            expired = connection.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,)).rowcount
+            evicted = 0
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            while total > self.max_bytes:
+                row = connection.execute('SELECT version, key, size FROM entries ORDER BY used LIMIT 1').fetchone()
+                if row is None:
+                    break
+                connection.execute('DELETE FROM entries WHERE version = ? AND key = ?', row[:2])
+                total -= row[2]
+                evicted += 1
+            # The write lock is held anyway, so held hits and misses go in with it
+            pending = self._take_pending()
+            self._add_counters(connection, dict(pending, expired=expired, evictions=evicted))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            self._restore(pending)
+            raise
+
+    # Cached result for (version, key), or build() stored for the other workers; codec
+    # turns values into bytes and back (Tables, or figure_cache.Payload)
+    def get(self, version, key, build, codec):
+        version, key = f'{CODE_VERSION}:{version}', repr(key)
+        try:
+            blob = self._lookup(version, key)
+        except sqlite3.Error:
+            return build()
+        if blob is not None:
+            return codec.loads(blob)
+        value = build()
+        blob = codec.dumps(value)
+        # Anything larger than the whole budget would only evict everything else
+        if len(blob) <= self.max_bytes:
+            try:
+                self._store(version, key, blob)
+            except sqlite3.Error:
+                pass
+        return value
+
+    def stats(self):
+        self.flush()
+        connection = self._connection()
+        counters = dict(connection.execute('SELECT name, value FROM counters').fetchall())
+        entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+            'expired': counters.get('expired', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl
+        }
+
+
+def open_default():
+    if not RESULT_CACHE_PATH:
+        return None
+    try:
+        return ResultCache(RESULT_CACHE_PATH, int(RESULT_CACHE_MB * 1024 * 1024), RESULT_CACHE_TTL)
+    except OSError as e:
+        logger.warning('Shared result cache disabled: %s', e)
+        return None
@@ -0,0 +1,170 @@
+# Persistent rollup store of mergeable partial aggregates, partitioned by month
+#
+# Each partition is a columnar snapshot (see snapshot.py) of its per-day buckets and user
+# sketches: a JSON header plus raw arrays, so reading one never unpickles anything.
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import hll
+import ingest
+import snapshot
+
+# fcntl is Unix-only; elsewhere writers are not serialised
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+PARTITION_SUFFIX = '.snap'
+# Held by whichever process is updating partitions and the manifest
+LOCK = '.store.lock'
+
+
+def _month_key(month):
+    return pd.Timestamp(month).strftime('%Y-%m')
+
+
+def _months(index):
+    return pd.DatetimeIndex(index.get_level_values('date').values.astype('datetime64[M]'))
+
+
+def split_by_month(aggregates):
+    aggregates.compact()
+    facts = {_month_key(m): part for m, part in aggregates.facts.groupby(_months(aggregates.facts.index))}
+    failures = {_month_key(m): part for m, part in aggregates.failures.groupby(_months(aggregates.failures.index))}
+    remitters = {_month_key(m): part for m, part in aggregates.remitters.split_by_month()}
+    recipients = {_month_key(m): part for m, part in aggregates.recipients.split_by_month()}
+    for key in sorted(set(facts) | set(failures) | set(remitters) | set(recipients)):
+        yield key, ingest.Aggregates(
+            facts.get(key, ingest.empty_facts()),
+            failures.get(key, ingest.empty_failures()),
+            remitters.get(key),
+            recipients.get(key)
+        )
+
+
+# A snapshot table copied off the mapping, with labels as plain objects as ingest.py builds them
+def _unmapped(snap, name):
+    frame = snap.table(name).copy()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype(object)
+    return frame
+
+
+class RollupStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def months(self):
+        return sorted(self.manifest['months'])
+
+    # Partitions
+    def _partition_path(self, key):
+        return os.path.join(self.path, key + PARTITION_SUFFIX)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': 0, 'months': {}}
+
+    def _write_atomic(self, target, write):
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    # Writers queue on the lock, then start from the manifest as the last one left it
+    @contextlib.contextmanager
+    def locked(self):
+        with open(os.path.join(self.path, LOCK), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.manifest = self._read_manifest()
+            yield
+
+    def _dump_manifest(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def read_partition(self, key):
+        path = self._partition_path(key)
+        if not os.path.exists(path):
+            return None
+        snap = snapshot.Snapshot(path)
+        sketches = [
+            hll.Sketches.from_frames(_unmapped(snap, f'{name}_sketches'), _unmapped(snap, f'{name}_registers'))
+            for name in ('remitter', 'recipient')
+        ]
+        return ingest.Aggregates(
+            _unmapped(snap, 'facts').set_index(ingest.FACT_KEYS),
+            _unmapped(snap, 'failures').set_index(ingest.FAILURE_KEYS)['count'],
+            *sketches
+        )
+
+    # write_snapshot writes a temporary file and renames it over the partition
+    def _write_partition(self, key, aggregates):
+        snapshot.write_snapshot(self._partition_path(key), snapshot.aggregate_frames(aggregates))
+
+    # Updates only touch the months present in the batch
+    def append(self, aggregates):
+        touched = []
+        with self.locked():
+            for key, batch in split_by_month(aggregates):
+                current = self.read_partition(key)
+                merged = current.merge(batch).compact() if current is not None else batch
+                self._write_partition(key, merged)
+                self.manifest['months'][key] = {
+                    'buckets': int(len(merged.facts)),
+                    'transactions': int(merged.facts['count'].sum()),
+                    'updated': datetime.now(timezone.utc).isoformat()
+                }
+                touched.append(key)
+            if touched:
+                self.manifest['version'] += 1
+                self._write_atomic(os.path.join(self.path, MANIFEST), self._dump_manifest)
+        return touched
+
+    def append_files(self, paths, chunksize=ingest.CHUNKSIZE):
+        return self.append(ingest.ingest(paths, chunksize))
+
+    # Reads cost O(buckets), never O(transactions)
+    def load(self, months=None):
+        aggregates = ingest.Aggregates()
+        for key in months if months is not None else self.months():
+            partition = self.read_partition(key)
+            # A partition the manifest lists must exist; stores from before partitions were
+            # snapshots have .pkl files instead and need rebuilding
+            if partition is None:
+                raise FileNotFoundError(f'{self._partition_path(key)} is listed in the manifest but missing')
+            aggregates.merge(partition)
+        return aggregates.compact()
+
+    def tables(self):
+        return self.load().tables()
+
+
+if __name__ == '__main__':
+    # python rollup.py STORE FILE [FILE ...]
+    store = RollupStore(sys.argv[1])
+    for key in store.append_files(sys.argv[2:]):
+        print(f"updated {key}: {store.manifest['months'][key]['transactions']:,} transactions")
@@ -0,0 +1,166 @@
+# Columnar on-disk snapshot of the dashboard tables, opened with mmap by every worker
+#
+# Layout: MAGIC, little-endian uint64 header length, JSON header, then one
+# 64-byte aligned block per column. Numeric columns are stored as fixed-width
+# arrays and label columns as integer codes into a dictionary kept in the header.
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'MDSNAP01'
+ALIGN = 64
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _codes_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_column(values):
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+        codes, categories = pd.factorize(values, sort=False)
+        data = codes.astype(_codes_dtype(len(categories)))
+        return data, {'dtype': data.dtype.str, 'categories': [str(c) for c in categories]}
+    if np.issubdtype(values.dtype, np.datetime64):
+        data = values.values.astype('datetime64[ns]').view(np.int64)
+        return data, {'dtype': data.dtype.str, 'datetime': 'ns'}
+    data = np.ascontiguousarray(values.values)
+    return data, {'dtype': data.dtype.newbyteorder('<').str}
+
+
+# Writing
+def write_snapshot(path, tables):
+    columns = []
+    header = {'created': datetime.now(timezone.utc).isoformat(), 'tables': {}}
+    offset = 0
+    digest = hashlib.sha256()
+    for name, frame in tables.items():
+        entries = []
+        for column in frame.columns:
+            data, entry = _encode_column(frame[column])
+            data = data.astype(entry['dtype'], copy=False)
+            offset = _align(offset)
+            entry.update(name=str(column), offset=offset, length=len(data))
+            offset += data.nbytes
+            entries.append(entry)
+            columns.append((entry['offset'], data))
+            digest.update(name.encode() + b'\0' + str(column).encode() + b'\0')
+            digest.update(json.dumps(entry.get('categories', [])).encode())
+            digest.update(data.tobytes())
+        header['tables'][name] = {'rows': len(frame), 'columns': entries}
+    header['version'] = digest.hexdigest()[:16]
+
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+            for column_offset, data in columns:
+                f.seek(data_start + column_offset)
+                f.write(data.tobytes())
+            f.truncate(data_start + offset)
+        # Readers keep their mapping of the previous file until they reopen
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return header['version']
+
+
+# Reading
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a dashboard snapshot')
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        self._data_start = _align(header_start + header_length)
+        self.version = self.header['version']
+        self.created = self.header['created']
+
+    def table_names(self):
+        return list(self.header['tables'])
+
+    # Zero-copy, read-only view of one column
+    def _array(self, entry):
+        if not entry['length']:
+            return np.empty(0, dtype=np.dtype(entry['dtype']))
+        return np.frombuffer(
+            self._mmap, dtype=np.dtype(entry['dtype']), count=entry['length'],
+            offset=self._data_start + entry['offset']
+        )
+
+    def column(self, table, name):
+        for entry in self.header['tables'][table]['columns']:
+            if entry['name'] == name:
+                return self._array(entry)
+        raise KeyError(name)
+
+    def table(self, name):
+        spec = self.header['tables'][name]
+        columns = {}
+        for entry in spec['columns']:
+            data = self._array(entry)
+            if 'categories' in entry:
+                data = pd.Categorical.from_codes(data, categories=entry['categories'])
+            elif 'datetime' in entry:
+                data = data.view('datetime64[ns]')
+            columns[entry['name']] = data
+        # copy=False keeps every column backed by the shared mapping
+        return pd.DataFrame(columns, index=pd.RangeIndex(spec['rows']), copy=False)
+
+    def tables(self):
+        return {name: self.table(name) for name in self.table_names()}
+
+
+# Per-day buckets and user sketches of a set of aggregates, as snapshot tables; rollup.py
+# stores each partition this way
+def aggregate_frames(aggregates):
+    tables = aggregates.fact_frames()
+    for name, sketches in (('remitter', aggregates.remitters), ('recipient', aggregates.recipients)):
+        frames = sketches.frames()
+        tables[f'{name}_sketches'] = frames['keys']
+        tables[f'{name}_registers'] = frames['registers']
+    return tables
+
+
+# Dashboard tables plus the per-day buckets and user sketches, so workers can filter
+# without the rollup store
+def aggregate_tables(aggregates):
+    tables = aggregates.tables()
+    tables.update(aggregate_frames(aggregates))
+    return tables
+
+
+if __name__ == '__main__':
+    # python snapshot.py OUTPUT --rollup STORE
+    # python snapshot.py OUTPUT FILE [FILE ...]
+    import ingest
+    import rollup
+
+    output, sources = sys.argv[1], sys.argv[2:]
+    if sources[:1] == ['--rollup']:
+        aggregates = rollup.RollupStore(sources[1]).load()
+    else:
+        aggregates = ingest.ingest(sources)
+    print(f'wrote {output} (version {write_snapshot(output, aggregate_tables(aggregates))})')
@@ -0,0 +1,77 @@
+# Build outputs under static/, named by content hash and served as immutable
+#
+# Each build step (logos.py, stylesheet.py) writes its files here together with a
+# manifest of its own, and only ever removes files its previous manifest listed.
+import hashlib
+import json
+import os
+
+STATIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# A year; fingerprinted names never change content
+MAX_AGE = 365 * 24 * 3600
+
+# Python 3.9's mimetypes does not know all of these
+MIMETYPES = {
+    '.avif': 'image/avif',
+    '.webp': 'image/webp',
+    '.woff2': 'font/woff2',
+    '.woff': 'font/woff',
+    '.ttf': 'font/ttf',
+    '.css': 'text/css'
+}
+
+# Every file named by a manifest loaded in this process
+FILES = set()
+
+
+# Writes body as <stem>-<hash><extension> and returns the name
+def write(body, stem, extension, directory=STATIC_PATH):
+    name = f'{stem}-{hashlib.sha256(body).hexdigest()[:12]}{extension}'
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(body)
+    return name
+
+
+def _read(name, directory):
+    with open(os.path.join(directory, name), 'rb') as f:
+        body = f.read()
+    return body, json.loads(body)
+
+
+# Replaces the manifest, then removes the files only the old one listed
+def save_manifest(name, manifest, files, directory=STATIC_PATH):
+    try:
+        _, old = _read(name, directory)
+        old_files = set(old.get('files', []))
+    except (OSError, ValueError):
+        old_files = set()
+    manifest = dict(manifest, files=sorted(files))
+    tmp = os.path.join(directory, name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, name))
+    for stale in old_files - set(files):
+        try:
+            os.remove(os.path.join(directory, stale))
+        except FileNotFoundError:
+            pass
+    return manifest
+
+
+# (manifest, short hash of it), or (None, None) when there is none or its files are missing
+def load_manifest(name, directory=STATIC_PATH):
+    try:
+        body, manifest = _read(name, directory)
+    except (OSError, ValueError):
+        return None, None
+    files = manifest.get('files', [])
+    if not all(os.path.isfile(os.path.join(directory, f)) for f in files):
+        return None, None
+    FILES.update(files)
+    return manifest, hashlib.sha256(body).hexdigest()[:12]
+
+
+def mimetype(name):
+    return MIMETYPES.get(os.path.splitext(name)[1].lower())
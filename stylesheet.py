@@ -0,0 +1,275 @@
+# One local stylesheet in place of the FLATLY and Google Fonts round-trips
+#
+#   python stylesheet.py [--theme PATH_OR_URL] [--font PATH_OR_URL]
+#
+# Trims FLATLY to the classes the layout uses, adds a Latin subset of Bebas Neue and
+# the dashboard's own rules, and writes the result minified and fingerprinted into
+# static/ (see static_files.py). The theme is the copy in vendor/, Bootswatch 5.3.1 as
+# dash-bootstrap-components 1.5 links it. The font is downloaded unless a local file
+# is passed; --font-sha256 makes the build fail when the file is not the expected one.
+# Once built, the page loads no third-party CSS.
+import argparse
+import hashlib
+import io
+import os
+import re
+import urllib.parse
+import urllib.request
+
+from dash.development.base_component import Component
+
+import static_files
+
+MANIFEST = 'stylesheet.json'
+
+THEME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor', 'flatly-5.3.1.min.css')
+
+FONT_FAMILY = 'Bebas Neue'
+GOOGLE_FONTS = 'https://fonts.googleapis.com/'
+FONT_CSS_URL = GOOGLE_FONTS + 'css2?family=Bebas+Neue&display=swap'
+# Printable ASCII, Latin-1 and the punctuation the layout uses
+FONT_TEXT = ''.join(map(chr, range(0x20, 0x7f))) + ''.join(map(chr, range(0xa0, 0x100))) + '·–—‘’“”…'
+# Google Fonts only sends woff2 to browsers it recognises
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+# Classes only ever added in the browser, kept whatever the layout says
+KEEP_CLASSES = {'active', 'disabled', 'show'}
+
+# At-rules whose blocks hold rules, trimmed like the top level; others are kept whole
+NESTED = ('@media', '@supports', '@layer', '@container')
+
+
+def _fetch(source):
+    if re.match(r'https?://', source):
+        request = urllib.request.Request(source, headers={'User-Agent': USER_AGENT})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+# The bytes of source, which must have the given digest when there is one
+def _verified(source, sha256=None):
+    body = _fetch(source)
+    digest = hashlib.sha256(body).hexdigest()
+    if sha256 and digest != sha256.lower():
+        raise ValueError(f'{source} has sha256 {digest}, expected {sha256}')
+    return body
+
+
+# Bootstrap classes dbc components render on top of their className
+def _component_classes(component):
+    name = type(component).__name__
+    props = component.__dict__
+    if name == 'Container':
+        return ['container-fluid' if props.get('fluid') else 'container']
+    if name == 'Row':
+        return ['row']
+    if name == 'Col':
+        width = props.get('width')
+        return ['col' if width is None else f'col-{width}']
+    if name in ('Card', 'CardBody', 'CardHeader', 'CardFooter'):
+        return [re.sub(r'(?<!^)([A-Z])', r'-\1', name).lower()]
+    if name in ('Switch', 'Checkbox', 'RadioItems', 'Checklist'):
+        classes = ['form-check', 'form-check-input', 'form-check-label']
+        if name == 'Switch' or props.get('switch'):
+            classes.append('form-switch')
+        if props.get('inline'):
+            classes.append('form-check-inline')
+        return classes
+    if name == 'Button':
+        color = props.get('color') or 'primary'
+        classes = ['btn', f"btn-outline-{color}" if props.get('outline') else f'btn-{color}']
+        if props.get('size'):
+            classes.append(f"btn-{props['size']}")
+        return classes
+    return []
+
+
+def used_classes(layout):
+    classes = set(KEEP_CLASSES)
+    for component in [layout] + list(layout._traverse()):
+        if not isinstance(component, Component):
+            continue
+        classes.update((getattr(component, 'className', None) or '').split())
+        classes.update(_component_classes(component))
+    return classes
+
+
+# Splits at top-level occurrences of sep, skipping strings and parentheses
+def _split(text, sep):
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote and text[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+# (prelude, body) of each top-level block; bodies keep their nested braces
+def _blocks(css):
+    blocks, depth, quote, start, open_at = [], 0, None, 0, 0
+    for i, char in enumerate(css):
+        if quote:
+            if char == quote and css[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                open_at = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:open_at].strip(), css[open_at + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            # Statements without a block
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+    return blocks
+
+
+def _selector_matches(selector, classes):
+    # Classes inside :not() are exclusions, not requirements
+    required = re.findall(r'\.(-?[_a-zA-Z][\w-]*)', re.sub(r':not\([^)]*\)', '', selector))
+    return all(name in classes for name in required)
+
+
+def _minify_selector(selector):
+    selector = re.sub(r'\s+', ' ', selector.strip())
+    return re.sub(r'\s*([>+~,])\s*', r'\1', selector)
+
+
+def _minify_body(body):
+    declarations = (d.strip() for d in _split(body, ';'))
+    return ';'.join(
+        re.sub(r'\s*:\s*', ':', d, count=1) for d in declarations if d
+    )
+
+
+# Rules none of whose selectors can match are dropped; the rest are minified
+def trim(css, classes):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    out = []
+    for prelude, body in _blocks(css):
+        prelude = re.sub(r'\s+', ' ', prelude)
+        if body is None:
+            # @charset and @import: the bundle is UTF-8, and FLATLY's one import is the
+            # Google Fonts Lato, which the dashboard's own font rules override everywhere
+            continue
+        elif prelude.startswith(NESTED):
+            inner = trim(body, classes)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @font-face, @keyframes, @page
+            out.append(f'{prelude}{{{_minify_block(body)}}}')
+        else:
+            selectors = [s for s in _split(prelude, ',') if _selector_matches(s, classes)]
+            if selectors:
+                out.append(f"{_minify_selector(','.join(selectors))}{{{_minify_body(body)}}}")
+    return ''.join(out)
+
+
+# Keyframe bodies hold blocks of their own
+def _minify_block(body):
+    if '{' not in body:
+        return _minify_body(body)
+    return ''.join(f'{_minify_selector(p)}{{{_minify_body(b)}}}' for p, b in _blocks(body))
+
+
+# The woff2 behind a Google Fonts stylesheet, asked for only the characters in FONT_TEXT
+def _google_font(url, sha256=None):
+    css = _fetch(url + '&text=' + urllib.parse.quote(FONT_TEXT)).decode()
+    return _verified(re.search(r'url\((https://[^)]+)\)', css).group(1), sha256), '.woff2'
+
+
+# A local font file, cut down to FONT_TEXT when fontTools is installed
+def _local_font(path, sha256=None):
+    body = _verified(path, sha256)
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+
+        # Reading woff2 needs brotli as well
+        font = TTFont(io.BytesIO(body))
+    except ImportError:
+        return body, extension
+    subsetter = subset.Subsetter()
+    subsetter.populate(text=FONT_TEXT)
+    subsetter.subset(font)
+    # woff2 needs the brotli module; woff only needs zlib
+    try:
+        import brotli  # noqa: F401
+        font.flavor, extension = 'woff2', '.woff2'
+    except ImportError:
+        font.flavor, extension = 'woff', '.woff'
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue(), extension
+
+
+FONT_FORMATS = {'.woff2': 'woff2', '.woff': 'woff', '.ttf': 'truetype', '.otf': 'opentype'}
+
+
+def build(layout, custom_css, theme, font, directory=static_files.STATIC_PATH, theme_sha256=None, font_sha256=None):
+    body, extension = (_google_font if font.startswith(GOOGLE_FONTS) else _local_font)(font, font_sha256)
+    font_name = static_files.write(body, 'bebas-neue', extension, directory)
+    font_face = (
+        f"@font-face{{font-family:'{FONT_FAMILY}';font-style:normal;font-weight:400;font-display:swap;"
+        f"src:url({font_name}) format('{FONT_FORMATS.get(extension, 'woff2')}')}}"
+    )
+    classes = used_classes(layout)
+    css = font_face + trim(_verified(theme, theme_sha256).decode('utf-8'), classes) + trim(custom_css, classes)
+    css_name = static_files.write(css.encode('utf-8'), 'dashboard', '.css', directory)
+    manifest = {'css': css_name, 'font': font_name, 'font_type': static_files.mimetype(font_name)}
+    return static_files.save_manifest(MANIFEST, manifest, [css_name, font_name], directory)
+
+
+# The last build, or None; VERSION changes with it
+manifest, VERSION = static_files.load_manifest(MANIFEST)
+
+
+# The bundle for Dash's external_stylesheets
+def stylesheets():
+    return [f"_static/{manifest['css']}"]
+
+
+# Starts the font download alongside the stylesheet instead of after it
+def preload_links():
+    return (
+        f'<link rel="preload" href="_static/{manifest["font"]}" as="font" '
+        f'type="{manifest["font_type"]}" crossorigin>'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--theme', default=THEME_PATH, help='FLATLY stylesheet, file or URL')
+    parser.add_argument('--theme-sha256', help='Expected digest of the theme stylesheet')
+    parser.add_argument('--font', default=FONT_CSS_URL, help='Google Fonts URL or a local font file')
+    parser.add_argument('--font-sha256', help='Expected digest of the font file before subsetting')
+    args = parser.parse_args()
+
+    import app
+    import dataset
+
+    built = build(
+        app.build_layout(dataset.current()), app.CUSTOM_CSS, args.theme, args.font,
+        theme_sha256=args.theme_sha256, font_sha256=args.font_sha256
+    )
+    for name in built['files']:
+        print(f'{name}: {os.path.getsize(os.path.join(static_files.STATIC_PATH, name)):,} bytes')
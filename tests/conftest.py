@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import failures  # noqa: E402
+import ingest  # noqa: E402
+
+
+# Raw export rows across a year boundary, so month labels carry the year
+@pytest.fixture(scope='session')
+def transactions():
+    rng = np.random.default_rng(7)
+    n = 6000
+    frame = pd.DataFrame({
+        'timestamp': pd.Timestamp('2023-11-01') + pd.to_timedelta(rng.integers(0, 120 * 86400, n), unit='s'),
+        'amount': rng.gamma(2, 5000, n).round(2),
+        'status': rng.choice(['SUCCESS', 'FAILED'], n, p=[0.9, 0.1]),
+        'client': rng.choice(['Lemfi', 'Nala', 'Cellulant', None], n),
+        'country': rng.choice(['GBR', 'USA', 'CAN', None], n),
+        'remitter_id': rng.integers(0, 800, n).astype(str),
+        'recipient_id': rng.integers(0, 2000, n).astype(str)
+    })
+    reasons = rng.choice(['Insufficient balance', 'Request timed out', 'Invalid account number', None], n)
+    frame['failure_reason'] = np.where(frame['status'] == 'FAILED', reasons, None)
+    return frame
+
+
+@pytest.fixture(scope='session')
+def transactions_csv(transactions, tmp_path_factory):
+    path = tmp_path_factory.mktemp('exports') / 'transactions.csv'
+    transactions.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def aggregates(transactions_csv):
+    return ingest.ingest([transactions_csv], chunksize=2000)
+
+
+# The same rows as ingestion sees them, for expected results computed with plain pandas
+@pytest.fixture(scope='session')
+def rows(transactions):
+    ts = pd.to_datetime(transactions['timestamp'])
+    return pd.DataFrame({
+        'day': ts.dt.normalize(),
+        'month': ts.dt.to_period('M').dt.to_timestamp(),
+        'slot': ts.dt.hour * 2 + ts.dt.minute // 30,
+        'weekday': ts.dt.dayofweek,
+        'client': transactions['client'].fillna(ingest.OTHER_CLIENT),
+        'country': transactions['country'].fillna(ingest.UNKNOWN_COUNTRY),
+        'volume': transactions['amount'],
+        'count': 1,
+        'success': (transactions['status'] == 'SUCCESS').astype(np.int64),
+        'reason': failures.classify(transactions['failure_reason'].values),
+        'remitter': transactions['remitter_id'],
+        'recipient': transactions['recipient_id']
+    })
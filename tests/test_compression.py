@@ -0,0 +1,152 @@
+import gzip
+import json
+import types
+
+import pytest
+from flask import Flask, Response
+
+import compression
+import figure_cache
+
+BODY = json.dumps({'data': [{'x': list(range(400)), 'y': list(range(400))}]})
+
+
+@pytest.fixture
+def version():
+    return ['v1']
+
+
+@pytest.fixture
+def compressor(version):
+    return compression.Compressor('/', lambda: version[0])
+
+
+@pytest.fixture
+def client(compressor):
+    app = Flask(__name__)
+
+    def bundle():
+        response = Response('var a = 1;' * 300, mimetype='application/javascript')
+        # Dash sets a max-age on fingerprinted bundles
+        response.cache_control.max_age = 3600
+        return response
+
+    def stream():
+        return Response((BODY for _ in range(2)), mimetype='application/json')
+
+    routes = {
+        '/': lambda: Response('<html>' + BODY + '</html>', mimetype='text/html'),
+        '/_dash-dependencies': lambda: Response(BODY, mimetype='application/json'),
+        '/_dash-update-component': lambda: Response(BODY, mimetype='application/json'),
+        '/_dash-component-suites/dash/dash.v2_14_2m1.min.js': bundle,
+        '/assets/site.css': lambda: Response('body { margin: 0; }' * 100, mimetype='text/css'),
+        '/small': lambda: Response('{"ok": true}', mimetype='application/json'),
+        '/logo.png': lambda: Response(b'\x89PNG' + bytes(4000), mimetype='image/png'),
+        '/_dash-layout': lambda: figure_cache.respond(figure_cache.Payload(BODY)),
+        '/stream': stream,
+        '/missing': lambda: Response(BODY, status=404, mimetype='application/json')
+    }
+    for path, view in routes.items():
+        app.add_url_rule(path, path, view)
+    app.after_request(compressor.after_request)
+    return app.test_client()
+
+
+# Stands in for the optional brotli package: a recognisable encoding, with the quality used
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    qualities = []
+
+    def compress(body, quality):
+        qualities.append(quality)
+        return b'br:' + gzip.compress(body)
+    monkeypatch.setattr(figure_cache, 'brotli', types.SimpleNamespace(compress=compress))
+    return qualities
+
+
+def _gzip(client, path, **headers):
+    return client.get(path, headers={'Accept-Encoding': 'gzip', **headers})
+
+
+def test_gzip_when_that_is_all_the_client_takes(client):
+    response = _gzip(client, '/_dash-update-component')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == BODY
+    assert response.headers['Content-Length'] == str(len(response.data))
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_brotli_is_preferred_when_available(client, fake_brotli):
+    response = client.get('/_dash-update-component', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert gzip.decompress(response.data[3:]).decode() == BODY
+    assert response.headers['Content-Length'] == str(len(response.data))
+    # One-off responses use the faster setting; bundles the default
+    client.get('/_dash-component-suites/dash/dash.v2_14_2m1.min.js', headers={'Accept-Encoding': 'br'})
+    assert fake_brotli == [compression.DYNAMIC_BROTLI_QUALITY, 9]
+
+
+def test_br_falls_back_to_gzip_without_brotli(client, monkeypatch):
+    monkeypatch.setattr(figure_cache, 'brotli', None)
+    response = client.get('/_dash-update-component', headers={'Accept-Encoding': 'br, gzip;q=0.8'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+@pytest.mark.parametrize('path,headers', [
+    ('/_dash-update-component', {}),
+    ('/_dash-update-component', {'Accept-Encoding': 'identity, deflate'}),
+    ('/small', {'Accept-Encoding': 'gzip'}),
+    ('/logo.png', {'Accept-Encoding': 'gzip'}),
+    ('/stream', {'Accept-Encoding': 'gzip'}),
+    ('/missing', {'Accept-Encoding': 'gzip'})
+])
+def test_responses_left_as_they_are(client, path, headers):
+    response = client.get(path, headers=headers)
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.vary
+
+
+def test_already_encoded_responses_pass_through(client, compressor):
+    response = _gzip(client, '/_dash-layout')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == BODY
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'layout' not in compressor.stats()
+
+
+def test_bundles_and_fingerprinted_assets_are_immutable(client):
+    bundle = _gzip(client, '/_dash-component-suites/dash/dash.v2_14_2m1.min.js')
+    assert bundle.headers['Cache-Control'] == compression.IMMUTABLE
+    assert _gzip(client, '/assets/site.css?m=1700000000').headers['Cache-Control'] == compression.IMMUTABLE
+    assert 'Cache-Control' not in _gzip(client, '/assets/site.css').headers
+    assert 'Cache-Control' not in _gzip(client, '/_dash-update-component').headers
+
+
+@pytest.mark.parametrize('path', ['/', '/_dash-dependencies'])
+def test_page_and_dependencies_revalidate_with_etags(client, path):
+    response = _gzip(client, path)
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+    again = _gzip(client, path, **{'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert 'Content-Encoding' not in again.headers
+    # The plain body has an ETag of its own
+    assert _gzip(client, path, **{'If-None-Match': etag.replace('-gzip', '')}).status_code == 200
+
+
+def test_stats_per_group(client, compressor, version):
+    for _ in range(2):
+        _gzip(client, '/_dash-dependencies')
+        _gzip(client, '/_dash-component-suites/dash/dash.v2_14_2m1.min.js')
+    version[0] = 'v2'
+    _gzip(client, '/_dash-dependencies')
+    _gzip(client, '/small')
+    stats = compressor.stats()
+    assert set(stats) == {'dash-dependencies', 'dash-component-suites'}
+    dependencies = stats['dash-dependencies']
+    assert (dependencies['responses'], dependencies['cache_hits']) == (3, 1)
+    assert dependencies['raw_bytes'] == 3 * len(BODY)
+    assert dependencies['sent_bytes'] == 3 * len(gzip.compress(BODY.encode(), compresslevel=6))
+    assert dependencies['saved'] == pytest.approx(1 - dependencies['sent_bytes'] / dependencies['raw_bytes'])
+    assert stats['dash-component-suites']['cache_hits'] == 1
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import cube
+import filters
+import ingest
+
+
+@pytest.fixture(scope='module')
+def index(aggregates):
+    return filters.FactIndex.from_aggregates(aggregates, aggregates.tables()['monthly'])
+
+
+@pytest.fixture(scope='module')
+def data_cube(index):
+    return cube.Cube.from_index(index.cells())
+
+
+def test_total_matches_the_index(index, data_cube):
+    total = data_cube.query()
+    assert total['count'] == index.count.sum()
+    assert total['success'] == index.success.sum()
+    assert np.isclose(total['volume'], index.volume.sum())
+
+
+@pytest.mark.parametrize('selection', [
+    None,
+    filters.normalize(start='2023-12-10', end='2024-01-20'),
+    filters.normalize(clients=['Lemfi'], countries=['USA', ingest.UNKNOWN_COUNTRY])
+])
+def test_roll_ups_match_the_index_tables(index, selection):
+    tables = index.tables(selection)
+    data_cube = cube.Cube.from_index(index.cells(selection))
+
+    monthly = data_cube.query(by=('month',))
+    assert [data_cube.title('month', key) for key in monthly['month']] == list(tables['monthly']['Month'])
+    assert list(monthly['count']) == list(tables['monthly']['Transactions'])
+    assert np.allclose(monthly['volume'], tables['monthly']['Volume'])
+
+    weekday = data_cube.query(by=('weekday',))
+    assert list(weekday['weekday']) == ingest.DAYS
+    assert list(weekday['count']) == list(tables['daily']['Count'])
+
+    slot = data_cube.query(by=('slot',))
+    assert list(slot['count']) == list(tables['hourly']['Count'])
+    assert np.allclose(slot['volume'], tables['hourly']['Volume'])
+
+    for dim, name, key in (('client', 'client', 'Client'), ('country', 'country', 'Country')):
+        rolled = data_cube.query(by=(dim,)).set_index(dim)['count']
+        assert rolled.sort_index().to_dict() == tables[name].set_index(key)['Transactions'].sort_index().to_dict()
+
+
+def test_slices_match_the_index(index, data_cube):
+    month = data_cube.labels['month'][1]
+    sliced = data_cube.query(client=['Lemfi', 'Nala'], month=[month], weekday=['Friday'])
+    days = index.days.astype('datetime64[M]').astype(str)
+    keep = (
+        np.isin(np.asarray(index.clients)[index.client_codes], ['Lemfi', 'Nala'])
+        & (days == month[:7])
+        & (index.weekdays == 4)
+    )
+    assert sliced['count'] == index.count[keep].sum()
+    assert np.isclose(sliced['volume'], index.volume[keep].sum())
+
+
+def test_two_dimensional_roll_up_is_ordered_as_asked(data_cube):
+    frame = data_cube.query(by=('weekday', 'client'))
+    assert len(frame) == 7 * len(data_cube.labels['client'])
+    assert list(frame.columns[:2]) == ['weekday', 'client']
+    assert frame['count'].sum() == data_cube.query()['count']
+
+
+def test_months_are_keyed_by_start_date(data_cube):
+    assert data_cube.labels['month'] == ['2023-11-01', '2023-12-01', '2024-01-01', '2024-02-01']
+    assert data_cube.title('month', '2024-01-01') == 'Jan 2024'
+    assert data_cube.key('month', 'Jan 2024') == '2024-01-01'
+    assert data_cube.key('month', 'January') is None
+    assert data_cube.key('client', 'Lemfi') == 'Lemfi'
+
+
+def test_unknown_keys_raise_and_known_drops_them(data_cube):
+    with pytest.raises(KeyError):
+        data_cube.query(month=['January'])
+    assert data_cube.known({'client': ['Nobody', 'Lemfi'], 'month': ['2020-01-01']}) == {'client': ['Lemfi']}
+
+
+def test_too_many_cells_gives_no_cube(index):
+    assert cube.Cube.from_index(index.cells(), max_cells=10) is None
@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import database
+import filters
+import ingest
+
+SELECTIONS = [
+    None,
+    filters.normalize('2023-12-10', '2024-01-20', ['Lemfi', ingest.OTHER_CLIENT], ['USA', ingest.UNKNOWN_COUNTRY])
+]
+
+# Distinct users are exact COUNT(DISTINCT)s in SQL and HyperLogLog estimates in a FactIndex
+USER_COLUMNS = {
+    'monthly': ['Unique_Remitters', 'Unique_Recipients'],
+    'users': ['Users', 'Remitters', 'Recipients', 'Monthly_Growth']
+}
+
+
+@pytest.fixture(scope='module')
+def source(transactions_csv, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('database') / 'transactions.db')
+    assert database.load_files(path, [transactions_csv], chunksize=2000) == 6000
+    source = database.SQLiteSource(path, pool_size=2).describe()
+    yield source
+    source.close()
+
+
+@pytest.fixture(scope='module')
+def index(aggregates):
+    return filters.FactIndex.from_aggregates(aggregates)
+
+
+def _selected(rows, selection):
+    if selection is None:
+        return rows
+    start, end, clients, countries, _ = selection
+    return rows[
+        (rows['day'] >= pd.Timestamp(start)) & (rows['day'] <= pd.Timestamp(end))
+        & rows['client'].isin(clients) & rows['country'].isin(countries)
+    ]
+
+
+def test_describe_reads_options_and_range(source, index):
+    assert source.clients == ['Cellulant', 'Lemfi', 'Nala', ingest.OTHER_CLIENT]
+    assert source.countries == ['CAN', 'GBR', 'USA', ingest.UNKNOWN_COUNTRY]
+    assert (source.first_day, source.last_day) == (index.first_day, index.last_day)
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_tables_match_the_fact_index(source, index, selection):
+    actual, expected = source.tables(selection), index.tables(selection)
+    assert list(actual) == list(expected)
+    for name in ingest.TABLES:
+        columns = USER_COLUMNS.get(name, [])
+        pdt.assert_frame_equal(actual[name].drop(columns=columns), expected[name].drop(columns=columns))
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_distinct_users_are_exact(source, rows, selection):
+    tables = source.tables(selection)
+    rows = _selected(rows, selection)
+    monthly = rows.groupby('month')[['remitter', 'recipient']].nunique()
+    assert list(tables['monthly']['Unique_Remitters']) == list(monthly['remitter'])
+    assert list(tables['monthly']['Unique_Recipients']) == list(monthly['recipient'])
+    users = tables['users'].iloc[0]
+    assert users['Remitters'] == rows['remitter'].nunique()
+    assert users['Recipients'] == rows['recipient'].nunique()
+    assert users['Users'] == len(set(rows['remitter']) | set(rows['recipient']))
+    active = [len(set(month['remitter']) | set(month['recipient'])) for _, month in rows.groupby('month')]
+    growth = ((active[-1] / active[0]) ** (1 / (len(active) - 1)) - 1) * 100
+    assert users['Monthly_Growth'] == round(growth, 2)
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_week_and_timeline_match_the_fact_index(source, index, selection):
+    pdt.assert_frame_equal(source.week(selection), index.week(selection))
+    pdt.assert_frame_equal(source.week(selection, 'Nala'), index.week(selection, 'Nala'))
+    for actual, expected in zip(source.timeline(selection), index.timeline(selection)):
+        assert actual.dtype == expected.dtype
+        assert np.allclose(actual.astype(np.float64), expected.astype(np.float64))
+
+
+def test_selection_matching_nothing(source):
+    selection = filters.normalize(clients=['Nobody'])
+    assert source.tables(selection)['monthly'].empty
+    assert len(source.timeline(selection)[0]) == 0
+
+
+def test_buckets_and_cells_cover_the_selection(source, rows):
+    selection = SELECTIONS[1]
+    expected = _selected(rows, selection)
+    buckets = pd.concat(source.buckets(selection, chunk_rows=100))
+    assert buckets['Transactions'].sum() == len(expected)
+    assert np.isclose(buckets['Volume'].sum(), expected['volume'].sum())
+    cells = source.cells(selection)
+    assert cells.count.sum() == len(expected)
+    assert cells.clients == ['Lemfi', ingest.OTHER_CLIENT]
+
+
+class _Connection:
+    def __init__(self, opened):
+        self.closed = False
+        opened.append(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_blocks_at_its_size():
+    opened = []
+    pool = database.Pool(lambda: _Connection(opened), size=2, timeout=0.05)
+    with pool.connection() as first, pool.connection() as second:
+        assert first is not second
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    # Both came back and are reused rather than reopened
+    with pool.connection(), pool.connection():
+        pass
+    assert len(opened) == 2
+
+
+def test_pool_waits_for_a_connection_to_come_free():
+    pool = database.Pool(lambda: _Connection([]), size=1, timeout=5)
+    taken, release, held = threading.Event(), threading.Event(), []
+
+    def hold():
+        with pool.connection() as connection:
+            held.append(connection)
+            taken.set()
+            release.wait()
+    holder = threading.Thread(target=hold)
+    holder.start()
+    taken.wait()
+    threading.Timer(0.05, release.set).start()
+    with pool.connection() as connection:
+        assert connection is held[0]
+    holder.join()
+
+
+def test_pool_frees_the_slot_when_a_query_raises():
+    opened = []
+    pool = database.Pool(lambda: _Connection(opened), size=1, timeout=0.05)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('query failed')
+    # The failed connection is closed rather than reused, and its slot is free again
+    assert opened[0].closed
+    with pool.connection() as connection:
+        assert connection is opened[1]
+
+
+def test_failed_query_returns_the_connection(source):
+    with pytest.raises(sqlite3.OperationalError):
+        source._fetch('broken', [('SELECT nothing FROM nowhere', [])])
+    for _ in range(source.pool.size + 1):
+        assert source.stamp()[0] == '6000'
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import downsample
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(3)
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=len(x)))
+    return x, y
+
+
+@pytest.mark.parametrize('threshold', [3, 10, 257, 2000])
+def test_keeps_endpoints_within_the_budget(series, threshold):
+    x, y = series
+    keep = downsample.lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_short_series_are_left_alone(series):
+    x, y = series
+    assert np.array_equal(downsample.lttb(x[:50], y[:50], 100), np.arange(50))
+    assert np.array_equal(downsample.lttb(x, y, 2), np.arange(len(x)))
+
+
+def test_one_point_per_bucket(series):
+    x, y = series
+    threshold = 100
+    keep = downsample.lttb(x, y, threshold)
+    edges = (np.arange(threshold - 1) * ((len(x) - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = len(x) - 1
+    assert np.array_equal(np.searchsorted(edges, keep[1:-1], 'right') - 1, np.arange(threshold - 2))
+
+
+def test_spikes_survive(series):
+    x, y = series
+    y = y.copy()
+    y[4321] = y.max() + 1000
+    y[7654] = y.min() - 1000
+    keep = downsample.lttb(x, y, 200)
+    assert 4321 in keep and 7654 in keep
+
+
+def test_window_keeps_a_point_beyond_each_edge():
+    times = np.datetime64('2024-01-01T00:00', 'ns') + np.arange(480) * np.timedelta64(30, 'm')
+    values = np.arange(480, dtype=np.float64)
+    shown, kept = downsample.window(times, values, '2024-01-02 00:00:00', '2024-01-03 00:00:00', threshold=20)
+    assert len(shown) == 20
+    assert shown[0] < np.datetime64('2024-01-02T00:00') and shown[-1] > np.datetime64('2024-01-03T00:00')
+    assert np.array_equal(kept, values[np.searchsorted(times, shown)])
@@ -0,0 +1,109 @@
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+
+MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+def _xlsx(frames, title='Export'):
+    return b''.join(export.xlsx_stream(frames, title))
+
+
+def _cell(cell):
+    if cell.get('t') == 'inlineStr':
+        return cell.find(f'{MAIN}is/{MAIN}t').text
+    value = cell.find(f'{MAIN}v')
+    if value is None:
+        return None
+    number = float(value.text)
+    return int(number) if number.is_integer() and '.' not in value.text else number
+
+
+# Sheet title -> rows of cell values, read through the workbook's relationships as Excel does;
+# text cells come back as str and number cells as int or float
+def _sheets(body):
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None
+    targets = {
+        rel.get('Id'): rel.get('Target')
+        for rel in ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    }
+    sheets = {}
+    for sheet in ElementTree.fromstring(archive.read('xl/workbook.xml')).iter(f'{MAIN}sheet'):
+        root = ElementTree.fromstring(archive.read('xl/' + targets[sheet.get(R_ID)]))
+        rows = list(root.iter(f'{MAIN}row'))
+        assert [int(row.get('r')) for row in rows] == list(range(1, len(rows) + 1))
+        sheets[sheet.get('name')] = [[_cell(cell) for cell in row] for row in rows]
+    return sheets
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'Client': ['Lemfi', 'Nala & Co', '<Others>'],
+        'Volume': [1234.5, np.nan, np.inf],
+        'Transactions': np.array([10, 0, -3], dtype=np.int64),
+        'Share': [0.25, -np.inf, 1e-7]
+    })
+
+
+def test_cells_keep_values_and_types(frame):
+    rows = _sheets(_xlsx([frame], 'Client Performance'))['Client Performance']
+    assert rows[0] == list(frame.columns)
+    assert rows[1] == ['Lemfi', 1234.5, 10, 0.25]
+    assert [type(value) for value in rows[1]] == [str, float, int, float]
+    # NaN stays blank and infinities, which number cells cannot hold, become text
+    assert rows[2] == ['Nala & Co', None, 0, '-inf']
+    assert rows[3] == ['<Others>', 'inf', -3, 1e-7]
+
+
+def test_infinities_are_text_cells(frame):
+    archive = zipfile.ZipFile(io.BytesIO(_xlsx([frame])))
+    cells = list(ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml')).iter(f'{MAIN}c'))
+    infinite = [cell for cell in cells if _cell(cell) in ('inf', '-inf')]
+    assert len(infinite) == 2 and all(cell.get('t') == 'inlineStr' for cell in infinite)
+    assert not any(cell.findtext(f'{MAIN}v') in ('inf', '-inf', 'nan') for cell in cells)
+
+
+def test_workbook_declares_its_parts(frame):
+    archive = zipfile.ZipFile(io.BytesIO(_xlsx([frame, frame])))
+    assert set(archive.namelist()) == {
+        '[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels',
+        'xl/styles.xml', 'xl/worksheets/sheet1.xml'
+    }
+    overrides = {
+        part.get('PartName') for part in ElementTree.fromstring(archive.read('[Content_Types].xml'))
+        if part.get('PartName')
+    }
+    assert overrides == {'/xl/workbook.xml', '/xl/styles.xml', '/xl/worksheets/sheet1.xml'}
+    targets = [rel.get('Target') for rel in ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))]
+    assert targets == ['worksheets/sheet1.xml', 'styles.xml']
+    styles = ElementTree.fromstring(archive.read('xl/styles.xml'))
+    assert styles.find(f'{MAIN}cellXfs').get('count') == '1'
+
+
+def test_long_exports_continue_on_new_sheets(monkeypatch):
+    monkeypatch.setattr(export, 'SHEET_ROWS', 4)
+    chunks = [pd.DataFrame({'n': np.arange(lo, lo + 3)}) for lo in range(0, 9, 3)]
+    sheets = _sheets(_xlsx(chunks, 'A title longer than any sheet name allows'))
+    title = 'A title longer than any she'
+    assert list(sheets) == [title, f'{title} 2', f'{title} 3']
+    assert [row[0] for rows in sheets.values() for row in rows[1:]] == list(range(9))
+    assert all(len(rows) <= 5 and rows[0] == ['n'] for rows in sheets.values())
+
+
+def test_empty_export_is_still_a_workbook():
+    sheets = _sheets(_xlsx([]))
+    assert sheets == {'Export': []}
+
+
+def test_csv_writes_the_header_once(frame):
+    body = b''.join(export.csv_stream([frame.iloc[:2], frame.iloc[2:]])).decode()
+    assert body == frame.to_csv(index=False)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import failures
+
+
+@pytest.mark.parametrize('message, label', [
+    ('Insufficient funds in wallet', 'Insufficient Balance'),
+    ('Payer has NOT ENOUGH BALANCE', 'Insufficient Balance'),
+    ('Daily limit reached', 'Limit Exceeded'),
+    ('Amount exceeds the maximum allowed', 'Limit Exceeded'),
+    ('Invalid MSISDN 2547000000', 'Invalid Credit Party'),
+    ('Beneficiary not registered for mobile money', 'Invalid Credit Party'),
+    ('Account is dormant', 'Invalid Account'),
+    ('Invalid account number', 'Invalid Account'),
+    ('SOAP fault: faultcode=Server', 'SOAP Error'),
+    ('Request timed out after 30s', 'Timed Out'),
+    ('Timeout waiting for provider', 'Timed Out'),
+    ('Connection refused by upstream', 'Connectivity Error'),
+    ('HTTP 503 from partner', 'System Error'),
+    ('NullPointerException in handler', 'System Error'),
+    ('Transaction declined', 'General Failure'),
+    ('Name mismatch', 'Invalid Details'),
+    ('Something nobody has seen before', failures.OTHER)
+])
+def test_messages_map_to_their_category(message, label):
+    assert failures.LABELS[failures.classify_message(message)] == label
+
+
+# Earlier patterns win wherever the later one appears in the message
+@pytest.mark.parametrize('message, label', [
+    ('Invalid account: insufficient balance', 'Insufficient Balance'),
+    ('Invalid recipient details', 'Invalid Credit Party'),
+    ('Invalid account details', 'Invalid Account'),
+    ('Limit check timed out', 'Limit Exceeded'),
+    ('Timed out: connection reset by peer', 'Timed Out')
+])
+def test_first_category_in_priority_order_wins(message, label):
+    assert failures.LABELS[failures.classify_message(message)] == label
+
+
+def test_missing_and_non_text_messages_are_other():
+    for message in (None, np.nan, 42, ''):
+        assert failures.LABELS[failures.classify_message(message)] == failures.OTHER
+
+
+def test_classify_returns_one_label_per_message():
+    messages = np.array(['Insufficient funds', None, 'Request timed out', 'Insufficient funds', np.nan, 'odd'],
+                        dtype=object)
+    labels = failures.classify(messages)
+    assert isinstance(labels, pd.Categorical)
+    assert list(labels.categories) == failures.LABELS
+    assert list(labels) == [
+        'Insufficient Balance', failures.OTHER, 'Timed Out', 'Insufficient Balance', failures.OTHER, failures.OTHER
+    ]
+
+
+def test_classify_agrees_with_single_messages():
+    messages = ['Limit exceeded', 'SOAP error', 'socket closed', 'Missing field', 'Account frozen'] * 3
+    labels = failures.classify(messages)
+    assert list(labels) == [failures.LABELS[failures.classify_message(m)] for m in messages]
+    assert len(failures.classify([])) == 0
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import filters
+import ingest
+
+SELECTIONS = [
+    filters.normalize(start='2023-12-10', end='2024-01-20'),
+    filters.normalize(clients=['Lemfi', ingest.OTHER_CLIENT]),
+    filters.normalize(start='2024-01-01', countries=[ingest.UNKNOWN_COUNTRY, 'USA']),
+    filters.normalize(end='2023-11-30', clients=['Nala'], countries=['GBR', 'CAN'])
+]
+
+
+@pytest.fixture(scope='module')
+def index(aggregates):
+    return filters.FactIndex.from_aggregates(aggregates, aggregates.tables()['monthly'])
+
+
+def _selected(rows, selection):
+    if selection is None:
+        return rows
+    start, end, clients, countries, _ = selection
+    keep = np.ones(len(rows), dtype=bool)
+    if start:
+        keep &= rows['day'] >= pd.Timestamp(start)
+    if end:
+        keep &= rows['day'] <= pd.Timestamp(end)
+    if clients:
+        keep &= rows['client'].isin(clients)
+    if countries:
+        keep &= rows['country'].isin(countries)
+    return rows[keep]
+
+
+def test_normalize():
+    assert filters.normalize() is None
+    assert filters.normalize(start='2024-01-05T10:00:00', clients=['b', 'a', 'b']) == (
+        '2024-01-05', None, ('a', 'b'), (), None
+    )
+
+
+@pytest.mark.parametrize('selection', [None] + SELECTIONS)
+def test_tables_match_pandas_groupby(index, rows, selection):
+    tables = index.tables(selection)
+    rows = _selected(rows, selection)
+
+    monthly = rows.groupby('month')[['volume', 'count', 'success']].sum()
+    assert list(tables['monthly']['Month']) == ingest.month_labels(monthly.index)
+    assert list(tables['monthly']['Transactions']) == list(monthly['count'])
+    assert np.allclose(tables['monthly']['Volume'], monthly['volume'])
+    assert np.allclose(tables['monthly']['Success_Rate'], (monthly['success'] / monthly['count'] * 100).round(2))
+
+    hourly = rows.groupby('slot')[['volume', 'count']].sum().reindex(range(48), fill_value=0)
+    assert list(tables['hourly']['Count']) == list(hourly['count'])
+    assert np.allclose(tables['hourly']['Volume'], hourly['volume'])
+
+    daily = rows.groupby('weekday')[['volume', 'count']].sum().reindex(range(7), fill_value=0)
+    assert list(tables['daily']['Count']) == list(daily['count'])
+    assert np.allclose(tables['daily']['Volume'], daily['volume'])
+
+    for name, key in (('country', 'Country'), ('client', 'Client')):
+        expected = rows.groupby(name)[['volume', 'count']].sum().sort_index()
+        actual = tables[name].set_index(key).sort_index()
+        assert list(actual.index) == list(expected.index)
+        assert list(actual['Transactions']) == list(expected['count'])
+        assert np.allclose(actual['Volume'], expected['volume'])
+
+    failed = rows[rows['success'] == 0].groupby('reason', observed=True).size()
+    assert tables['failure'].set_index('Reason')['Total'].sort_index().to_dict() == failed.sort_index().to_dict()
+
+
+def test_selection_matching_nothing_is_empty(index):
+    tables = index.tables(filters.normalize(clients=['Nobody']))
+    assert tables['monthly'].empty
+    assert tables['hourly']['Count'].sum() == 0
+    assert tables['failure'].empty
+
+
+def test_timeline_and_buckets_follow_the_selection(index, rows):
+    selection = SELECTIONS[0]
+    expected = _selected(rows, selection)
+    times, volume, count = index.timeline(selection)
+    assert count.sum() == len(expected)
+    assert np.isclose(volume.sum(), expected['volume'].sum())
+    assert str(times[0].astype('datetime64[D]')) == '2023-12-10'
+    buckets = pd.concat(index.buckets(selection, chunk_rows=100))
+    assert buckets['Transactions'].sum() == len(expected)
+    assert buckets['Date'].min() >= '2023-12-10' and buckets['Date'].max() <= '2024-01-20'
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import filters
+import heatmap
+import ingest
+
+
+# Weekday x slot sums of the conftest rows with plain pandas, every cell present
+def _pivot(rows, column):
+    return rows.pivot_table(index='weekday', columns='slot', values=column, aggfunc='sum').reindex(
+        index=range(7), columns=range(48), fill_value=0
+    ).fillna(0).to_numpy()
+
+
+def test_week_grid_matches_a_pivot(rows):
+    volume, count = heatmap.week_grid(rows['weekday'], rows['slot'], rows['volume'])
+    assert np.allclose(volume, _pivot(rows, 'volume'))
+    assert np.array_equal(count, _pivot(rows, 'count'))
+    assert count.dtype == np.int64
+
+
+def test_week_grid_adds_up_pre_aggregated_counts(rows):
+    cells = rows.groupby(['weekday', 'slot'], as_index=False)[['volume', 'count']].sum()
+    volume, count = heatmap.week_grid(cells['weekday'], cells['slot'], cells['volume'], cells['count'])
+    assert np.allclose(volume, _pivot(rows, 'volume'))
+    assert np.array_equal(count, _pivot(rows, 'count'))
+    assert count.dtype == np.int64
+
+
+def test_empty_selection_is_an_empty_grid():
+    volume, count = heatmap.week_grid([], [], np.array([], dtype=np.float64))
+    assert volume.shape == count.shape == (7, 48)
+    assert not volume.any() and not count.any()
+
+
+@pytest.mark.parametrize('client', [None, 'Nala', 'Nobody'])
+def test_from_files_matches_a_pivot(rows, transactions_csv, client):
+    if client is not None:
+        rows = rows[rows['client'] == client]
+    week = heatmap.from_files([transactions_csv], client, chunksize=1000)
+    assert len(week) == heatmap.CELLS
+    assert list(week['Day'][::48]) == list(ingest.DAYS)
+    assert list(week['Hour'][:48]) == list(ingest.SLOTS)
+    assert np.allclose(week['Volume'].to_numpy().reshape(7, 48), _pivot(rows, 'volume'))
+    assert np.array_equal(week['Count'].to_numpy().reshape(7, 48), _pivot(rows, 'count'))
+
+
+def test_timestamps_fall_in_their_weekday_and_slot():
+    timestamps = pd.to_datetime(['2024-01-01 00:00:00', '2024-01-01 00:30:00', '2024-01-07 23:59:59'])
+    volume, count = heatmap.from_timestamps(timestamps, [1.0, 2.0, 4.0])
+    # 2024-01-01 was a Monday, 2024-01-07 a Sunday
+    assert (volume[0, 0], volume[0, 1], volume[6, 47]) == (1.0, 2.0, 4.0)
+    assert count.sum() == 3
+
+
+def test_fact_index_week_matches_a_pivot(aggregates, rows):
+    index = filters.FactIndex.from_aggregates(aggregates)
+    week = index.week(filters.normalize(clients=['Lemfi']))
+    lemfi = rows[rows['client'] == 'Lemfi']
+    assert np.allclose(week['Volume'].to_numpy().reshape(7, 48), _pivot(lemfi, 'volume'))
+    assert np.array_equal(week['Count'].to_numpy().reshape(7, 48), _pivot(lemfi, 'count'))
+    empty = index.week(filters.normalize(clients=['Nobody']))
+    assert len(empty) == heatmap.CELLS
+    assert empty['Volume'].sum() == 0 and empty['Count'].sum() == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hll
+
+# Three standard errors; a correct sketch lands outside this about 0.3% of the time
+BOUND = 3 * 1.04 / np.sqrt(hll.M)
+
+
+def _sketch(ids, month='2024-01-01', client='Lemfi', country='GBR'):
+    n = len(ids)
+    return hll.Sketches.from_ids(
+        np.full(n, np.datetime64(month, 'ns')), [client] * n, [country] * n, np.asarray(ids).astype(str)
+    )
+
+
+@pytest.mark.parametrize('n', [50, 1_000, 30_000, 300_000])
+def test_estimate_within_the_error_bound(n):
+    assert abs(_sketch(np.arange(n)).total() - n) <= max(BOUND * n, 2)
+
+
+def test_merge_equals_the_sketch_of_the_union():
+    a, b = np.arange(0, 60_000), np.arange(40_000, 100_000)
+    merged = _sketch(a).merge(_sketch(b))
+    assert len(merged) == 1
+    assert np.array_equal(merged.union(), _sketch(np.arange(100_000)).union())
+    assert abs(merged.total() - 100_000) <= BOUND * 100_000
+
+
+def test_merge_is_idempotent_and_order_free():
+    a, b = _sketch(np.arange(5_000)), _sketch(np.arange(3_000, 9_000), client='Nala')
+    assert np.array_equal(a.merge(a).registers, a.registers)
+    ab, ba = a.merge(b), b.merge(a)
+    assert len(ab) == 2
+    assert np.array_equal(ab.union(), ba.union())
+    assert abs(ab.total() - 9_000) <= BOUND * 9_000
+
+
+def test_chunks_concatenate_to_the_whole():
+    ids = np.arange(20_000)
+    chunks = [_sketch(chunk) for chunk in np.array_split(ids, 7)]
+    assert np.array_equal(hll.Sketches.concat(chunks).registers, _sketch(ids).registers)
+
+
+def test_numeric_and_text_ids_hash_alike():
+    assert np.array_equal(hll.hash_ids([1, 2, 3]), hll.hash_ids(['1', '2', '3']))
+
+
+def test_missing_ids_are_skipped():
+    month = [np.datetime64('2024-01-01', 'ns')] * 2
+    assert len(hll.Sketches.from_ids(month, ['a', 'a'], ['b', 'b'], [None, None])) == 0
+    assert hll.Sketches().total() == 0
+
+
+def test_frames_round_trip():
+    sketches = _sketch(np.arange(1_000)).merge(_sketch(np.arange(500), month='2024-02-01', country='USA'))
+    frames = sketches.frames()
+    restored = hll.Sketches.from_frames(frames['keys'], frames['registers'])
+    assert np.array_equal(restored.registers, sketches.registers)
+    assert list(restored.keys['country'].astype(str)) == list(sketches.keys['country'])
+
+
+def test_ingested_counts_match_the_exact_distinct_counts(aggregates, rows):
+    by_month = aggregates.remitters.by_month()
+    exact = rows.groupby('month')['remitter'].nunique()
+    assert set(by_month) == set(exact.index)
+    for month, count in exact.items():
+        assert abs(by_month[month] - count) <= max(BOUND * count, 2)
+
+    totals = hll.user_totals(aggregates.remitters, aggregates.recipients)
+    users = pd.concat([rows['remitter'], rows['recipient']]).nunique()
+    assert abs(totals['Users'] - users) <= BOUND * users
+    assert abs(totals['Remitters'] - rows['remitter'].nunique()) <= BOUND * rows['remitter'].nunique()
+    assert abs(totals['Recipients'] - rows['recipient'].nunique()) <= BOUND * rows['recipient'].nunique()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import failures
+import ingest
+
+
+def _sorted(aggregates):
+    return aggregates.facts.sort_index(), aggregates.failures.sort_index()
+
+
+@pytest.mark.parametrize('chunksize', [1, 997, 6000])
+def test_chunk_boundaries_do_not_change_the_aggregates(aggregates, transactions, transactions_csv, chunksize):
+    if chunksize == 1:
+        # Row by row is slow through read_csv; merging one-row chunks directly covers the same path
+        chunked = ingest.Aggregates()
+        for start in range(0, 300):
+            chunked.merge(ingest.Aggregates.from_chunk(transactions.iloc[start:start + 1]))
+        whole = ingest.Aggregates().merge(ingest.Aggregates.from_chunk(transactions.iloc[:300])).compact()
+    else:
+        chunked, whole = ingest.ingest([transactions_csv], chunksize=chunksize), aggregates
+    facts, failed = _sorted(chunked.compact())
+    expected_facts, expected_failed = _sorted(whole)
+    pdt.assert_frame_equal(facts, expected_facts, check_exact=False)
+    pdt.assert_series_equal(failed, expected_failed)
+    assert np.array_equal(chunked.remitters.registers, whole.remitters.registers)
+
+
+def test_files_merge_like_one_export(aggregates, transactions, tmp_path):
+    paths = []
+    for i, part in enumerate(np.array_split(np.arange(len(transactions)), 3)):
+        paths.append(str(tmp_path / f'part{i}.csv'))
+        transactions.iloc[part].to_csv(paths[-1], index=False)
+    merged = ingest.ingest(paths, chunksize=1500)
+    for name in ingest.TABLES:
+        pdt.assert_frame_equal(merged.tables()[name], aggregates.tables()[name])
+
+
+def test_prepare_chunk_slots_and_statuses():
+    chunk = pd.DataFrame({
+        'timestamp': ['2024-01-31 00:00:00', '2024-01-31 00:29:59', '2024-01-31 00:30:00', '2024-01-31 23:59:59'],
+        'amount': ['10.5', 'n/a', '3', None],
+        'status': [' Completed ', 'SUCCESSFUL', 'failed', 'Pending'],
+        'client': ['Lemfi', None, 'Nala', None],
+        'country': [None, 'GBR', None, 'USA'],
+        'remitter_id': ['1', '2', '3', '4'],
+        'recipient_id': ['5', '6', '7', '8'],
+        'failure_reason': [None, None, 'Request timed out', None]
+    })
+    rows = ingest.prepare_chunk(chunk)
+    assert list(rows['slot']) == [0, 0, 1, 47]
+    assert (rows['date'] == pd.Timestamp('2024-01-31')).all()
+    assert list(rows['success']) == [1, 1, 0, 0]
+    # Amounts that are not numbers count as zero volume
+    assert list(rows['volume']) == [10.5, 0.0, 3.0, 0.0]
+    assert list(rows['client']) == ['Lemfi', ingest.OTHER_CLIENT, 'Nala', ingest.OTHER_CLIENT]
+    assert list(rows['country']) == [ingest.UNKNOWN_COUNTRY, 'GBR', ingest.UNKNOWN_COUNTRY, 'USA']
+    assert list(rows['reason'])[2:] == [failures.classify(np.array(['Request timed out']))[0], ingest.OTHER_REASON]
+
+
+def test_exports_without_client_country_or_reason_columns():
+    chunk = pd.DataFrame({
+        'timestamp': ['2024-02-01 08:15:00', '2024-02-02 09:45:00'],
+        'amount': [100.0, 50.0],
+        'status': ['failed', 'success']
+    })
+    aggregates = ingest.Aggregates.from_chunk(chunk).compact()
+    assert set(aggregates.facts.index.get_level_values('client')) == {ingest.OTHER_CLIENT}
+    assert set(aggregates.facts.index.get_level_values('country')) == {ingest.UNKNOWN_COUNTRY}
+    assert list(aggregates.failures.index.get_level_values('reason')) == [ingest.OTHER_REASON]
+    # No user ids, so no sketches
+    assert len(aggregates.remitters) == 0
+    tables = aggregates.tables()
+    assert list(tables['client']['Client']) == [ingest.OTHER_CLIENT]
+    assert list(tables['failure']['Reason']) == [ingest.OTHER_REASON]
+
+
+def test_failures_count_failed_rows_by_day_client_country_and_reason(aggregates, rows):
+    failed = rows[rows['success'] == 0]
+    expected = failed.groupby(['day', 'client', 'country', 'reason'], observed=True).size()
+    actual = aggregates.failures
+    assert actual.sum() == len(failed)
+    assert {
+        (date, client, country, str(reason)): count for (date, client, country, reason), count in actual.items()
+    } == {
+        (date, client, country, str(reason)): count for (date, client, country, reason), count in expected.items()
+    }
+    assert aggregates.tables()['failure']['Total'].sum() == len(failed)
+    # A successful row adds no failure, even with a reason filled in
+    chunk = pd.DataFrame({
+        'timestamp': ['2024-01-01 10:00:00'], 'amount': [5.0], 'status': ['success'],
+        'failure_reason': ['Request timed out']
+    })
+    assert ingest.Aggregates.from_chunk(chunk).failures.empty
+
+
+def test_unknown_labels_sort_last(aggregates):
+    tables = aggregates.tables()
+    assert tables['client']['Client'].iloc[-1] == ingest.OTHER_CLIENT
+    assert tables['country']['Country'].iloc[-1] == ingest.UNKNOWN_COUNTRY
+    assert list(tables['country']['Country'][:-1]) == sorted(tables['country']['Country'][:-1])
@@ -0,0 +1,143 @@
+import json
+import os
+import types
+
+import pandas as pd
+import pytest
+from dash import no_update
+
+import figures
+import filters
+import ingest
+import live
+
+# Importing the app must not touch the shared result cache or metrics directory
+os.environ.setdefault('RESULT_CACHE_PATH', '')
+os.environ.setdefault('METRICS_DIR', '')
+import app  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def tables(transactions):
+    timestamps = pd.to_datetime(transactions['timestamp'])
+    # The earlier tables end mid-January; the later ones revise January and add February
+    earlier = transactions[timestamps < pd.Timestamp('2024-01-15')]
+    return [ingest.Aggregates().merge(ingest.Aggregates.from_chunk(part)).compact().tables()
+            for part in (earlier, transactions)]
+
+
+def _figure(card, tables):
+    return json.loads(figures.build(card, tables).to_json())
+
+
+# Applies a Patch's operations to a figure as the browser does
+def _apply(figure, patch):
+    operations = patch.to_plotly_json()['operations']
+    for operation in operations:
+        *path, last = operation['location']
+        target = figure
+        for key in path:
+            target = target[key]
+        if operation['operation'] == 'Assign':
+            target[last] = operation['params']['value']
+        else:
+            assert operation['operation'] == 'Extend'
+            target[last].extend(operation['params']['value'])
+    return operations
+
+
+# The old tables' figure with the patch to the new ones applied, and the patch's operations
+def _patched(card, old, new):
+    figure = _figure(card, old)
+    return figure, _apply(figure, live.figure_patch(live.series(old)[card], live.series(new)[card]))
+
+
+def _plotted(figure):
+    return [{key: trace.get(key) for key in ('x', 'y', 'value', 'text')} for trace in figure['data']]
+
+
+@pytest.mark.parametrize('card', live.CARDS)
+def test_patched_figure_matches_a_rebuild(tables, card):
+    old, new = tables
+    figure, _ = _patched(card, old, new)
+    assert _plotted(figure) == pytest.approx(_plotted(_figure(card, new)))
+
+
+def test_new_months_are_appended_and_changed_ones_assigned(tables):
+    old, new = tables
+    figure, operations = _patched('monthly-trends', old, new)
+    extended = [(op['location'], op['params']['value']) for op in operations if op['operation'] == 'Extend']
+    assert (['data', 0, 'x'], ['Feb 2024']) in extended
+    # November and December are complete in both, so only January is reassigned
+    assigned = {tuple(op['location']) for op in operations if op['operation'] == 'Assign'}
+    assert assigned == {('data', 0, 'y', 2), ('data', 1, 'y', 2)}
+
+
+def test_one_changed_hour_is_one_assignment(tables):
+    old = tables[1]
+    new = dict(old, hourly=old['hourly'].copy())
+    new['hourly'].loc[5, 'Count'] += 1
+    figure, operations = _patched('hourly-pattern', old, new)
+    assert [(op['operation'], op['location']) for op in operations] == [('Assign', ['data', 1, 'y', 5])]
+    assert _plotted(figure) == pytest.approx(_plotted(_figure('hourly-pattern', new)))
+
+
+def test_fewer_points_replace_the_whole_list(tables):
+    new, old = tables
+    figure, operations = _patched('monthly-trends', old, new)
+    assert {op['operation'] for op in operations} == {'Assign'}
+    assert _plotted(figure) == pytest.approx(_plotted(_figure('monthly-trends', new)))
+
+
+def test_unchanged_data_sends_nothing(tables):
+    series = live.series(tables[1])
+    assert all(live.figure_patch(series[card], series[card]) is no_update for card in live.CARDS)
+    texts = app.summary_texts(tables[1])
+    assert live.text_updates(texts, texts, app.SUMMARY_IDS) == [no_update] * len(app.SUMMARY_IDS)
+
+
+def test_text_updates_carry_only_changed_texts(tables):
+    old, new = (app.summary_texts(t) for t in tables)
+    updates = live.text_updates(old, new, app.SUMMARY_IDS)
+    shown = [old[i] if update is no_update else update for i, update in zip(app.SUMMARY_IDS, updates)]
+    assert shown == [new[i] for i in app.SUMMARY_IDS]
+    assert updates[app.SUMMARY_IDS.index('top-client')] is no_update
+    assert updates[app.SUMMARY_IDS.index('total-transactions')] == new['total-transactions']
+
+
+def test_volume_scale_follows_the_units(tables):
+    millions, billions = live.series(tables[1]), live.series(tables[1], 1e9)
+    assert billions['hourly-pattern']['y'][0] == pytest.approx([v / 1000 for v in millions['hourly-pattern']['y'][0]])
+    assert billions['hourly-pattern']['y'][1] == millions['hourly-pattern']['y'][1]
+
+
+def test_active_countries_follow_the_selection(aggregates):
+    index = filters.FactIndex.from_aggregates(aggregates)
+    selections = {
+        None: '3',
+        filters.normalize(countries=['USA', ingest.UNKNOWN_COUNTRY]): '1',
+        filters.normalize(countries=[ingest.UNKNOWN_COUNTRY]): '0'
+    }
+    for selection, expected in selections.items():
+        tables = index.tables(selection)
+        assert app.summary_texts(tables)['active-countries'] == expected
+        assert _figure('user-activity', tables)['data'][live.TEXT_TRACE]['text'][0] == expected
+
+
+def test_live_version_endpoint(monkeypatch):
+    client = app.server.test_client()
+    path = app.app.config.routes_pathname_prefix + '_live/version'
+    # Dash checks the real layout on the first request
+    assert client.get(path).status_code == 200
+    monkeypatch.setattr(app.dataset, 'current', lambda: types.SimpleNamespace(version='v1'))
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.get_json() == {'version': 'v1'}
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+    # A new version is a new body and a new ETag
+    monkeypatch.setattr(app.dataset, 'current', lambda: types.SimpleNamespace(version='v2'))
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json() == {'version': 'v2'}
@@ -0,0 +1,118 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'metrics')
+
+
+def _registry(directory):
+    return metrics.Registry(directory, interval=3600)
+
+
+# Samples by (name, labels) from Prometheus text, and the metric types it declares
+def _parse(text):
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples, types
+
+
+# Records some numbers in a process of its own, which has exited by the time this returns
+def _worker(directory, requests, gauge):
+    def run():
+        registry = _registry(directory)
+        registry.collect(lambda: [('mockdash_data_loaded_timestamp_seconds', {}, gauge)])
+        registry.inc('mockdash_requests_total', requests, route='/', method='GET', status='200')
+        registry.observe('mockdash_request_duration_seconds', 0.2, route='/')
+        registry.flush()
+    process = multiprocessing.get_context('fork').Process(target=run)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    return process.pid
+
+
+def test_render_writes_the_text_format():
+    registry = _registry('')
+    registry.inc('mockdash_requests_total', route='/x', method='GET', status='200')
+    registry.inc('mockdash_requests_total', 2, route='/x', method='GET', status='200')
+    registry.inc('mockdash_cache_requests_total', cache='figures', result='hit "quoted"\\n')
+    for seconds in (0.003, 0.2, 0.2, 30):
+        registry.observe('mockdash_request_duration_seconds', seconds, route='/x')
+    text = registry.render(extra=[('mockdash_data_source_age_seconds', {}, 12.5)])
+    lines = text.splitlines()
+
+    assert text.endswith('\n')
+    assert lines[:3] == [
+        '# HELP mockdash_requests_total HTTP requests by route, method and status',
+        '# TYPE mockdash_requests_total counter',
+        'mockdash_requests_total{method="GET",route="/x",status="200"} 3'
+    ]
+    assert 'mockdash_cache_requests_total{cache="figures",result="hit \\"quoted\\"\\\\n"} 1' in lines
+    assert 'mockdash_data_source_age_seconds 12.5' in lines
+    samples, types = _parse(text)
+    assert types['mockdash_request_duration_seconds'] == 'histogram'
+    # Buckets are cumulative and end in +Inf, which equals _count
+    assert samples['mockdash_request_duration_seconds_bucket{route="/x",le="0.005"}'] == 1
+    assert samples['mockdash_request_duration_seconds_bucket{route="/x",le="0.1"}'] == 1
+    assert samples['mockdash_request_duration_seconds_bucket{route="/x",le="0.25"}'] == 3
+    assert samples['mockdash_request_duration_seconds_bucket{route="/x",le="10"}'] == 3
+    assert samples['mockdash_request_duration_seconds_bucket{route="/x",le="+Inf"}'] == 4
+    assert samples['mockdash_request_duration_seconds_count{route="/x"}'] == 4
+    assert samples['mockdash_request_duration_seconds_sum{route="/x"}'] == pytest.approx(30.403)
+    # Metrics with no samples are left out
+    assert 'mockdash_payload_bytes' not in types
+
+
+def test_render_adds_up_every_process(directory):
+    first, second = _worker(directory, 3, 100.0), _worker(directory, 4, 200.0)
+    registry = _registry(directory)
+    registry.inc('mockdash_requests_total', route='/', method='GET', status='200')
+    registry.collect(lambda: [('mockdash_data_loaded_timestamp_seconds', {}, 300.0)])
+    # first is retired as gunicorn's child_exit would; second is found exited by the scrape
+    registry.retire(first)
+    assert sorted(os.listdir(directory)) == sorted([metrics.ARCHIVE, metrics.LOCK, f'metrics-{second}.json'])
+    samples, _ = _parse(registry.render())
+
+    assert samples['mockdash_requests_total{method="GET",route="/",status="200"}'] == 8
+    assert samples['mockdash_request_duration_seconds_count{route="/"}'] == 2
+    # Gauges describe running processes only
+    assert {series: value for series, value in samples.items() if series.startswith('mockdash_data_loaded')} == {
+        f'mockdash_data_loaded_timestamp_seconds{{pid="{os.getpid()}"}}': 300.0
+    }
+    assert sorted(os.listdir(directory)) == sorted([metrics.ARCHIVE, metrics.LOCK, f'metrics-{os.getpid()}.json'])
+
+
+def test_totals_never_go_down_as_workers_exit(directory):
+    registry = _registry(directory)
+    series = 'mockdash_requests_total{method="GET",route="/",status="200"}'
+    seen = []
+    for requests in (2, 5, 1):
+        _worker(directory, requests, 0.0)
+        seen.append(_parse(registry.render())[0][series])
+    assert seen == [2, 7, 8]
+    with open(os.path.join(directory, metrics.ARCHIVE)) as f:
+        archive = json.load(f)
+    assert archive['gauges'] == []
+    assert [value for name, _, value in archive['counters'] if name == 'mockdash_requests_total'] == [8]
+
+
+def test_discard_empties_the_directory(directory):
+    _worker(directory, 1, 0.0)
+    registry = _registry(directory)
+    registry.render()
+    registry.discard()
+    assert [name for name in os.listdir(directory) if name.startswith('metrics-')] == []
+    assert 'mockdash_requests_total' not in registry.render()
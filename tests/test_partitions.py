@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas.testing as pdt
+import pytest
+
+import filters
+import ingest
+import partitions
+import rollup
+
+
+@pytest.fixture(scope='module')
+def store(transactions, tmp_path_factory):
+    root = tmp_path_factory.mktemp('partitions')
+    half = len(transactions) // 2
+    transactions.iloc[:half].to_csv(root / 'first.csv', index=False)
+    transactions.iloc[half:].to_csv(root / 'second.csv', index=False)
+    transactions.iloc[:500].to_csv(root / 'other.csv', index=False)
+    store = partitions.PartitionedStore(str(root / 'store'))
+    store.append_files([str(root / 'first.csv')], 'retail', 'Retail Remittances', chunksize=1000)
+    store.append_files([str(root / 'second.csv')], 'retail', chunksize=1000)
+    store.append_files([str(root / 'other.csv')], 'wholesale')
+    return store
+
+
+# Every partition key load() was asked for
+@pytest.fixture
+def loaded(store, monkeypatch):
+    seen = []
+    load = store.load
+
+    def recording(keys=None):
+        seen.append(list(keys))
+        return load(keys)
+    monkeypatch.setattr(store, 'load', recording)
+    return seen
+
+
+def test_manifest_describes_every_partition(store, rows):
+    retail = store.partitions('retail')
+    assert store.tenants() == ['retail', 'wholesale']
+    assert store.title('retail') == 'Retail Remittances' and store.title('wholesale') == 'wholesale'
+    assert sum(p['transactions'] for p in retail.values()) == len(rows)
+    assert {(p['month'], p['client']) for p in retail.values()} == {
+        (month.strftime('%Y-%m'), client) for month, client in rows.groupby(['month', 'client']).groups
+    }
+
+
+def test_keys_prune_by_month_and_client(store):
+    keys = store.keys('retail', '2023-12-15', '2024-01-10', ('Lemfi',))
+    assert keys == [
+        partitions.partition_key('retail', '2023-12', 'Lemfi'), partitions.partition_key('retail', '2024-01', 'Lemfi')
+    ]
+    assert len(store.keys('retail', start='2024-02-01')) == 4
+    assert store.keys('retail', clients=('Nobody',)) == []
+    assert all(key.startswith('wholesale/') for key in store.keys('wholesale'))
+
+
+def test_queries_read_only_the_matching_partitions(store, loaded):
+    index = partitions.PartitionIndex(store)
+    index.tables(filters.normalize('2024-01-03', '2024-01-31', ['Nala', 'Cellulant']))
+    assert loaded == [[partitions.partition_key('retail', '2024-01', c) for c in ('Cellulant', 'Nala')]]
+
+
+@pytest.mark.parametrize('selection', [
+    None,
+    filters.normalize('2023-12-10', '2024-01-20'),
+    filters.normalize(clients=['Lemfi', ingest.OTHER_CLIENT], countries=['USA']),
+])
+def test_pruned_results_match_the_whole_store(store, aggregates, selection):
+    index = partitions.PartitionIndex(store)
+    whole = filters.FactIndex.from_aggregates(aggregates)
+    pruned, expected = index.tables(selection), whole.tables(selection)
+    for name in ingest.TABLES:
+        pdt.assert_frame_equal(pruned[name], expected[name])
+    assert index.timeline(selection)[2].sum() == whole.timeline(selection)[2].sum()
+
+
+def test_tenants_are_kept_apart(store):
+    index = partitions.PartitionIndex(store)
+    assert index.tenant == 'retail'
+    wholesale = index.tables(filters.normalize(tenant='wholesale'))
+    assert wholesale['monthly']['Transactions'].sum() == 500
+    assert index.span('wholesale')[0] >= index.span()[0]
+
+
+def test_rebuild_partition_reproduces_the_aggregates(store):
+    key = store.keys('retail', '2024-01-01', '2024-01-31', ('Nala',))[0]
+    before = store.read_partition(key).facts.sort_index()
+    store.rebuild_partition(key)
+    after = store.read_partition(key).facts.sort_index()
+    assert after.index.equals(before.index)
+    assert np.array_equal(after['count'], before['count'])
+    assert np.allclose(after['volume'], before['volume'])
+
+
+def test_append_without_a_tenant_is_refused(store, aggregates):
+    version = store.version
+    with pytest.raises(NotImplementedError):
+        store.append(aggregates)
+    assert store.version == version
+    assert not any(name.endswith(rollup.PARTITION_SUFFIX) for name in os.listdir(store.path))
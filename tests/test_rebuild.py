@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas.testing as pdt
+import pytest
+
+import ingest
+import rebuild
+import snapshot
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    # Rebuilds warm the shared result cache; keep these off it, pool processes included
+    monkeypatch.setenv('RESULT_CACHE_PATH', '')
+    monkeypatch.setattr(rebuild.result_cache, 'RESULT_CACHE_PATH', '')
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    return str(inbox), str(tmp_path / 'store'), str(tmp_path / 'snapshot.bin')
+
+
+# Splits the conftest export in two and drops the given parts into the inbox
+def _drop(transactions, inbox, *parts):
+    halves = np.array_split(np.arange(len(transactions)), 2)
+    dropped = []
+    for part in parts:
+        dropped.append(os.path.join(inbox, f'export{part}.csv'))
+        transactions.iloc[halves[part]].to_csv(dropped[-1], index=False)
+    return dropped
+
+
+def _leftovers(directory):
+    return [name for name in os.listdir(directory) if name.startswith('.snapshot-')]
+
+
+def _transactions(snap):
+    return int(np.asarray(snap.column('monthly', 'Transactions')).sum())
+
+
+def test_rebuild_swaps_the_snapshot_atomically(paths, transactions, aggregates):
+    inbox, store, path = paths
+    first = rebuild.rebuild(inbox, store, path, _drop(transactions, inbox, 0))
+    old = snapshot.Snapshot(path)
+    assert (old.version, _transactions(old)) == (first, 3000)
+    inode = os.stat(path).st_ino
+
+    second = rebuild.rebuild(inbox, store, path, _drop(transactions, inbox, 1))
+    assert second != first
+    # A new file was renamed over the old one rather than written in place,
+    # so a reader still mapping the old one sees all of it, unchanged
+    assert os.stat(path).st_ino != inode
+    assert (old.version, _transactions(old)) == (first, 3000)
+    new = snapshot.Snapshot(path)
+    assert new.version == second
+    for name in ingest.TABLES:
+        pdt.assert_frame_equal(new.table(name), aggregates.tables()[name], check_dtype=False, check_categorical=False)
+    assert _leftovers(os.path.dirname(path)) == []
+    assert sorted(os.listdir(inbox)) == [rebuild.PROCESSED]
+    assert sorted(os.listdir(os.path.join(inbox, rebuild.PROCESSED))) == ['export0.csv', 'export1.csv']
+
+
+def test_failed_snapshot_leaves_the_old_one(paths, transactions, monkeypatch):
+    inbox, store, path = paths
+    first = rebuild.rebuild(inbox, store, path, _drop(transactions, inbox, 0))
+
+    def fail(aggregates):
+        raise MemoryError
+    monkeypatch.setattr(rebuild.snapshot, 'aggregate_tables', fail)
+    with pytest.raises(MemoryError):
+        rebuild.rebuild(inbox, store, path, _drop(transactions, inbox, 1))
+    assert snapshot.Snapshot(path).version == first
+    assert _leftovers(os.path.dirname(path)) == []
+    # The export is in the store already, so it is not picked up again
+    assert sorted(os.listdir(inbox)) == [rebuild.PROCESSED]
+
+
+def test_files_wait_until_they_stop_changing(paths, transactions):
+    inbox, store, path = paths
+    scheduler = rebuild.Scheduler(inbox, store, path)
+    dropped = _drop(transactions, inbox, 0)
+    with open(os.path.join(inbox, 'notes.txt'), 'w') as f:
+        f.write('not an export')
+    assert scheduler._ready() == []
+    with open(dropped[0], 'a') as f:
+        f.write('\n')
+    # Still growing, so it waits another look
+    assert scheduler._ready() == []
+    assert scheduler._ready() == dropped
+
+
+def test_scheduler_rebuilds_in_a_pool_process(paths, transactions):
+    inbox, store, path = paths
+    scheduler = rebuild.Scheduler(inbox, store, path)
+    try:
+        _drop(transactions, inbox, 0, 1)
+        scheduler.poll()
+        assert scheduler._future is None
+        scheduler.poll()
+        version = scheduler._future.result(timeout=120)
+        assert snapshot.Snapshot(path).version == version
+        assert _transactions(snapshot.Snapshot(path)) == len(transactions)
+    finally:
+        if scheduler._pool is not None:
+            scheduler._pool.shutdown()
+
+
+# Holds the scheduler lock in a process of its own until told to let go
+def _leader(store, held, release):
+    scheduler = rebuild.Scheduler(os.devnull, store, os.devnull)
+    assert scheduler._acquire()
+    held.set()
+    release.wait(60)
+
+
+@pytest.mark.skipif(rebuild.fcntl is None, reason='needs flock')
+def test_only_the_leader_rebuilds(paths, transactions):
+    inbox, store, path = paths
+    context = multiprocessing.get_context('fork')
+    held, release = context.Event(), context.Event()
+    leader = context.Process(target=_leader, args=(store, held, release))
+    leader.start()
+    try:
+        assert held.wait(30)
+        follower = rebuild.Scheduler(inbox, store, path)
+        _drop(transactions, inbox, 0)
+        for _ in range(3):
+            follower.poll()
+        assert follower._future is None and follower._pool is None
+        assert not os.path.exists(path)
+        assert os.listdir(inbox) == ['export0.csv']
+    finally:
+        release.set()
+        leader.join(30)
+    assert leader.exitcode == 0
+    # Once the leader is gone the next poll takes over
+    deadline = time.time() + 10
+    while not follower._acquire():
+        assert time.time() < deadline
+        time.sleep(0.05)
@@ -0,0 +1,149 @@
+import sqlite3
+import types
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import result_cache
+
+
+# Values are their own bytes
+class Raw:
+    dumps = staticmethod(bytes)
+    loads = staticmethod(bytes)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(result_cache, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return result_cache.ResultCache(str(tmp_path / 'cache' / 'results.sqlite'), max_bytes=300, ttl=600)
+
+
+# Builds value and records each call, so a test can tell hits from misses
+def _getter(cache):
+    built = []
+
+    def get(key, value=b'x' * 100, version=1):
+        def build():
+            built.append(key)
+            return value
+        return cache.get(version, key, build, Raw)
+    return get, built
+
+
+def _stored(cache):
+    connection = sqlite3.connect(cache.path)
+    try:
+        return dict(connection.execute('SELECT key, used FROM entries').fetchall())
+    finally:
+        connection.close()
+
+
+def test_hits_are_served_without_building(cache):
+    get, built = _getter(cache)
+    assert get('a', b'first') == b'first'
+    assert get('a', b'second') == b'first'
+    assert built == ['a']
+
+
+def test_least_recently_used_is_evicted_past_the_size_cap(cache, clock, monkeypatch):
+    monkeypatch.setattr(result_cache, 'USED_RESOLUTION', 0)
+    get, _ = _getter(cache)
+    for key in ('a', 'b', 'c'):
+        clock[0] += 1
+        get(key)
+    clock[0] += 1
+    get('a')
+    clock[0] += 1
+    get('d')
+    assert sorted(_stored(cache)) == ["'a'", "'c'", "'d'"]
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 300
+
+
+def test_last_use_is_only_rewritten_once_stale(cache, clock):
+    get, _ = _getter(cache)
+    get('a')
+    stored = _stored(cache)["'a'"]
+    clock[0] += result_cache.USED_RESOLUTION / 2
+    get('a')
+    assert _stored(cache)["'a'"] == stored
+    clock[0] += result_cache.USED_RESOLUTION
+    get('a')
+    assert _stored(cache)["'a'"] == clock[0]
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    get, built = _getter(cache)
+    get('a')
+    clock[0] += 599
+    get('a')
+    clock[0] += 2
+    get('a')
+    assert built == ['a', 'a']
+    get('b')
+    clock[0] += 601
+    get('c')
+    assert sorted(_stored(cache)) == ["'c'"]
+    assert cache.stats()['expired'] == 2
+
+
+def test_versions_are_kept_apart(cache, monkeypatch):
+    get, built = _getter(cache)
+    assert get('a', b'one', version=1) == b'one'
+    assert get('a', b'two', version=2) == b'two'
+    assert get('a', version=1) == b'one'
+    monkeypatch.setattr(result_cache, 'CODE_VERSION', 'another-build')
+    assert get('a', b'three', version=1) == b'three'
+    assert built == ['a', 'a', 'a']
+
+
+def test_counters_are_batched_and_shared(cache):
+    get, _ = _getter(cache)
+    # The miss is written with its entry; the hits after it are held until a batch is due
+    get('a')
+    get('a')
+    get('a')
+    connection = sqlite3.connect(cache.path)
+    assert connection.execute('SELECT name, value FROM counters').fetchall() == [('misses', 1)]
+    other = result_cache.ResultCache(cache.path, cache.max_bytes, cache.ttl)
+    other_get, _ = _getter(other)
+    for _ in range(result_cache.COUNT_BATCH):
+        other_get('a')
+    assert dict(connection.execute('SELECT name, value FROM counters').fetchall()) == {
+        'misses': 1, 'hits': result_cache.COUNT_BATCH
+    }
+    connection.close()
+    # Stats include what this worker still holds
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (result_cache.COUNT_BATCH + 2, 1)
+    assert stats['hit_rate'] == stats['hits'] / (stats['hits'] + stats['misses'])
+
+
+def test_held_counts_flush_after_a_while(cache, clock):
+    get, _ = _getter(cache)
+    get('a')
+    get('a')
+    clock[0] += result_cache.COUNT_SECONDS
+    get('a')
+    connection = sqlite3.connect(cache.path)
+    assert dict(connection.execute('SELECT name, value FROM counters').fetchall()) == {'misses': 1, 'hits': 2}
+    connection.close()
+
+
+def test_tables_codec_round_trips():
+    tables = {
+        'monthly': pd.DataFrame({'Month': ['Jan 2024', None], 'Volume': [1.5, np.nan], 'Count': [1, 2]}),
+        'users': pd.DataFrame({'Users': np.array([7], dtype=np.int64)})
+    }
+    loaded = result_cache.Tables.loads(result_cache.Tables.dumps(tables))
+    for name, frame in tables.items():
+        pdt.assert_frame_equal(loaded[name], frame)
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas.testing as pdt
+import pytest
+
+import ingest
+import rollup
+import snapshot
+
+
+@pytest.fixture(scope='module')
+def monthly_files(transactions, tmp_path_factory):
+    root = tmp_path_factory.mktemp('monthly')
+    months = transactions['timestamp'].dt.strftime('%Y-%m')
+    paths = []
+    for month, rows in transactions.groupby(months):
+        path = root / f'{month}.csv'
+        rows.to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+
+def test_appends_merge_into_the_same_tables(aggregates, monthly_files, tmp_path):
+    store = rollup.RollupStore(str(tmp_path / 'store'))
+    for path in monthly_files:
+        store.append_files([path])
+    store.append_files(monthly_files[:1])
+    assert store.version == len(monthly_files) + 1
+    assert store.months() == ['2023-11', '2023-12', '2024-01', '2024-02']
+    first = rollup.RollupStore(str(tmp_path / 'store')).load(['2023-11']).tables()['monthly']
+    assert first['Transactions'].sum() == 2 * aggregates.tables()['monthly']['Transactions'].iloc[0]
+
+
+def _append(path, files):
+    rollup.RollupStore(path).append_files(files)
+
+
+@pytest.mark.skipif(rollup.fcntl is None, reason='appends are only serialised where fcntl exists')
+def test_concurrent_appends_keep_every_month(aggregates, monthly_files, tmp_path):
+    path = str(tmp_path / 'store')
+    rollup.RollupStore(path)
+    context = multiprocessing.get_context('fork')
+    writers = [context.Process(target=_append, args=(path, [file])) for file in monthly_files]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+    store = rollup.RollupStore(path)
+    assert store.version == len(monthly_files)
+    assert store.months() == ['2023-11', '2023-12', '2024-01', '2024-02']
+    assert store.tables()['monthly']['Transactions'].sum() == aggregates.tables()['monthly']['Transactions'].sum()
+
+
+def test_partitions_round_trip_without_pickle(transactions_csv, tmp_path):
+    aggregates = ingest.ingest([transactions_csv], chunksize=2000).compact()
+    store = rollup.RollupStore(str(tmp_path / 'store'))
+    store.append(aggregates)
+    months = [rollup.RollupStore(store.path).read_partition(key) for key in store.months()]
+    for key, expected in rollup.split_by_month(aggregates):
+        with open(os.path.join(store.path, key + rollup.PARTITION_SUFFIX), 'rb') as f:
+            assert f.read(len(snapshot.MAGIC)) == snapshot.MAGIC
+        actual = months[store.months().index(key)]
+        pdt.assert_frame_equal(actual.facts.sort_index(), expected.facts.sort_index())
+        pdt.assert_series_equal(actual.failures.sort_index(), expected.failures.sort_index())
+        for name in ('remitters', 'recipients'):
+            pdt.assert_frame_equal(getattr(actual, name).keys, getattr(expected, name).keys)
+            assert np.array_equal(getattr(actual, name).registers, getattr(expected, name).registers)
+    for name in ingest.TABLES:
+        pdt.assert_frame_equal(store.tables()[name], aggregates.tables()[name])
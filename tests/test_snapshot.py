@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import snapshot
+
+
+def test_round_trip_keeps_every_table(aggregates, tmp_path):
+    tables = snapshot.aggregate_tables(aggregates)
+    path = tmp_path / 'snapshot.bin'
+    version = snapshot.write_snapshot(path, tables)
+
+    snap = snapshot.Snapshot(path)
+    assert snap.version == version
+    assert snap.table_names() == list(tables)
+    for name, frame in tables.items():
+        read = snap.table(name)
+        for column in frame.columns:
+            expected = frame[column]
+            if isinstance(expected.dtype, pd.CategoricalDtype) or expected.dtype == object:
+                expected = expected.astype(str)
+                assert list(read[column].astype(str)) == list(expected), (name, column)
+            else:
+                assert np.array_equal(read[column].to_numpy(), expected.to_numpy()), (name, column)
+
+
+# One column of every kind the format encodes differently
+@pytest.fixture
+def mixed():
+    return pd.DataFrame({
+        'label': ['a', 'b', 'a', 'c'],
+        'category': pd.Categorical(['x', 'y', 'x', 'x']),
+        'when': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-02-29', '2024-12-31']),
+        'count': np.array([1, 2, 3, 4], dtype=np.int64),
+        'volume': np.array([0.5, 1.25, -3.0, 1e12]),
+        'slot': np.array([0, 1, 47, 12], dtype=np.int8)
+    })
+
+
+def test_labels_dates_and_numbers_round_trip(mixed, tmp_path):
+    snapshot.write_snapshot(tmp_path / 'mixed.bin', {'mixed': mixed, 'empty': mixed.iloc[:0]})
+    snap = snapshot.Snapshot(tmp_path / 'mixed.bin')
+    read = snap.table('mixed')
+    assert list(read['label']) == list(mixed['label'])
+    assert list(read['category']) == list(mixed['category'])
+    pdt.assert_series_equal(read['when'], mixed['when'])
+    for column in ('count', 'volume', 'slot'):
+        pdt.assert_series_equal(read[column], mixed[column])
+    assert len(snap.table('empty')) == 0
+    assert list(snap.table('empty').columns) == list(mixed.columns)
+
+
+def test_columns_are_read_only_views(mixed, tmp_path):
+    snapshot.write_snapshot(tmp_path / 'mixed.bin', {'mixed': mixed})
+    column = snapshot.Snapshot(tmp_path / 'mixed.bin').column('mixed', 'volume')
+    assert not column.flags.writeable
+    with pytest.raises(KeyError):
+        snapshot.Snapshot(tmp_path / 'mixed.bin').column('mixed', 'missing')
+
+
+def test_version_follows_content(mixed, tmp_path):
+    first = snapshot.write_snapshot(tmp_path / 'a.bin', {'mixed': mixed})
+    again = snapshot.write_snapshot(tmp_path / 'b.bin', {'mixed': mixed})
+    changed = snapshot.write_snapshot(tmp_path / 'c.bin', {'mixed': mixed.assign(count=mixed['count'] + 1)})
+    assert first == again
+    assert first != changed
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(ValueError):
+        snapshot.Snapshot(path)